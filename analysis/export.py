@@ -0,0 +1,201 @@
+import json
+import logging
+import math
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass
+from typing import Any, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+LOGGER = logging.getLogger("Telemetry Export")
+
+# Datasource uids provisioned in the otel-lgtm Grafana, queried through
+# its proxy so only the Grafana port needs to be reachable
+PROMETHEUS_UID = "prometheus"
+LOKI_UID = "loki"
+TEMPO_UID = "tempo"
+# Prometheus rejects range queries over 11000 points per series
+MAX_POINTS_PER_QUERY = 10000
+LOKI_PAGE_LIMIT = 5000
+TEMPO_SEARCH_LIMIT = 100000
+# Resource attributes set on every node by bootstrapNode
+NODE_LABEL = "node"
+APPLICATION_LABEL = "application"
+UNKNOWN_NODE = "unknown"
+
+METRICS_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("ms", tz="UTC")),
+    ("value", pa.float64()),
+    ("labels", pa.string()),
+    ("application", pa.string()),
+    ("node", pa.string()),
+    ("metric", pa.string())
+])
+LOGS_SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("ns", tz="UTC")),
+    ("line", pa.string()),
+    ("labels", pa.string()),
+    ("application", pa.string()),
+    ("node", pa.string())
+])
+TRACES_SCHEMA = pa.schema([
+    ("trace_id", pa.string()),
+    ("start", pa.timestamp("ns", tz="UTC")),
+    ("duration_ms", pa.float64()),
+    ("root_service", pa.string()),
+    ("root_name", pa.string()),
+    ("node", pa.string())
+])
+
+@dataclass
+class ExportWindow:
+    start: pd.Timestamp
+    end: pd.Timestamp
+    step_s: float
+
+class GrafanaClient:
+    base_url: str
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    def get(self, uid: str, path: str, query: dict[str, Any]) -> Any:
+        url = f"{self.base_url}/api/datasources/proxy/uid/{uid}{path}?{urllib.parse.urlencode(query)}"
+        with urllib.request.urlopen(url) as response:
+            return json.load(response)
+
+def nodeOf(labels: dict[str, str]) -> str:
+    # Series without the resource attribute are kept under one partition
+    # rather than dropped (e.g. the collector's own metrics)
+    return labels.get(NODE_LABEL, UNKNOWN_NODE)
+
+def writePartitioned(table: pa.Table, path: str, partitions: list[str]) -> None:
+    ds.write_dataset(
+        table,
+        path,
+        format="parquet",
+        partitioning=partitions,
+        partitioning_flavor="hive",
+        existing_data_behavior="delete_matching"
+    )
+
+def queryWindows(window: ExportWindow) -> list[tuple[float, float]]:
+    start = window.start.timestamp()
+    end = window.end.timestamp()
+    span = MAX_POINTS_PER_QUERY * window.step_s
+    count = max(1, math.ceil((end - start) / span))
+    return [(start + i * span, min(end, start + (i + 1) * span)) for i in range(count)]
+
+def metricNames(client: GrafanaClient, window: ExportWindow, match: Optional[str]) -> list[str]:
+    query: dict[str, Any] = {
+        "start": window.start.timestamp(),
+        "end": window.end.timestamp()
+    }
+    if match != None:
+        query["match[]"] = match
+    return client.get(PROMETHEUS_UID, "/api/v1/label/__name__/values", query)["data"]
+
+def exportMetric(client: GrafanaClient, window: ExportWindow, metric: str) -> Optional[pa.Table]:
+    columns: dict[str, list[Any]] = {name: [] for name in METRICS_SCHEMA.names}
+    for start, end in queryWindows(window):
+        result = client.get(PROMETHEUS_UID, "/api/v1/query_range", {
+            "query": metric,
+            "start": start,
+            "end": end,
+            "step": window.step_s
+        })["data"]["result"]
+        for series in result:
+            labels = series["metric"]
+            values = np.array(series["values"], dtype=object)
+            if len(values) == 0:
+                continue
+            count = len(values)
+            columns["timestamp"].append(np.rint(values[:, 0].astype(np.float64) * 1000).astype(np.int64).astype("datetime64[ms]"))
+            columns["value"].append(values[:, 1].astype(np.float64))
+            for name, value in [
+                ("labels", json.dumps(labels, sort_keys=True)),
+                ("application", labels.get(APPLICATION_LABEL, "")),
+                ("node", nodeOf(labels)),
+                ("metric", metric)
+            ]:
+                columns[name].append(np.full(count, value, dtype=object))
+    if len(columns["value"]) == 0:
+        return None
+    return pa.table(
+        {name: np.concatenate(parts) for name, parts in columns.items()},
+        schema=METRICS_SCHEMA
+    )
+
+def exportMetrics(client: GrafanaClient, window: ExportWindow, path: str, match: Optional[str] = None) -> int:
+    metrics = metricNames(client, window, match)
+    LOGGER.info(f"Exporting {len(metrics)} metrics")
+    exported = 0
+    for metric in metrics:
+        table = exportMetric(client, window, metric)
+        if table == None:
+            continue
+        writePartitioned(table, path, ["node", "metric"])
+        exported += table.num_rows
+    return exported
+
+def exportLogs(client: GrafanaClient, window: ExportWindow, path: str, selector: str) -> int:
+    # Paged forwards by the last timestamp seen, lines sharing it at a
+    # page boundary are deduplicated
+    rows: list[tuple[int, str, str, str, str]] = []
+    start_ns = int(window.start.value)
+    end_ns = int(window.end.value)
+    seen: set[tuple[int, str]] = set()
+    while start_ns < end_ns:
+        result = client.get(LOKI_UID, "/loki/api/v1/query_range", {
+            "query": selector,
+            "start": start_ns,
+            "end": end_ns,
+            "limit": LOKI_PAGE_LIMIT,
+            "direction": "forward"
+        })["data"]["result"]
+        page: list[tuple[int, str, str, str, str]] = []
+        for stream in result:
+            labels = stream["stream"]
+            encoded = json.dumps(labels, sort_keys=True)
+            for timestamp, line in stream["values"]:
+                if (int(timestamp), line) in seen:
+                    continue
+                page.append((int(timestamp), line, encoded, labels.get(APPLICATION_LABEL, ""), nodeOf(labels)))
+        if len(page) == 0:
+            break
+        rows.extend(page)
+        last_ns = max([row[0] for row in page])
+        if last_ns != start_ns:
+            seen = set([])
+        seen.update([(row[0], row[1]) for row in page if row[0] == last_ns])
+        start_ns = last_ns
+    if len(rows) == 0:
+        return 0
+    frame = pd.DataFrame(rows, columns=LOGS_SCHEMA.names)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"], unit="ns", utc=True)
+    writePartitioned(pa.Table.from_pandas(frame, schema=LOGS_SCHEMA, preserve_index=False), path, ["node"])
+    return len(rows)
+
+def exportTraces(client: GrafanaClient, window: ExportWindow, path: str) -> int:
+    # Trace summaries only, full traces stay a Tempo query away
+    traces = client.get(TEMPO_UID, "/api/search", {
+        "start": int(window.start.timestamp()),
+        "end": math.ceil(window.end.timestamp()),
+        "limit": TEMPO_SEARCH_LIMIT
+    }).get("traces", [])
+    if len(traces) == 0:
+        return 0
+    frame = pd.DataFrame({
+        "trace_id": [trace["traceID"] for trace in traces],
+        "start": pd.to_datetime([int(trace["startTimeUnixNano"]) for trace in traces], unit="ns", utc=True),
+        "duration_ms": np.array([trace.get("durationMs", 0) for trace in traces], dtype=np.float64),
+        "root_service": [trace.get("rootServiceName", "") for trace in traces],
+        "root_name": [trace.get("rootTraceName", "") for trace in traces]
+    })
+    # Service names are <application>-<node>
+    frame["node"] = frame["root_service"].str.partition("-")[2].replace("", UNKNOWN_NODE)
+    writePartitioned(pa.Table.from_pandas(frame, schema=TRACES_SCHEMA, preserve_index=False), path, ["node"])
+    return len(frame)
@@ -0,0 +1,137 @@
+import json
+import os
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = "manifest.json"
+NO_PHASE = "none"
+QUANTILES = [0.5, 0.95, 0.99]
+# Prometheus names of monotonic counters, including the cumulative parts
+# of histograms and summaries
+COUNTER_SUFFIXES = ("_total", "_count", "_sum", "_bucket")
+
+def loadManifest(export_dir: str) -> dict:
+    with open(os.path.join(export_dir, MANIFEST_FILE), "r") as f:
+        return json.load(f)
+
+def loadSignal(export_dir: str,
+               signal: str,
+               nodes: Optional[list[str]] = None,
+               metrics: Optional[list[str]] = None) -> pd.DataFrame:
+    # Filters on the partition columns skip the other files entirely
+    path = os.path.join(export_dir, signal)
+    if not os.path.isdir(path):
+        return pd.DataFrame()
+    filters = []
+    if nodes != None:
+        filters.append(("node", "in", nodes))
+    if metrics != None:
+        filters.append(("metric", "in", metrics))
+    frame = pd.read_parquet(path, filters=filters if len(filters) > 0 else None)
+    # Partition columns are read back as categoricals
+    for column in ["node", "metric"]:
+        if column in frame.columns:
+            frame[column] = frame[column].astype(str)
+    return frame
+
+def loadMetrics(export_dir: str,
+                nodes: Optional[list[str]] = None,
+                metrics: Optional[list[str]] = None) -> pd.DataFrame:
+    frame = loadSignal(export_dir, "metrics", nodes, metrics)
+    if len(frame) > 0:
+        frame = frame.sort_values(["metric", "labels", "timestamp"], kind="stable", ignore_index=True)
+    return frame
+
+def loadLogs(export_dir: str, nodes: Optional[list[str]] = None) -> pd.DataFrame:
+    return loadSignal(export_dir, "logs", nodes)
+
+def loadTraces(export_dir: str, nodes: Optional[list[str]] = None) -> pd.DataFrame:
+    return loadSignal(export_dir, "traces", nodes)
+
+def loadPhases(path: str) -> pd.DataFrame:
+    # {"<phase>": ["<start>", "<end>"], ...} with ISO 8601 times, e.g.
+    # the load and run phases of a YCSB workload
+    with open(path, "r") as f:
+        phases = json.load(f)
+    frame = pd.DataFrame(
+        [(name, pd.Timestamp(start), pd.Timestamp(end)) for name, (start, end) in phases.items()],
+        columns=["phase", "start", "end"]
+    )
+    for column in ["start", "end"]:
+        frame[column] = frame[column].dt.tz_localize("UTC") if frame[column].dt.tz == None else frame[column].dt.tz_convert("UTC")
+    return frame.sort_values("start", ignore_index=True)
+
+def assignPhases(frame: pd.DataFrame, phases: pd.DataFrame, column: str = "timestamp") -> pd.DataFrame:
+    # Phases must not overlap, rows outside every phase are NO_PHASE
+    frame = frame.copy()
+    if len(phases) == 0:
+        frame["phase"] = NO_PHASE
+        return frame
+    times = frame[column].to_numpy(dtype="datetime64[ns]")
+    starts = phases["start"].to_numpy(dtype="datetime64[ns]")
+    ends = phases["end"].to_numpy(dtype="datetime64[ns]")
+    index = np.searchsorted(starts, times, side="right") - 1
+    clipped = np.clip(index, 0, None)
+    inside = (index >= 0) & (times < ends[clipped])
+    frame["phase"] = np.where(inside, phases["phase"].to_numpy(dtype=object)[clipped], NO_PHASE)
+    return frame
+
+def rates(frame: pd.DataFrame) -> pd.DataFrame:
+    # Per second increase of counters within each series of a frame from
+    # loadMetrics, counter resets (a restarted node) are treated as
+    # starting again from zero
+    frame = frame.copy()
+    series = (frame["metric"] + frame["labels"]).to_numpy()
+    values = frame["value"].to_numpy()
+    seconds = frame["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+    new_series = np.empty(len(frame), dtype=bool)
+    if len(frame) > 0:
+        new_series[0] = True
+        new_series[1:] = series[1:] != series[:-1]
+    delta = np.diff(values, prepend=np.nan)
+    delta = np.where(delta < 0, values, delta)
+    elapsed = np.diff(seconds, prepend=np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        frame["value"] = np.where(new_series | (elapsed <= 0), np.nan, delta / elapsed)
+    return frame.dropna(subset=["value"])
+
+def isCounter(metric: str, counters: Optional[list[str]] = None) -> bool:
+    return metric.endswith(COUNTER_SUFFIXES) or (counters != None and metric in counters)
+
+def counterRates(frame: pd.DataFrame, counters: Optional[list[str]] = None) -> pd.DataFrame:
+    # Replaces the cumulative values of the counters in a frame from
+    # loadMetrics with their rates, leaving other metrics as they are, so
+    # aggregates of counters describe the per second increase
+    if len(frame) == 0:
+        return frame
+    is_counter = frame["metric"].map(lambda metric: isCounter(metric, counters)).to_numpy(dtype=bool)
+    if not is_counter.any():
+        return frame
+    return pd.concat([frame[~is_counter], rates(frame[is_counter])]).sort_values(
+        ["metric", "labels", "timestamp"],
+        kind="stable",
+        ignore_index=True
+    )
+
+def aggregate(frame: pd.DataFrame, by: list[str]) -> pd.DataFrame:
+    grouped = frame.groupby(by, observed=True)["value"]
+    result = grouped.agg(["count", "mean", "std", "min", "max"])
+    for quantile in QUANTILES:
+        result[f"p{int(quantile * 100)}"] = grouped.quantile(quantile)
+    return result.reset_index()
+
+def nodeAggregates(frame: pd.DataFrame) -> pd.DataFrame:
+    return aggregate(frame, ["metric", "node"])
+
+def phaseAggregates(frame: pd.DataFrame) -> pd.DataFrame:
+    return aggregate(frame, ["metric", "phase", "node"])
+
+def compareRuns(baseline: pd.DataFrame, candidate: pd.DataFrame, on: list[str]) -> pd.DataFrame:
+    # Aggregates of two runs side by side with the relative change of
+    # each statistic, e.g. compareRuns(nodeAggregates(a), nodeAggregates(b), ["metric", "node"])
+    merged = baseline.merge(candidate, on=on, suffixes=("_baseline", "_candidate"))
+    for statistic in ["mean"] + [f"p{int(quantile * 100)}" for quantile in QUANTILES]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            merged[f"{statistic}_change"] = merged[f"{statistic}_candidate"] / merged[f"{statistic}_baseline"] - 1
+    return merged
@@ -0,0 +1,88 @@
+import argparse
+import json
+import logging
+import os
+import coloredlogs
+import pandas as pd
+from export import ExportWindow, GrafanaClient, exportLogs, exportMetrics, exportTraces
+from frames import MANIFEST_FILE, assignPhases, counterRates, loadMetrics, loadPhases, nodeAggregates, phaseAggregates
+
+coloredlogs.install(
+    level="INFO",
+    fmt="[%(asctime)s] [%(name)s] [%(levelname)s] :: %(message)s"
+)
+LOGGER = logging.getLogger("Telemetry Analysis")
+
+DEFAULT_GRAFANA_URL = "http://localhost:3000"
+DEFAULT_LOG_SELECTOR = "{service_name=~\".+\"}"
+
+def parseTime(value: str) -> pd.Timestamp:
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo == None:
+        return timestamp.tz_localize("UTC")
+    return timestamp.tz_convert("UTC")
+
+def export(args: argparse.Namespace) -> None:
+    client = GrafanaClient(args.grafana)
+    window = ExportWindow(parseTime(args.start), parseTime(args.end), args.step)
+    os.makedirs(args.output_dir, exist_ok=True)
+    counts = {"metrics": exportMetrics(client, window, os.path.join(args.output_dir, "metrics"), args.match)}
+    if args.logs:
+        counts["logs"] = exportLogs(client, window, os.path.join(args.output_dir, "logs"), args.log_selector)
+    if args.traces:
+        counts["traces"] = exportTraces(client, window, os.path.join(args.output_dir, "traces"))
+    with open(os.path.join(args.output_dir, MANIFEST_FILE), "w") as f:
+        json.dump({
+            "start": window.start.isoformat(),
+            "end": window.end.isoformat(),
+            "step_s": window.step_s,
+            "rows": counts
+        }, f, indent=4)
+    for signal, count in counts.items():
+        LOGGER.info(f"Exported {count} {signal} rows to {args.output_dir}/{signal}")
+
+def summarise(args: argparse.Namespace) -> None:
+    frame = loadMetrics(args.export_dir, metrics=args.metric)
+    if len(frame) == 0:
+        LOGGER.error(f"No metrics exported in {args.export_dir}")
+        exit(1)
+    if not args.raw_counters:
+        frame = counterRates(frame, args.counter)
+    if args.phases != None:
+        summary = phaseAggregates(assignPhases(frame, loadPhases(args.phases)))
+    else:
+        summary = nodeAggregates(frame)
+    if args.output != None:
+        summary.to_csv(args.output, index=False)
+        LOGGER.info(f"Written summary to {args.output}")
+        return
+    with pd.option_context("display.max_rows", None, "display.width", None):
+        print(summary)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export collected telemetry to Parquet and summarise it")
+    subparsers = parser.add_subparsers(required=True)
+    export_parser = subparsers.add_parser("export", help="Export a time window of a run from the collector")
+    export_parser.add_argument("start", help="Start of the window, ISO 8601 (UTC unless offset)")
+    export_parser.add_argument("end", help="End of the window, ISO 8601 (UTC unless offset)")
+    export_parser.add_argument("output_dir", help="Directory to write the export to")
+    export_parser.add_argument("--grafana", default=DEFAULT_GRAFANA_URL, help="Grafana of the collector, e.g. tunnelled over SSH")
+    export_parser.add_argument("--step", type=float, default=1.0, help="Metric resolution in seconds")
+    export_parser.add_argument("--match", default=None, help="Series selector limiting the exported metrics, e.g. '{application=\"cassandra\"}'")
+    export_parser.add_argument("--logs", action="store_true", help="Also export log lines")
+    export_parser.add_argument("--log-selector", default=DEFAULT_LOG_SELECTOR, help="LogQL stream selector of the exported logs")
+    export_parser.add_argument("--traces", action="store_true", help="Also export trace summaries")
+    export_parser.set_defaults(handler=export)
+    summarise_parser = subparsers.add_parser("summarise", help="Aggregate exported metrics per node, and per phase")
+    summarise_parser.add_argument("export_dir", help="Directory of an export")
+    summarise_parser.add_argument("--metric", action="append", default=None, help="Metric to summarise, repeatable, all by default")
+    summarise_parser.add_argument("--phases", default=None, help="JSON file of {\"<phase>\": [\"<start>\", \"<end>\"]} windows")
+    summarise_parser.add_argument("--counter", action="append", default=None, help="Counter to summarise as a rate, repeatable, in addition to the *_total, *_count, *_sum and *_bucket metrics")
+    summarise_parser.add_argument("--raw-counters", action="store_true", help="Summarise the cumulative values of counters instead of their rates")
+    summarise_parser.add_argument("--output", default=None, help="CSV file to write the summary to instead of printing it")
+    summarise_parser.set_defaults(handler=summarise)
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
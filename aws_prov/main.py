@@ -90,6 +90,15 @@ class ApplicationVariant(Enum):
     def __str__(self) -> str:
         return "%s" % self.value[0]
 
+    @staticmethod
+    def fromName(name: str) -> "ApplicationVariant":
+        # Members are looked up by their value, as names do not always
+        # match it (e.g. MONGO_DB is "mongodb")
+        for member in ApplicationVariant:
+            if str(member) == name.lower():
+                return member
+        raise KeyError(f"Unknown application variant '{name}'")
+
     @staticmethod
     def provsionableMembers() -> list["ApplicationVariant"]:
         return list(filter(
@@ -277,5 +286,5 @@ if __name__ == "__main__":
     if (len(sys.argv) != 4):
         LOGGER.error(f"Usage: {sys.argv[0]} <cloudlab profile.xml path> <application type> <output dir>")
         exit(1)
-    app_variant: ApplicationVariant = ApplicationVariant[sys.argv[2].upper()]
+    app_variant: ApplicationVariant = ApplicationVariant.fromName(sys.argv[2])
     main(sys.argv[1], app_variant, sys.argv[3])
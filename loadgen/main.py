@@ -0,0 +1,255 @@
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import coloredlogs
+
+coloredlogs.install(
+    level="INFO",
+    fmt="[%(asctime)s] [%(name)s] [%(levelname)s] :: %(message)s"
+)
+LOGGER = logging.getLogger("Collector Load Generator")
+
+# Matches OTEL_JMX_COLLECTION_INTERVAL_MS of the provisioned collector
+DEFAULT_INTERVAL_MS = 500
+DEFAULT_OTLP_ENDPOINT = "http://localhost:4318"
+DEFAULT_TELEMETRY_ENDPOINT = "http://localhost:8888/metrics"
+SCOPE = {"name": "loadgen"}
+SIGNALS = {
+    # signal: (OTLP/HTTP path, collector telemetry item name, partial success field)
+    "metrics": ("/v1/metrics", "metric_points", "rejectedDataPoints"),
+    "logs": ("/v1/logs", "log_records", "rejectedLogRecords"),
+    "traces": ("/v1/traces", "spans", "rejectedSpans")
+}
+# Collector self telemetry counters, per signal item
+RECEIVER_ACCEPTED = "otelcol_receiver_accepted_{}"
+RECEIVER_REFUSED = "otelcol_receiver_refused_{}"
+EXPORTER_SENT = "otelcol_exporter_sent_{}"
+EXPORTER_FAILED = ["otelcol_exporter_send_failed_{}", "otelcol_exporter_enqueue_failed_{}"]
+PROCESS_CPU = "otelcol_process_cpu_seconds"
+PROCESS_RSS = "otelcol_process_memory_rss"
+SAMPLE_PATTERN = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{[^}]*\})?\s+(\S+)")
+LOG_BODIES = [
+    "Writing Memtable-usertable@{} ({} bytes serialized) to disk",
+    "Completed flushing {} ({} bytes) for commitlog position {}",
+    "Compacted (task id: {}) {} sstables to [{}] to level=0",
+    "GC for ParNew: {} ms for {} collections, {} used"
+]
+SPAN_NAMES = ["read", "update", "insert", "scan"]
+
+@dataclass
+class SignalCounts:
+    items: int = 0
+    requests: int = 0
+    # Rejected by the collector, either whole requests (e.g. the memory
+    # limiter) or items reported back as a partial success
+    rejected_requests: int = 0
+    rejected_items: int = 0
+    failed_requests: int = 0
+
+@dataclass
+class GeneratorState:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    counts: dict[str, SignalCounts] = field(default_factory=lambda: {signal: SignalCounts() for signal in SIGNALS})
+    late_ticks: int = 0
+
+def attribute(key: str, value: str) -> dict:
+    return {"key": key, "value": {"stringValue": value}}
+
+def resource(application: str, node: str) -> dict:
+    # The resource attributes bootstrapNode sets on every node
+    return {"attributes": [
+        attribute("service.name", f"{application}-{node}"),
+        attribute("application", application),
+        attribute("node", node)
+    ]}
+
+def metricsPayload(application: str, node: str, series: int, tick: int, now_ns: int) -> tuple[dict, int]:
+    # Half cumulative counters, half gauges, as scraped over JMX
+    metrics = []
+    for i in range(series):
+        point = {"timeUnixNano": str(now_ns), "asDouble": float(tick * (i + 1)) if i % 2 == 0 else random.random() * 100}
+        if i % 2 == 0:
+            metrics.append({"name": f"loadgen.jmx.counter_{i}", "sum": {
+                "aggregationTemporality": 2,
+                "isMonotonic": True,
+                "dataPoints": [point]
+            }})
+        else:
+            metrics.append({"name": f"loadgen.jmx.gauge_{i}", "gauge": {"dataPoints": [point]}})
+    return ({"resourceMetrics": [{
+        "resource": resource(application, node),
+        "scopeMetrics": [{"scope": SCOPE, "metrics": metrics}]
+    }]}, series)
+
+def logsPayload(application: str, node: str, count: int, now_ns: int) -> tuple[dict, int]:
+    records = []
+    for i in range(count):
+        body = random.choice(LOG_BODIES).format(random.randrange(1 << 20), random.randrange(1 << 24), i)
+        records.append({
+            "timeUnixNano": str(now_ns + i),
+            "severityNumber": 9,
+            "severityText": "INFO",
+            "body": {"stringValue": body}
+        })
+    return ({"resourceLogs": [{
+        "resource": resource(application, node),
+        "scopeLogs": [{"scope": SCOPE, "logRecords": records}]
+    }]}, count)
+
+def tracesPayload(application: str, node: str, count: int, now_ns: int) -> tuple[dict, int]:
+    spans = []
+    for _ in range(count):
+        duration_ns = int(random.expovariate(1 / 2_000_000))
+        spans.append({
+            "traceId": os.urandom(16).hex(),
+            "spanId": os.urandom(8).hex(),
+            "name": random.choice(SPAN_NAMES),
+            "kind": 2,
+            "startTimeUnixNano": str(now_ns - duration_ns),
+            "endTimeUnixNano": str(now_ns)
+        })
+    return ({"resourceSpans": [{
+        "resource": resource(application, node),
+        "scopeSpans": [{"scope": SCOPE, "spans": spans}]
+    }]}, count)
+
+def send(state: GeneratorState, endpoint: str, signal: str, payload: dict, items: int) -> None:
+    path, _, rejected_field = SIGNALS[signal]
+    request = urllib.request.Request(
+        endpoint + path,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    rejected_request = False
+    failed = False
+    rejected_items = 0
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            body = response.read()
+        if len(body) > 0:
+            partial = json.loads(body).get("partialSuccess", {})
+            rejected_items = int(partial.get(rejected_field, 0))
+    except urllib.error.HTTPError as e:
+        # 429 and 503 are the collector shedding load, the rest are errors
+        rejected_request = e.code in [429, 503]
+        failed = not rejected_request
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        failed = True
+    with state.lock:
+        counts = state.counts[signal]
+        counts.items += items
+        counts.requests += 1
+        counts.rejected_requests += 1 if rejected_request else 0
+        counts.rejected_items += items if rejected_request else rejected_items
+        counts.failed_requests += 1 if failed else 0
+
+def scrapeTelemetry(endpoint: str) -> dict[str, float]:
+    # Sums every sample of a metric across its labels, with the _total
+    # suffix of newer collectors removed
+    samples: dict[str, float] = {}
+    try:
+        with urllib.request.urlopen(endpoint, timeout=5) as response:
+            text = response.read().decode("utf-8")
+    except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+        LOGGER.warning(f"Could not scrape collector telemetry from {endpoint}: {e}")
+        return samples
+    for line in text.splitlines():
+        match = SAMPLE_PATTERN.match(line)
+        if match == None:
+            continue
+        name = match.group(1).removesuffix("_total")
+        try:
+            samples[name] = samples.get(name, 0.0) + float(match.group(2))
+        except ValueError:
+            continue
+    return samples
+
+def generate(args: argparse.Namespace, state: GeneratorState) -> float:
+    interval_s = args.interval_ms / 1000
+    nodes = [f"node-{i}" for i in range(args.nodes)]
+    ticks = int(args.duration / interval_s)
+    logs_per_tick = round(args.logs_per_second * interval_s)
+    spans_per_tick = round(args.spans_per_second * interval_s)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for tick in range(ticks):
+            now_ns = time.time_ns()
+            futures = []
+            for node in nodes:
+                futures.append(executor.submit(send, state, args.endpoint, "metrics", *metricsPayload(args.application, node, args.series, tick, now_ns)))
+                if logs_per_tick > 0:
+                    futures.append(executor.submit(send, state, args.endpoint, "logs", *logsPayload(args.application, node, logs_per_tick, now_ns)))
+                if spans_per_tick > 0:
+                    futures.append(executor.submit(send, state, args.endpoint, "traces", *tracesPayload(args.application, node, spans_per_tick, now_ns)))
+            for future in futures:
+                future.result()
+            # A late tick means the generator, not the collector, is the
+            # limit and the offered rate falls short of the target
+            delay = started + (tick + 1) * interval_s - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                state.late_ticks += 1
+    return time.monotonic() - started
+
+def report(args: argparse.Namespace, state: GeneratorState, elapsed: float, before: dict[str, float], after: dict[str, float]) -> None:
+    def delta(name: str) -> float:
+        return after.get(name, 0.0) - before.get(name, 0.0)
+    LOGGER.info(f"Offered load of {args.nodes} nodes for {elapsed:.1f}s, {state.late_ticks} late ticks")
+    for signal, (_, item_name, _) in SIGNALS.items():
+        counts = state.counts[signal]
+        if counts.requests == 0:
+            continue
+        failed = sum([delta(name.format(item_name)) for name in EXPORTER_FAILED])
+        LOGGER.info(
+            f"{signal}: offered {counts.items / elapsed:.0f}/s,"
+            f" rejected {counts.rejected_items / elapsed:.0f}/s ({counts.rejected_requests} requests),"
+            f" {counts.failed_requests} failed requests"
+        )
+        if len(after) == 0:
+            continue
+        LOGGER.info(
+            f"{signal}: collector accepted {delta(RECEIVER_ACCEPTED.format(item_name)) / elapsed:.0f}/s,"
+            f" refused {delta(RECEIVER_REFUSED.format(item_name)) / elapsed:.0f}/s,"
+            f" exported {delta(EXPORTER_SENT.format(item_name)) / elapsed:.0f}/s,"
+            f" dropped on export {failed / elapsed:.0f}/s"
+        )
+    if PROCESS_CPU in after:
+        LOGGER.info(
+            f"collector: {100 * delta(PROCESS_CPU) / elapsed:.0f}% CPU,"
+            f" {after.get(PROCESS_RSS, 0.0) / (1 << 20):.0f} MiB RSS"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drive a collector with the telemetry of N synthetic database nodes")
+    parser.add_argument("--nodes", type=int, default=3, help="Number of database nodes to imitate")
+    parser.add_argument("--application", default="cassandra", help="Application resource attribute of the nodes")
+    parser.add_argument("--endpoint", default=DEFAULT_OTLP_ENDPOINT, help="OTLP/HTTP endpoint of the collector")
+    parser.add_argument("--telemetry", default=DEFAULT_TELEMETRY_ENDPOINT, help="Prometheus endpoint of the collector's own metrics")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to generate load for")
+    parser.add_argument("--interval-ms", type=int, default=DEFAULT_INTERVAL_MS, help="JMX collection interval of each node")
+    parser.add_argument("--series", type=int, default=200, help="Metric series collected from each node per interval")
+    parser.add_argument("--logs-per-second", type=float, default=100, help="Log records from each node per second")
+    parser.add_argument("--spans-per-second", type=float, default=100, help="Spans from each node per second")
+    parser.add_argument("--workers", type=int, default=32, help="Concurrent export requests")
+    args = parser.parse_args()
+    state = GeneratorState()
+    before = scrapeTelemetry(args.telemetry)
+    elapsed = generate(args, state)
+    # Let the collector drain its batches and queues before the final scrape
+    time.sleep(max(5, 2 * args.interval_ms / 1000))
+    after = scrapeTelemetry(args.telemetry)
+    report(args, state, elapsed, before, after)
+
+if __name__ == "__main__":
+    main()
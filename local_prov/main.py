@@ -0,0 +1,178 @@
+import ipaddress
+import os
+import re
+import shlex
+import shutil
+import sys, logging, coloredlogs
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from urllib.parse import urlparse, unquote
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+env = Environment(
+    loader = FileSystemLoader("local_prov/templates"),
+    autoescape = select_autoescape()
+)
+
+coloredlogs.install(
+    level="DEBUG",
+    fmt="[%(asctime)s] [%(name)s] [%(levelname)s] :: %(message)s"
+)
+LOGGER = logging.getLogger("Local Provisioner")
+
+RSPEC_NAMESPACES = [
+    "http://www.geni.net/resources/rspec/3",
+    "http://www.protogeni.net/resources/rspec/ext/client/1",
+    "http://www.protogeni.net/resources/rspec/ext/emulab/1"
+]
+# Docker's own addressing for the bridge, node containers carry their
+# profile address on top of it
+DOCKER_SUBNET = "172.30.0.0/24"
+ARTIFACT_SERVICE = "artifacts"
+ARTIFACT_PORT = 8000
+# Copied verbatim next to the compose file
+STATIC_TEMPLATES = ["Dockerfile", "entrypoint.sh"]
+
+@dataclass
+class InstallService:
+    url: str
+    install_path: str
+
+@dataclass
+class ExecuteService:
+    shell: str
+    command: str
+
+@dataclass
+class LocalNode:
+    id: str
+    service: str
+    address: str
+    boot_script: str
+    installs: list[InstallService] = field(default_factory=list)
+    executes: list[ExecuteService] = field(default_factory=list)
+
+def removeNamespace(doc, namespace):
+    ns = u'{%s}' % namespace
+    nsl = len(ns)
+    for elem in doc.iter():
+        if elem.tag.startswith(ns):
+            elem.tag = elem.tag[nsl:]
+
+def serviceName(node_id: str) -> str:
+    # Compose service names are lowercase alphanumerics, '-' and '_'
+    return re.sub(r"[^a-z0-9_-]", "-", node_id.lower())
+
+def artifactUrl(url: str, artifact_dir: str) -> str:
+    # Artifacts present locally are served by the artifact container,
+    # anything else is still fetched from its origin
+    filename = unquote(PurePosixPath(urlparse(url).path).name)
+    if os.path.isfile(os.path.join(artifact_dir, filename)):
+        return f"http://{ARTIFACT_SERVICE}:{ARTIFACT_PORT}/{filename}"
+    LOGGER.warning(f"No local artifact {filename} in {artifact_dir}, fetching from {url}")
+    return url
+
+def servicesToShellScript(node: LocalNode, artifact_dir: str) -> str:
+    # CloudLab runs every install service before any execute service,
+    # and a failing service does not stop the ones after it
+    script_lines = ["#!/bin/bash"]
+    for i, install in enumerate(node.installs):
+        url = artifactUrl(install.url, artifact_dir)
+        filename = unquote(PurePosixPath(urlparse(url).path).name)
+        archive = f"/tmp/{filename}"
+        if (filename.endswith(".zip")):
+            unpack = f"unzip -o \"{archive}\" -d \"{install.install_path}\""
+        else:
+            unpack = f"tar -xf \"{archive}\" -C \"{install.install_path}\""
+        script_lines.extend([
+            f"echo \"[install {i}] {url} -> {install.install_path}\"",
+            f"sudo mkdir -p \"{install.install_path}\" \\",
+            f"    && wget -q -O \"{archive}\" \"{url}\" \\",
+            f"    && sudo {unpack} \\",
+            f"    || echo \"[install {i}] failed\" >&2",
+            f"rm -f \"{archive}\""
+        ])
+    for i, execute in enumerate(node.executes):
+        script_lines.extend([
+            f"echo \"[execute {i}]\"",
+            f"{execute.shell} -c {shlex.quote(execute.command)} || echo \"[execute {i}] failed with status $?\" >&2"
+        ])
+    return "\n".join(script_lines)
+
+def parseNode(child: ET.Element) -> LocalNode:
+    node_id = child.attrib["client_id"]
+    ip_node = child.find("./interface/ip")
+    if (ip_node == None):
+        LOGGER.error(f"Failed to extract ip for node {node_id}")
+        exit(1)
+    interface = ipaddress.IPv4Interface(f"{ip_node.attrib['address']}/{ip_node.attrib['netmask']}")
+    node = LocalNode(
+        id=node_id,
+        service=serviceName(node_id),
+        address=interface.with_prefixlen,
+        boot_script=f"{serviceName(node_id)}_boot_run.sh"
+    )
+    services = child.find("./services")
+    if (services == None):
+        LOGGER.error("Expected <services></services> tags in node but found none")
+        exit(1)
+    for service in services:
+        if (service.tag == "install"):
+            node.installs.append(InstallService(service.attrib["url"], service.attrib["install_path"]))
+        elif (service.tag == "execute"):
+            node.executes.append(ExecuteService(service.attrib["shell"], service.attrib["command"]))
+        else:
+            LOGGER.warning(f"Unknown service type '{service.tag}', skipping")
+    return node
+
+def main(profile_xml_path: str, artifact_dir: str, output_dir: str) -> None:
+    tree = ET.parse(profile_xml_path)
+    root = tree.getroot()
+    for namespace in RSPEC_NAMESPACES:
+        removeNamespace(root, namespace)
+    links = list(root.iterfind("link"))
+    if (len(links) != 1):
+        LOGGER.error(f"Expected a single LAN link in the profile but found {len(links)}")
+        exit(1)
+    link_id = links[0].attrib["client_id"]
+    nodes: list[LocalNode] = []
+    for child in root.iterfind("node"):
+        LOGGER.info(f"Provisioning node {child.attrib['client_id']}")
+        nodes.append(parseNode(child))
+    # Nodes reach each other by id and by CloudLab's <id>-<link> names,
+    # both resolving to the profile address
+    hosts: dict[str, str] = {}
+    for node in nodes:
+        address = str(ipaddress.IPv4Interface(node.address).ip)
+        hosts[node.id] = address
+        hosts[f"{node.id}-{link_id}"] = address
+    os.makedirs(output_dir, exist_ok=True)
+    for node in nodes:
+        with open(f"{output_dir}/{node.boot_script}", "w") as f:
+            f.write(servicesToShellScript(node, artifact_dir))
+        LOGGER.info(f"Written {node.id} boot script to {output_dir}/{node.boot_script}")
+    compose_content = env.get_template("docker-compose.yml.j2").render({
+        "project": PurePosixPath(profile_xml_path).stem.lower(),
+        "network": link_id.lower(),
+        "subnet": DOCKER_SUBNET,
+        "artifact_dir": os.path.abspath(artifact_dir),
+        "artifact_port": ARTIFACT_PORT,
+        "nodes": nodes,
+        "hosts": hosts
+    })
+    with open(f"{output_dir}/docker-compose.yml", "w") as f:
+        f.write(compose_content)
+    LOGGER.info(f"Written content to {output_dir}/docker-compose.yml")
+    for template in STATIC_TEMPLATES:
+        shutil.copyfile(
+            f"local_prov/templates/{template}",
+            f"{output_dir}/{template}"
+        )
+        LOGGER.info(f"Copied {template} to {output_dir}/{template}")
+
+if __name__ == "__main__":
+    if (len(sys.argv) != 4):
+        LOGGER.error(f"Usage: {sys.argv[0]} <cloudlab profile.xml path> <artifact dir> <output dir>")
+        exit(1)
+    main(sys.argv[1], sys.argv[2], sys.argv[3])
@@ -0,0 +1,21 @@
+#!/usr/bin/env bash
+# Brings a node container up the way CloudLab brings up a node: the
+# profile address on the LAN, a running docker daemon, then the profile
+# services exactly once
+
+# Docker will not hand out every address a profile uses (e.g. the
+# network address 10.0.0.0), so the profile address sits alongside the
+# one docker assigned on the same bridge
+ip addr add "$LAN_ADDRESS" dev eth0 label eth0:lan
+
+dockerd > /var/log/dockerd.log 2>&1 &
+until docker info > /dev/null 2>&1; do
+    sleep 1
+done
+
+if [ ! -f /var/lib/boot_run.done ]; then
+    /bin/bash /etc/boot_run.sh 2>&1 | tee /var/log/boot_run.log
+    touch /var/lib/boot_run.done
+fi
+
+exec sleep infinity
@@ -1,43 +1,48 @@
 import geni.portal as portal
-import geni.rspec.pg as pg 
-from provisioner.docker import DOCKER_PARAMETERS
-from provisioner.structure.cluster import CLUSTER_PARAMETERS
-from provisioner.application.app import APPLICATION_PARAMETERS
-from provisioner.parameters import ParameterGroup
+import geni.rspec.pg as pg
+from provisioner.structure.expansion import loadSnapshot, snapshotCluster, writeConfigDeltas, writeSnapshot
+from provisioner.generator import PARAMETER_GROUPS, validateParameters
 from provisioner.provisioner import Provisioner
-from provisioner.collector.collector import COLLECTOR_PARAMETERS
-from provisioner.application.variant.cassandra import CASSANDRA_PARAMETERS
-from provisioner.application.variant.hbase import HBASE_PARAMETERS
 
 OUTPUT_TO_FILE: bool = True
-APPLICATION_SPECIFIC_PARAMETERS: list[ParameterGroup] = [
-    CASSANDRA_PARAMETERS,
-    HBASE_PARAMETERS,
-]
-PARAMETER_GROUPS: list[ParameterGroup] = [
-    CLUSTER_PARAMETERS,
-    APPLICATION_PARAMETERS
-] + APPLICATION_SPECIFIC_PARAMETERS + [
-    COLLECTOR_PARAMETERS,
-    DOCKER_PARAMETERS
-]
+TOPOLOGY_SNAPSHOT_PATH: str = "./topology.json"
 
 def bindAndValidateParameters() -> portal.Namespace:
     for parameterGroup in PARAMETER_GROUPS:
         parameterGroup.bind()
     params: portal.Namespace = portal.context.bindParameters()
-    for parameterGroup in PARAMETER_GROUPS:
-        parameterGroup.validate(params)
+    validateParameters(params)
     portal.context.verifyParameters()
     return params
 
 def main() -> None:
     params: portal.Namespace = bindAndValidateParameters()
     request: pg.Request = portal.context.makeRequestRSpec()
-    provisioner: Provisioner = Provisioner(request, params)
-    provisioner.provision()
+    snapshot = None
+    if params.expand_topology_path != "":
+        snapshot = loadSnapshot(params.expand_topology_path)
+    provisioner: Provisioner = Provisioner(request, params, snapshot)
+    try:
+        cluster, collector = provisioner.provision()
+    except ValueError as e:
+        portal.context.reportError(portal.PortalError(str(e)))
+        exit(1)
     if OUTPUT_TO_FILE:
         request.writeXML("./profile.xml")
+        nodes = list(cluster.nodesGenerator())
+        collector_node = collector.node if collector != None else None
+        if snapshot != None:
+            existing_nodes = [
+                node for node in nodes + [collector_node]
+                if node != None and provisioner.isExistingNode(node.id)
+            ]
+            written = writeConfigDeltas(params.expand_delta_path, snapshot, existing_nodes)
+            print(f"Written configuration deltas for {len(written)} existing nodes to {params.expand_delta_path}")
+        # Taken after any expansion, so the cluster can be expanded again
+        writeSnapshot(
+            TOPOLOGY_SNAPSHOT_PATH,
+            snapshotCluster(params.application, cluster.topology, nodes, collector_node)
+        )
     else:
         portal.context.printRequestRSpec()
 
@@ -2,16 +2,16 @@ from abc import ABC, abstractmethod
 from enum import Enum
 from typing import Any, Optional
 from provisioner.application.config import bashEncoder, jsonEncoder
-from provisioner.collector.collector import OTELFeature
+from provisioner.collector.collector import OTELFeature, edgeLogsProtocol, exportTuningProperties, otelSystemProperties, traceSamplerProperties
 from provisioner.docker import DockerConfig
-from provisioner.structure.cluster import Cluster
+from provisioner.structure.cluster import Cluster, NameCache
 from provisioner.parameters import ParameterGroup, Parameter
 from provisioner.structure.node import Node
 from provisioner.topology import TopologyProperties
-from provisioner.utils import catToFile, chown, mkdir, sed
+from provisioner.utils import catToFile, chmod, chown, mkdir, sed
 import geni.portal as portal
 from geni.rspec import pg
-import string, random
+import hashlib
 
 class ApplicationVariant(Enum):
     CASSANDRA = "cassandra", True
@@ -24,6 +24,15 @@ class ApplicationVariant(Enum):
     def __str__(self) -> str:
         return "%s" % self.value[0]
 
+    @staticmethod
+    def fromName(name: str) -> "ApplicationVariant":
+        # Members are looked up by their value, as names do not always
+        # match it (e.g. MONGO_DB is "mongodb")
+        for member in ApplicationVariant:
+            if str(member) == name.lower():
+                return member
+        raise KeyError(f"Unknown application variant '{name}'")
+
     @staticmethod
     def provsionableMembers() -> list["ApplicationVariant"]:
         return list(filter(
@@ -35,6 +44,13 @@ VAR_LIB_PATH = "/var/lib"
 LOCAL_PATH = f"{VAR_LIB_PATH}/cluster"
 USERNAME = "cluster"
 GROUPNAME = "cluster"
+# Burst of the log bandwidth policer, at least a few full sized packets
+EDGE_LOGS_MIN_BURST_BYTES = 65536
+# Written whole and then merged into /etc/hosts, so an expansion replays
+# both on the existing nodes
+CLUSTER_HOSTS_BLOCK_PATH = "/etc/hosts.cluster"
+HOSTS_BLOCK_BEGIN = "# BEGIN cluster hosts"
+HOSTS_BLOCK_END = "# END cluster hosts"
 
 class AbstractApplication(ABC):
     version: str
@@ -63,6 +79,17 @@ class AbstractApplication(ABC):
         self.collector_features = params.collector_features
         self.params = params
 
+    @classmethod
+    def noisyLogPatterns(cls) -> list[str]:
+        # Regexes matching the bodies of high volume log records (e.g.
+        # compaction and GC) that are sampled before leaving the node
+        return []
+
+    def fragmentInputs(self) -> dict[str, Any]:
+        # Inputs of node installation beyond the parameters and cluster
+        # structure, e.g. files read during cluster level configuration
+        return {}
+
     def cloneRepo(self,
                   node: Node,
                   repo_url: str,
@@ -104,7 +131,9 @@ class AbstractApplication(ABC):
                 path=path
             ))
         else:
-            archive_name = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
+            # Derived from the source and destination so that regenerating
+            # a profile with the same parameters yields identical output
+            archive_name = hashlib.sha1(f"{url}:{path}".encode("utf-8")).hexdigest()[:10].upper()
             commands=[
                 f"sudo wget {url} -O {archive_name}.tar.gz",
                 f"sudo mkdir -p {path}",
@@ -146,6 +175,91 @@ class AbstractApplication(ABC):
             command=f"sudo groupadd -g 1000 {GROUPNAME} && sudo useradd -u 1000 -g 1000 -m -G sudo,docker {USERNAME}"
         ))
 
+    def installHostsFile(self, node: Node) -> None:
+        # Cluster hostnames resolve locally instead of through the testbed
+        # DNS, the block of a previous boot is replaced rather than repeated
+        nodes = list(self.topology_properties.db_nodes.values())
+        if self.topology_properties.collector != None:
+            nodes.append(self.topology_properties.collector)
+        entries = [f"{host.getInterfaceAddress()}\t{host.id}-LAN" for host in nodes]
+        catToFile(
+            node,
+            CLUSTER_HOSTS_BLOCK_PATH,
+            "\n".join([HOSTS_BLOCK_BEGIN] + entries + [HOSTS_BLOCK_END])
+        )
+        node.instance.addService(pg.Execute(
+            shell="/bin/bash",
+            command=f"sudo sed -i \"/^{HOSTS_BLOCK_BEGIN}$/,/^{HOSTS_BLOCK_END}$/d\" /etc/hosts && cat {CLUSTER_HOSTS_BLOCK_PATH} | sudo tee -a /etc/hosts"
+        ))
+        if NameCache(self.params.node_name_cache) == NameCache.NSCD:
+            # nscd watches /etc/hosts, so later changes are picked up
+            node.instance.addService(pg.Execute(
+                shell="/bin/bash",
+                command="sudo DEBIAN_FRONTEND=noninteractive apt-get install -y -q -o DPkg::Lock::Timeout=300 nscd && sudo systemctl enable --now nscd"
+            ))
+
+    def installClusterKey(self, node: Node) -> None:
+        cluster_key = self.topology_properties.cluster_key
+        if cluster_key == None:
+            return
+        ssh_path = f"/home/{USERNAME}/.ssh"
+        mkdir(node, ssh_path)
+        catToFile(node, f"{ssh_path}/id_ed25519", cluster_key.private_key)
+        catToFile(node, f"{ssh_path}/id_ed25519.pub", cluster_key.public_key)
+        catToFile(node, f"{ssh_path}/authorized_keys", cluster_key.public_key, append=True)
+        # Nodes are reprovisioned with new host keys on every experiment
+        catToFile(node, f"{ssh_path}/config", "\n".join([
+            "Host *",
+            "    StrictHostKeyChecking no",
+            "    UserKnownHostsFile /dev/null",
+            "    LogLevel ERROR"
+        ]))
+        chown(node, ssh_path, USERNAME, GROUPNAME, recursive=True)
+        chmod(node, ssh_path, 0o700)
+        for filename in ["id_ed25519", "authorized_keys", "config"]:
+            chmod(node, f"{ssh_path}/{filename}", 0o600)
+
+    def writeOTELProperties(self, node: Node, path: str) -> None:
+        # Java properties files keep the last value of a key, so these
+        # take precedence over any export settings of the release
+        collector_address = ""
+        if self.topology_properties.collector != None:
+            collector_address = self.topology_properties.collector.id + "-LAN"
+        catToFile(
+            node,
+            path,
+            otelSystemProperties(exportTuningProperties(self.params, collector_address)),
+            append=True
+        )
+
+    def writeLogPipelineConfig(self, node: Node, collector_address: str) -> dict[str, Any]:
+        # Imported here, the collection configs depend on this module
+        from provisioner.collector.collection_config import OTEL_CONFIG_FRAGMENTS_PATH, logPipelineFragment, writeCollectorConfigFragment
+        writeCollectorConfigFragment(
+            node,
+            "edge-logs",
+            logPipelineFragment(self.params, collector_address, self.noisyLogPatterns())
+        )
+        properties = {"OTEL_CONFIG_FRAGMENTS_PATH": OTEL_CONFIG_FRAGMENTS_PATH}
+        bandwidth_kbps = self.params.collector_log_bandwidth_kbps
+        if bandwidth_kbps == 0 or self.topology_properties.collector == None:
+            return properties
+        collector_ip = self.topology_properties.collector.getInterfaceAddress()
+        port = edgeLogsProtocol(self.params).port()
+        # Polices only the log flow to the collector on the egress hook,
+        # leaving the root qdisc and all other traffic untouched. Dropped
+        # packets back the exporter off into its retrying queue
+        burst_bytes = max(EDGE_LOGS_MIN_BURST_BYTES, bandwidth_kbps * 1000 // 8 // 10)
+        node.instance.addService(pg.Execute(
+            shell="/bin/bash",
+            command="\n".join([
+                f"DEV=$(ip -o route get {collector_ip} | grep -oP 'dev \\K\\S+')",
+                "sudo tc qdisc replace dev $DEV clsact",
+                f"sudo tc filter replace dev $DEV egress protocol ip prio 1 handle 800::1 u32 match ip dst {collector_ip}/32 match ip dport {port} 0xffff action police rate {bandwidth_kbps}kbit burst {burst_bytes} conform-exceed drop"
+            ])
+        ))
+        return properties
+
     def bootstrapNode(self,
                       node: Node,
                       properties: dict[str, Any],
@@ -154,10 +268,10 @@ class AbstractApplication(ABC):
         if self.topology_properties.collector != None:
             collector_address = self.topology_properties.collector.id + "-LAN"
         # Ensure the collector exports data for enabled features
-        for feat in self.collector_features:
+        for feat in sorted(self.collector_features, key=str):
             properties[f"OTEL_{str(feat).upper()}_EXPORTER"] = "otlp"
         if OTELFeature.TRACES in self.collector_features:
-            properties["OTEL_TRACES_SAMPLER"] = "always_on"
+            properties.update(traceSamplerProperties(self.params, collector_address))
         properties["INSTALL_PATH"] = LOCAL_PATH
         properties["APPLICATION_VARIANT"] = str(self.variant())
         properties["APPLICATION_VERSION"] = self.version
@@ -165,9 +279,11 @@ class AbstractApplication(ABC):
         properties["EBPF_NET_INTAKE_HOST"] = collector_address
         properties["EBPF_NET_INTAKE_PORT"] = 8000
         if (self.variant() != ApplicationVariant.OTEL_COLLECTOR):
-            properties["OTEL_EXPORTER_OTLP_ENDPOINT"] = f"http://{collector_address}:4318"
+            properties.update(exportTuningProperties(self.params, collector_address))
             properties["OTEL_SERVICES_NAME"] = f"{self.variant()}-{node.id}"
             properties["OTEL_RESOURCE_ATTRIBUTES"] = f"application={self.variant()},node={node.id}"
+            if OTELFeature.LOGS in self.collector_features:
+                properties.update(self.writeLogPipelineConfig(node, collector_address))
         properties["LD_LIBRARY_PATH"] = "/var/lib/kairos/lib:$LD_LIBRARY_PATH"
         self._writeEnvFile(
             node,
@@ -211,7 +327,9 @@ class AbstractApplication(ABC):
 
     @abstractmethod
     def nodeInstallApplication(self, node: Node) -> None:
+        self.installHostsFile(node)
         self.createClusterUser(node)
+        self.installClusterKey(node)
 
 class ApplicationParameterGroup(ParameterGroup):
 
@@ -0,0 +1,253 @@
+import re
+import geni.portal as portal
+from typing import Any
+from provisioner.parameters import Parameter, ParameterGroup
+
+# Shapes accepted for cassandra.yaml tuning values
+DATA_SIZE_PATTERN: re.Pattern = re.compile("^[0-9]+(B|KiB|MiB|GiB)$")
+DATA_RATE_PATTERN: re.Pattern = re.compile("^[0-9]+(B|KiB|MiB)/s$")
+DURATION_PATTERN: re.Pattern = re.compile("^[0-9]+(ms|s|m|h)$")
+UNSET_TUNING_VALUE = "default"
+
+# Named sets of cassandra.yaml overrides, explicitly set tuning
+# parameters take precedence over these
+CASSANDRA_TUNING_PRESETS: dict[str, dict[str, Any]] = {
+    "write-heavy": {
+        "concurrent_writes": 128,
+        "concurrent_counter_writes": 64,
+        "concurrent_compactors": 8,
+        "memtable_allocation_type": "offheap_objects",
+        "memtable_flush_writers": 4,
+        "compaction_throughput": "128MiB/s",
+        "trickle_fsync": "true",
+        "trickle_fsync_interval": "10240KiB",
+        "commitlog_sync": "periodic",
+        "commitlog_sync_period": "10000ms",
+        "commitlog_segment_size": "64MiB",
+        "commitlog_total_space": "16384MiB",
+    },
+    "read-heavy": {
+        "concurrent_reads": 128,
+        "concurrent_compactors": 4,
+        "memtable_allocation_type": "offheap_buffers",
+        "compaction_throughput": "64MiB/s",
+        "file_cache_size": "2048MiB",
+        "networking_cache_size": "256MiB",
+    },
+    "low-latency": {
+        "concurrent_reads": 64,
+        "concurrent_writes": 64,
+        "concurrent_compactors": 2,
+        "memtable_allocation_type": "offheap_objects",
+        "compaction_throughput": "32MiB/s",
+        "trickle_fsync": "true",
+        "trickle_fsync_interval": "1024KiB",
+        "internode_compression": "none",
+    },
+}
+
+# Client consistency levels, LOCAL_* levels keep requests within the
+# coordinator's datacentre
+CONSISTENCY_LEVELS: list[str] = ["ONE", "LOCAL_ONE", "QUORUM", "LOCAL_QUORUM", "EACH_QUORUM", "ALL"]
+
+def replicationStrategy(datacentres: list[str], rf: int) -> str:
+    # Every datacentre holds rf replicas, so LOCAL_* consistency levels
+    # can be satisfied without leaving the datacentre
+    replication = ", ".join([f"'{dc}': {rf}" for dc in datacentres])
+    return f"{{'class': 'NetworkTopologyStrategy', {replication}}}"
+
+class CassandraParameters(ParameterGroup):
+
+    def __init__(self):
+        super().__init__(parameters=[
+            Parameter(
+                name="cassandra_ycsb_rf",
+                description="Replication factor for YCSB keyspace",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=0
+            ),
+            Parameter(
+                name="cassandra_ycsb_read_consistency",
+                description="Consistency level of YCSB reads",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue="LOCAL_ONE",
+                legalValues=[(level, level) for level in CONSISTENCY_LEVELS]
+            ),
+            Parameter(
+                name="cassandra_ycsb_write_consistency",
+                description="Consistency level of YCSB writes",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue="LOCAL_ONE",
+                legalValues=[(level, level) for level in CONSISTENCY_LEVELS]
+            ),
+        ])
+
+    def validate(self, params: portal.Namespace) -> None:
+        super().validate(params)
+        if params.cassandra_ycsb_read_consistency == "EACH_QUORUM":
+            portal.context.reportError(portal.ParameterError(
+                "EACH_QUORUM is only supported for writes",
+                ["cassandra_ycsb_read_consistency"]
+            ))
+        nodes_per_dc = params.racks_per_dc * params.nodes_per_rack
+        if params.cassandra_ycsb_rf == 0:
+            params.cassandra_ycsb_rf = nodes_per_dc
+        elif params.cassandra_ycsb_rf > nodes_per_dc:
+            portal.context.reportError(portal.ParameterError(
+                f"Replication factor {params.cassandra_ycsb_rf} must be less than or equal to number of nodes in dc {nodes_per_dc}",
+                ["cassandra_ycsb_rf"]
+            ))
+
+    @classmethod
+    def name(cls) -> str:
+        return "Cassandra"
+
+    @classmethod
+    def id(cls) -> str:
+        return "cassandra"
+
+CASSANDRA_PARAMETERS: ParameterGroup = CassandraParameters()
+
+class CassandraTuningParameters(ParameterGroup):
+    # Tuning parameter name to the cassandra.yaml key it overrides
+    YAML_KEYS: dict[str, str] = {
+        "cassandra_concurrent_reads": "concurrent_reads",
+        "cassandra_concurrent_writes": "concurrent_writes",
+        "cassandra_concurrent_counter_writes": "concurrent_counter_writes",
+        "cassandra_concurrent_compactors": "concurrent_compactors",
+        "cassandra_memtable_allocation_type": "memtable_allocation_type",
+        "cassandra_memtable_flush_writers": "memtable_flush_writers",
+        "cassandra_memtable_heap_space": "memtable_heap_space",
+        "cassandra_memtable_offheap_space": "memtable_offheap_space",
+        "cassandra_compaction_throughput": "compaction_throughput",
+        "cassandra_trickle_fsync": "trickle_fsync",
+        "cassandra_trickle_fsync_interval": "trickle_fsync_interval",
+        "cassandra_commitlog_sync": "commitlog_sync",
+        "cassandra_commitlog_sync_period": "commitlog_sync_period",
+        "cassandra_commitlog_segment_size": "commitlog_segment_size",
+        "cassandra_commitlog_total_space": "commitlog_total_space",
+        "cassandra_commitlog_disk_access_mode": "commitlog_disk_access_mode",
+        "cassandra_file_cache_size": "file_cache_size",
+        "cassandra_networking_cache_size": "networking_cache_size",
+        "cassandra_internode_compression": "internode_compression",
+    }
+    # Tuning parameter name to the pattern a value must match
+    PATTERNS: dict[str, re.Pattern] = {
+        "cassandra_memtable_heap_space": DATA_SIZE_PATTERN,
+        "cassandra_memtable_offheap_space": DATA_SIZE_PATTERN,
+        "cassandra_compaction_throughput": DATA_RATE_PATTERN,
+        "cassandra_trickle_fsync_interval": DATA_SIZE_PATTERN,
+        "cassandra_commitlog_sync_period": DURATION_PATTERN,
+        "cassandra_commitlog_segment_size": DATA_SIZE_PATTERN,
+        "cassandra_commitlog_total_space": DATA_SIZE_PATTERN,
+        "cassandra_file_cache_size": DATA_SIZE_PATTERN,
+        "cassandra_networking_cache_size": DATA_SIZE_PATTERN,
+    }
+
+    def __init__(self):
+        super().__init__(parameters=[
+            Parameter(
+                name="cassandra_tuning_preset",
+                description="Named set of cassandra.yaml overrides to apply, explicitly set tuning parameters take precedence",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue="none",
+                legalValues=[("none", "None")] + [(preset, preset.replace("-", " ").title()) for preset in CASSANDRA_TUNING_PRESETS.keys()]
+            ),
+            self.countParameter("cassandra_concurrent_reads", "Number of concurrent read operations per node"),
+            self.countParameter("cassandra_concurrent_writes", "Number of concurrent write operations per node"),
+            self.countParameter("cassandra_concurrent_counter_writes", "Number of concurrent counter write operations per node"),
+            self.countParameter("cassandra_concurrent_compactors", "Number of concurrent compactions per node"),
+            self.choiceParameter(
+                "cassandra_memtable_allocation_type",
+                "Memtable memory allocation strategy",
+                ["heap_buffers", "offheap_buffers", "offheap_objects", "unslabbed_heap_buffers"]
+            ),
+            self.countParameter("cassandra_memtable_flush_writers", "Number of memtable flush writer threads"),
+            self.valueParameter("cassandra_memtable_heap_space", "On-heap memtable space (e.g. 2048MiB)"),
+            self.valueParameter("cassandra_memtable_offheap_space", "Off-heap memtable space (e.g. 2048MiB)"),
+            self.valueParameter("cassandra_compaction_throughput", "Compaction throughput limit across the node (e.g. 64MiB/s)"),
+            self.choiceParameter("cassandra_trickle_fsync", "Fsync periodically during sequential writes", ["true", "false"]),
+            self.valueParameter("cassandra_trickle_fsync_interval", "Amount written between trickle fsyncs (e.g. 10240KiB)"),
+            self.choiceParameter("cassandra_commitlog_sync", "Commitlog sync mode", ["periodic", "batch", "group"]),
+            self.valueParameter("cassandra_commitlog_sync_period", "Period between commitlog syncs in periodic mode (e.g. 10000ms)"),
+            self.valueParameter("cassandra_commitlog_segment_size", "Size of each commitlog segment (e.g. 32MiB)"),
+            self.valueParameter("cassandra_commitlog_total_space", "Total space used by commitlogs (e.g. 8192MiB)"),
+            self.choiceParameter("cassandra_commitlog_disk_access_mode", "Commitlog disk access mode", ["auto", "mmap", "standard", "direct"]),
+            self.valueParameter("cassandra_file_cache_size", "Chunk cache size for SSTable reads (e.g. 512MiB)"),
+            self.valueParameter("cassandra_networking_cache_size", "Networking buffer pool size (e.g. 128MiB)"),
+            self.choiceParameter("cassandra_internode_compression", "Internode traffic compression", ["all", "dc", "none"]),
+        ])
+
+    @staticmethod
+    def countParameter(name: str, description: str) -> Parameter:
+        return Parameter(
+            name=name,
+            description=f"{description} (0 implies preset or release default)",
+            typ=portal.ParameterType.INTEGER,
+            required=False,
+            defaultValue=0,
+            advanced=True
+        )
+
+    @staticmethod
+    def valueParameter(name: str, description: str) -> Parameter:
+        return Parameter(
+            name=name,
+            description=f"{description} (Absent implies preset or release default)",
+            typ=portal.ParameterType.STRING,
+            required=False,
+            defaultValue=None,
+            advanced=True
+        )
+
+    @staticmethod
+    def choiceParameter(name: str, description: str, choices: list[str]) -> Parameter:
+        return Parameter(
+            name=name,
+            description=description,
+            typ=portal.ParameterType.STRING,
+            required=False,
+            defaultValue=UNSET_TUNING_VALUE,
+            legalValues=[(UNSET_TUNING_VALUE, "Preset or release default")] + [(choice, choice) for choice in choices],
+            advanced=True
+        )
+
+    def validate(self, params: portal.Namespace) -> None:
+        super().validate(params)
+        properties: dict[str, str] = {}
+        preset: str = params.cassandra_tuning_preset
+        for key, value in CASSANDRA_TUNING_PRESETS.get(preset, {}).items():
+            properties[key] = str(value)
+        for name, key in self.YAML_KEYS.items():
+            value = params.__dict__[name]
+            if value == None or value == 0 or value == UNSET_TUNING_VALUE:
+                continue
+            if isinstance(value, int) and value < 0:
+                portal.context.reportError(portal.ParameterError(
+                    f"Parameter '{name}' must be positive",
+                    [name]
+                ))
+                continue
+            pattern = self.PATTERNS.get(name)
+            if pattern != None and pattern.match(str(value)) == None:
+                portal.context.reportError(portal.ParameterError(
+                    f"Parameter '{name}' has invalid value '{value}', must match {pattern.pattern}",
+                    [name]
+                ))
+                continue
+            properties[key] = str(value)
+        params.cassandra_yaml_properties = properties
+
+    @classmethod
+    def name(cls) -> str:
+        return "Cassandra Tuning"
+
+    @classmethod
+    def id(cls) -> str:
+        return "cassandra_tuning"
+
+CASSANDRA_TUNING_PARAMETERS: ParameterGroup = CassandraTuningParameters()
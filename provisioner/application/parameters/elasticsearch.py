@@ -0,0 +1,84 @@
+import geni.portal as portal
+from provisioner.application.app import ApplicationVariant
+from provisioner.parameters import Parameter, ParameterGroup
+from provisioner.structure.placement import PlacementPolicy
+
+class ElasticsearchParameters(ParameterGroup):
+
+    def __init__(self):
+        super().__init__(parameters=[
+            Parameter(
+                name="elasticsearch_master_count",
+                description="Number of master-eligible nodes, must be odd (0 implies 3, or 1 for clusters of fewer than 3 nodes)",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=0
+            ),
+            Parameter(
+                name="elasticsearch_master_placement",
+                description="Placement of the master-eligible nodes",
+                longDescription="dedicated places them on nodes of their own, co-located on the least loaded data nodes and spread on data nodes spread across the racks",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue=str(PlacementPolicy.SPREAD),
+                legalValues=[(str(policy), str(policy)) for policy in PlacementPolicy]
+            ),
+            Parameter(
+                name="elasticsearch_coordinating_count",
+                description="Number of dedicated coordinating only nodes the benchmark clients send requests to (0 sends them to the data nodes)",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=0
+            ),
+            Parameter(
+                name="elasticsearch_shards_per_data_node",
+                description="Primary shards of the benchmark index per data node (0 implies one per 4 cores of the node type, or 1 if unknown)",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=0
+            ),
+            Parameter(
+                name="elasticsearch_replicas",
+                description="Replicas of each shard of the benchmark index (-1 implies 1, or 0 with a single data node)",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=-1
+            ),
+        ])
+
+    def validate(self, params: portal.Namespace) -> None:
+        super().validate(params)
+        self.validateNotNegative(params, ["elasticsearch_master_count", "elasticsearch_coordinating_count", "elasticsearch_shards_per_data_node"])
+        if params.elasticsearch_master_count > 0 and params.elasticsearch_master_count % 2 == 0:
+            # An even count adds a node without tolerating another failure
+            portal.context.reportError(portal.ParameterError(
+                f"Master count {params.elasticsearch_master_count} must be odd, so elections can always form a majority",
+                ["elasticsearch_master_count"]
+            ))
+        data_nodes = params.dc_count * params.racks_per_dc * params.nodes_per_rack
+        if params.elasticsearch_replicas < -1:
+            portal.context.reportError(portal.ParameterError(
+                "Replicas must be positive, or -1 to derive them",
+                ["elasticsearch_replicas"]
+            ))
+        elif params.elasticsearch_replicas >= max(1, data_nodes):
+            # Replicas are never allocated to the node holding the primary
+            portal.context.reportError(portal.ParameterError(
+                f"Replicas {params.elasticsearch_replicas} cannot be allocated with {data_nodes} data nodes",
+                ["elasticsearch_replicas"]
+            ))
+        self.validatePlacement(
+            params,
+            ApplicationVariant.ELASTICSEARCH,
+            ["elasticsearch_master_count", "elasticsearch_master_placement"]
+        )
+
+    @classmethod
+    def name(cls) -> str:
+        return "Elasticsearch"
+
+    @classmethod
+    def id(cls) -> str:
+        return "elasticsearch"
+
+ELASTICSEARCH_PARAMETERS: ParameterGroup = ElasticsearchParameters()
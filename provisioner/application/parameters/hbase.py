@@ -0,0 +1,335 @@
+import math
+import re
+import geni.portal as portal
+from provisioner.application.app import ApplicationVariant
+from provisioner.hardware import lookupHardware
+from provisioner.parameters import Parameter, ParameterGroup
+from provisioner.structure.placement import PlacementError, PlacementPolicy, parseAntiAffinity
+from provisioner.structure.variant.hbase_roles import HBaseNodeRole, ZookeeperDCStrategy
+
+# Split point generators for pre-splitting benchmark tables, "ycsb"
+# matches the "user<number>" keys YCSB generates
+PRESPLIT_ALGORITHMS: list[str] = ["ycsb", "UniformSplit", "HexStringSplit"]
+
+# HDFS accepts sizes with an optional binary prefix suffix
+HDFS_SIZE_PATTERN: re.Pattern = re.compile("^[0-9]+[kmgtKMGT]?$")
+HDFS_MAX_REPLICATION = 3
+# The master and the NameNode are the roles whose loss or contention
+# stalls the whole cluster, so they get a node each
+DEFAULT_ANTI_AFFINITY = f"{HBaseNodeRole.HBASE_MASTER}:{HBaseNodeRole.HDFS_NAME}"
+
+class HBaseParameters(ParameterGroup):
+
+    def __init__(self):
+        super().__init__(parameters=[
+            Parameter(
+                name="hbase_client_max_total_tasks",
+                description="Maximum number of concurrent mutation tasks a single HTable instance will send to the cluster",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=100,
+            ),
+            Parameter(
+                name="hbase_client_max_perserver_tasks",
+                description="Maximum number of concurrent mutation tasks a single HTable instance wil send to a single region server",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=2,
+            ),
+            Parameter(
+                name="hbase_client_max_perregion_tasks",
+                description="Maximum number of concurrent mutation tasks that the client will maintain to a single region. if there is already this many writes in progress for this region, new puts won't be sent to this region until some writes finish",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=1,
+            ),
+            Parameter(
+                name="hbase_hadoop_version",
+                description="Version of Hadoop to install and configure for HBase to run on top of.",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue="3.4.2",
+            ),
+            Parameter(
+                name="hbase_benchmark_tables",
+                description="Comma separated benchmark tables to create before the load phase",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue="usertable",
+            ),
+            Parameter(
+                name="hbase_benchmark_column_family",
+                description="Column family of the benchmark tables",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue="family",
+            ),
+            Parameter(
+                name="hbase_presplit_regions_per_server",
+                description="Number of regions per region server to pre-split benchmark tables into (0 disables table bootstrapping)",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=10,
+            ),
+            Parameter(
+                name="hbase_presplit_algorithm",
+                description="Key distribution to place split points with",
+                longDescription="ycsb places split points evenly over YCSB's user<number> keys, UniformSplit evenly over raw byte keys and HexStringSplit evenly over hex string keys",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue="ycsb",
+                legalValues=[(algorithm, algorithm) for algorithm in PRESPLIT_ALGORITHMS],
+            ),
+            Parameter(
+                name="hbase_balance_before_load",
+                description="Run the balancer after creating benchmark tables so regions are spread before the load phase",
+                typ=portal.ParameterType.BOOLEAN,
+                required=False,
+                defaultValue=True,
+            ),
+            Parameter(
+                name="hbase_role_isolation",
+                description="Confine each role on a node to its own cpus and memory, split by the expected cost of the role (needs a known node type)",
+                longDescription="Every role gets a systemd slice with disjoint physical cores and a memory limit, so co-located DataNodes and RegionServers stop contending with each other",
+                typ=portal.ParameterType.BOOLEAN,
+                required=False,
+                defaultValue=True,
+            ),
+            Parameter(
+                name="hbase_reserved_cores",
+                description="Physical cores (with their hyperthreads) left out of every role's cpus for the OS and OTEL agents",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=1,
+                advanced=True,
+            ),
+            Parameter(
+                name="hbase_reserved_memory_gib",
+                description="Memory in GiB left out of every role's limit for the OS and OTEL agents (0 implies the larger of 2GiB and 10% of the node memory)",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=0,
+                advanced=True,
+            )
+        ])
+
+    def validate(self, params: portal.Namespace) -> None:
+        super().validate(params)
+        if params.hbase_presplit_regions_per_server < 0:
+            portal.context.reportError(portal.ParameterError(
+                "Pre-split regions per server must not be negative",
+                ["hbase_presplit_regions_per_server"]
+            ))
+        if params.hbase_presplit_regions_per_server > 0 and params.hbase_benchmark_tables.strip() == "":
+            portal.context.reportError(portal.ParameterError(
+                "At least one benchmark table is required to pre-split",
+                ["hbase_benchmark_tables"]
+            ))
+        self.validateNotNegative(params, ["hbase_reserved_cores", "hbase_reserved_memory_gib"])
+        hardware = lookupHardware(params.node_size)
+        if params.application != str(ApplicationVariant.HBASE) or not params.hbase_role_isolation or hardware == None:
+            return
+        if params.hbase_reserved_cores >= hardware.cores:
+            portal.context.reportError(portal.ParameterError(
+                f"Reserved cores {params.hbase_reserved_cores} leaves no cores for HBase roles on {hardware.name} nodes with {hardware.cores} cores",
+                ["hbase_reserved_cores"]
+            ))
+        if params.hbase_reserved_memory_gib >= hardware.memory_gib:
+            portal.context.reportError(portal.ParameterError(
+                f"Reserved memory {params.hbase_reserved_memory_gib}GiB leaves no memory for HBase roles on {hardware.name} nodes with {hardware.memory_gib}GiB",
+                ["hbase_reserved_memory_gib"]
+            ))
+
+    @classmethod
+    def name(cls) -> str:
+        return "HBase"
+
+    @classmethod
+    def id(cls) -> str:
+        return "hbase"
+
+HBASE_PARAMETERS: ParameterGroup = HBaseParameters()
+
+class HDFSTuningParameters(ParameterGroup):
+
+    def __init__(self):
+        super().__init__(parameters=[
+            Parameter(
+                name="hdfs_replication",
+                description="HDFS block replication factor (0 derives it from the rack count)",
+                longDescription=f"A single rack uses a replication of 1, multiple racks use {HDFS_MAX_REPLICATION} (bounded by the number of DataNodes) so blocks survive the loss of a rack",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=0,
+            ),
+            Parameter(
+                name="hdfs_block_size",
+                description="HDFS block size, optionally suffixed with k, m, g or t",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue="128m",
+            ),
+            Parameter(
+                name="hdfs_namenode_handler_count",
+                description="Number of NameNode RPC handler threads (0 derives 20 * ln(DataNode count))",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=0,
+                advanced=True,
+            ),
+            Parameter(
+                name="hdfs_datanode_handler_count",
+                description="Number of DataNode RPC handler threads",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=10,
+                advanced=True,
+            ),
+            Parameter(
+                name="hdfs_short_circuit_reads",
+                description="Read blocks held by the local DataNode directly from disk rather than over a socket",
+                typ=portal.ParameterType.BOOLEAN,
+                required=False,
+                defaultValue=True,
+            ),
+            Parameter(
+                name="hdfs_domain_socket_path",
+                description="UNIX domain socket the DataNode passes short-circuit file descriptors over",
+                longDescription="Every directory in the path must be owned by root or the HDFS user and not writable by others",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue="/var/lib/hadoop-hdfs/dn_socket",
+                advanced=True,
+            ),
+        ])
+
+    def validate(self, params: portal.Namespace) -> None:
+        super().validate(params)
+        # Every cluster node runs a DataNode
+        data_nodes = params.dc_count * params.racks_per_dc * params.nodes_per_rack
+        racks = params.dc_count * params.racks_per_dc
+        if params.hdfs_replication == 0:
+            params.hdfs_replication = 1 if racks <= 1 else min(HDFS_MAX_REPLICATION, data_nodes)
+        elif params.hdfs_replication < 0 or params.hdfs_replication > data_nodes:
+            portal.context.reportError(portal.ParameterError(
+                f"Replication factor {params.hdfs_replication} must be between 1 and the number of DataNodes {data_nodes}",
+                ["hdfs_replication"]
+            ))
+        if HDFS_SIZE_PATTERN.match(str(params.hdfs_block_size)) == None:
+            portal.context.reportError(portal.ParameterError(
+                f"Block size '{params.hdfs_block_size}' must be a number optionally suffixed with k, m, g or t",
+                ["hdfs_block_size"]
+            ))
+        if params.hdfs_namenode_handler_count == 0:
+            params.hdfs_namenode_handler_count = max(10, int(20 * math.log(max(1, data_nodes))))
+        for name in ["hdfs_namenode_handler_count", "hdfs_datanode_handler_count"]:
+            if params.__dict__[name] < 1:
+                portal.context.reportError(portal.ParameterError(
+                    "Handler count must be positive",
+                    [name]
+                ))
+        if params.hdfs_short_circuit_reads and not str(params.hdfs_domain_socket_path).startswith("/"):
+            portal.context.reportError(portal.ParameterError(
+                "Domain socket path must be absolute",
+                ["hdfs_domain_socket_path"]
+            ))
+
+    @classmethod
+    def name(cls) -> str:
+        return "HDFS Tuning"
+
+    @classmethod
+    def id(cls) -> str:
+        return "hdfs_tuning"
+
+HDFS_TUNING_PARAMETERS: ParameterGroup = HDFSTuningParameters()
+
+class HBasePlacementParameters(ParameterGroup):
+
+    @staticmethod
+    def placementParameter(name: str, description: str, default: PlacementPolicy) -> Parameter:
+        return Parameter(
+            name=name,
+            description=description,
+            longDescription="dedicated places the roles on nodes of their own (shared with other dedicated roles where the anti-affinity rules allow), co-located on the least loaded data nodes and spread on data nodes spread across the racks",
+            typ=portal.ParameterType.STRING,
+            required=False,
+            defaultValue=str(default),
+            legalValues=[(str(policy), str(policy)) for policy in PlacementPolicy],
+        )
+
+    def __init__(self):
+        super().__init__(parameters=[
+            HBasePlacementParameters.placementParameter(
+                "hbase_master_placement",
+                "Placement of the HBase master",
+                PlacementPolicy.DEDICATED
+            ),
+            HBasePlacementParameters.placementParameter(
+                "hbase_hdfs_auxiliary_placement",
+                "Placement of the HDFS NameNode, ResourceManager and MapReduce history server",
+                PlacementPolicy.DEDICATED
+            ),
+            HBasePlacementParameters.placementParameter(
+                "hbase_zookeeper_placement",
+                "Placement of the ZooKeeper quorum",
+                PlacementPolicy.DEDICATED
+            ),
+            Parameter(
+                name="hbase_zookeeper_dc_strategy",
+                description="Distribution of the ZooKeeper quorum over datacentres",
+                longDescription="spread uses every datacentre, primary keeps the whole quorum in the datacentre hosting the master and majority keeps a majority there with the remainder in other datacentres, so commits never wait on inter-datacentre round trips",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue=str(ZookeeperDCStrategy.MAJORITY),
+                legalValues=[(str(strategy), str(strategy)) for strategy in ZookeeperDCStrategy],
+            ),
+            Parameter(
+                name="hbase_inter_dc_latency_ms",
+                description="Expected round trip latency between datacentres in milliseconds (0 for co-located datacentres)",
+                longDescription="Used to size the ZooKeeper sync and init limits so followers in remote datacentres are not dropped from the quorum",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=0,
+                advanced=True,
+            ),
+            Parameter(
+                name="hbase_anti_affinity",
+                description="Comma separated <role>:<role> pairs of roles that may not share a node",
+                longDescription=f"Roles are {', '.join([str(role) for role in HBaseNodeRole])}. The default hbase_master:hdfs_name keeps the master and NameNode on separate dedicated nodes",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue=DEFAULT_ANTI_AFFINITY,
+            ),
+        ])
+
+    def validate(self, params: portal.Namespace) -> None:
+        super().validate(params)
+        if params.hbase_inter_dc_latency_ms < 0:
+            portal.context.reportError(portal.ParameterError(
+                "Inter-datacentre latency must not be negative",
+                ["hbase_inter_dc_latency_ms"]
+            ))
+        roles = [str(role) for role in HBaseNodeRole]
+        try:
+            for rule in parseAntiAffinity(params.hbase_anti_affinity):
+                unknown = [role for role in rule if role not in roles]
+                if len(unknown) > 0:
+                    raise PlacementError(f"Unknown role(s) {', '.join(sorted(unknown))} in anti-affinity rules")
+        except PlacementError as e:
+            portal.context.reportError(portal.ParameterError(
+                str(e),
+                ["hbase_anti_affinity"]
+            ))
+            return
+        self.validatePlacement(params, ApplicationVariant.HBASE, ["hbase_anti_affinity"])
+
+    @classmethod
+    def name(cls) -> str:
+        return "HBase Placement"
+
+    @classmethod
+    def id(cls) -> str:
+        return "hbase_placement"
+
+HBASE_PLACEMENT_PARAMETERS: ParameterGroup = HBasePlacementParameters()
@@ -0,0 +1,79 @@
+import geni.portal as portal
+from provisioner.application.app import ApplicationVariant
+from provisioner.parameters import Parameter, ParameterGroup
+from provisioner.structure.placement import PlacementPolicy
+
+class MongoDBParameters(ParameterGroup):
+
+    def __init__(self):
+        super().__init__(parameters=[
+            Parameter(
+                name="mongodb_replica_set_size",
+                description="Target number of members in each shard replica set, used to derive the shard count",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=3
+            ),
+            Parameter(
+                name="mongodb_shard_count",
+                description="Number of shards, the data nodes are divided between them (0 implies data nodes / replica set size)",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=0
+            ),
+            Parameter(
+                name="mongodb_config_server_count",
+                description="Number of config server replica set members (0 implies up to 3)",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=0
+            ),
+            Parameter(
+                name="mongodb_config_server_placement",
+                description="Placement of the config servers",
+                longDescription="dedicated places them on nodes of their own, co-located on the least loaded data nodes and spread on data nodes spread across the racks",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue=str(PlacementPolicy.SPREAD),
+                legalValues=[(str(policy), str(policy)) for policy in PlacementPolicy]
+            ),
+            Parameter(
+                name="mongodb_presplit_chunks_per_shard",
+                description="Chunks per shard to pre-split the hashed benchmark collection into (0 leaves the collection unsharded)",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=2
+            ),
+        ])
+
+    def validate(self, params: portal.Namespace) -> None:
+        super().validate(params)
+        self.validateNotNegative(params, ["mongodb_shard_count", "mongodb_config_server_count", "mongodb_presplit_chunks_per_shard"])
+        if params.mongodb_replica_set_size < 1:
+            portal.context.reportError(portal.ParameterError(
+                "Replica set size must be at least 1",
+                ["mongodb_replica_set_size"]
+            ))
+            return
+        data_nodes = params.dc_count * params.racks_per_dc * params.nodes_per_rack
+        if params.mongodb_shard_count > data_nodes:
+            portal.context.reportError(portal.ParameterError(
+                f"Shard count {params.mongodb_shard_count} exceeds the {data_nodes} data nodes",
+                ["mongodb_shard_count"]
+            ))
+            return
+        self.validatePlacement(
+            params,
+            ApplicationVariant.MONGO_DB,
+            ["mongodb_config_server_count", "mongodb_config_server_placement"]
+        )
+
+    @classmethod
+    def name(cls) -> str:
+        return "MongoDB"
+
+    @classmethod
+    def id(cls) -> str:
+        return "mongodb"
+
+MONGODB_PARAMETERS: ParameterGroup = MongoDBParameters()
@@ -0,0 +1,77 @@
+import geni.portal as portal
+from provisioner.application.app import ApplicationVariant
+from provisioner.hardware import lookupHardware
+from provisioner.parameters import Parameter, ParameterGroup
+
+class ScyllaParameters(ParameterGroup):
+
+    def __init__(self):
+        super().__init__(parameters=[
+            Parameter(
+                name="scylla_reserved_cores",
+                description="Physical cores (with their hyperthreads) left to the OS, OTEL agents and interrupt handling, Scylla runs a shard on every other cpu",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=1
+            ),
+            Parameter(
+                name="scylla_reserved_memory_gib",
+                description="Memory in GiB left to the OS and OTEL agents (0 implies the larger of 2GiB and 10% of the node memory)",
+                typ=portal.ParameterType.INTEGER,
+                required=False,
+                defaultValue=0
+            ),
+            Parameter(
+                name="scylla_overprovisioned",
+                description="Run Scylla without pinning shards to cpus, for nodes shared with other workloads",
+                typ=portal.ParameterType.BOOLEAN,
+                required=False,
+                defaultValue=False
+            ),
+            Parameter(
+                name="scylla_io_properties_path",
+                description="Directory of cached scylla_io_setup results, named <node type>.yaml, nodes without one run scylla_io_setup on startup",
+                typ=portal.ParameterType.STRING,
+                required=False,
+                defaultValue=".io_properties",
+                advanced=True
+            ),
+        ])
+
+    def validate(self, params: portal.Namespace) -> None:
+        super().validate(params)
+        if params.scylla_reserved_cores < 0:
+            portal.context.reportError(portal.ParameterError(
+                "Reserved cores must be positive",
+                ["scylla_reserved_cores"]
+            ))
+        if params.scylla_reserved_memory_gib < 0:
+            portal.context.reportError(portal.ParameterError(
+                "Reserved memory must be positive",
+                ["scylla_reserved_memory_gib"]
+            ))
+        if params.application != str(ApplicationVariant.SCYLLA):
+            return
+        hardware = lookupHardware(params.node_size)
+        if hardware == None:
+            return
+        if params.scylla_reserved_cores >= hardware.cores:
+            portal.context.reportError(portal.ParameterError(
+                f"Reserved cores {params.scylla_reserved_cores} leaves no cores for Scylla on {hardware.name} nodes with {hardware.cores} cores",
+                ["scylla_reserved_cores"]
+            ))
+        if params.scylla_reserved_memory_gib >= hardware.memory_gib:
+            portal.context.reportError(portal.ParameterError(
+                f"Reserved memory {params.scylla_reserved_memory_gib}GiB leaves no memory for Scylla on {hardware.name} nodes with {hardware.memory_gib}GiB",
+                ["scylla_reserved_memory_gib"]
+            ))
+
+    @classmethod
+    def name(cls) -> str:
+        return "Scylla"
+
+    @classmethod
+    def id(cls) -> str:
+        return "scylla"
+
+SCYLLA_PARAMETERS: ParameterGroup = ScyllaParameters()
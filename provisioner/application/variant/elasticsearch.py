@@ -1,19 +1,56 @@
-from provisioner.application.app import AbstractApplication, ApplicationVariant
+from typing import Optional
+from provisioner.application.app import AbstractApplication, ApplicationVariant, LOCAL_PATH, USERNAME, GROUPNAME
 from provisioner.docker import DockerConfig
+from provisioner.hardware import HardwareSpec, lookupHardware
 from provisioner.structure.node import Node
 from provisioner.structure.cluster import Cluster
-from provisioner.provisioner import TopologyProperties
+from provisioner.structure.topology_assigner import findNodesWithRole
+from provisioner.structure.variant.elasticsearch import ElasticsearchNodeRole
+from provisioner.topology import TopologyProperties
+from provisioner.utils import catToFile, chmod, chown, mkdir
 import geni.portal as portal
 
+ELASTICSEARCH_CONFIG_PATH = f"{LOCAL_PATH}/config/elasticsearch"
+ELASTICSEARCH_HTTP_PORT = 9200
+ELASTICSEARCH_TRANSPORT_PORT = 9300
+CLUSTER_NAME = "benchmark"
+# Above this the JVM loses compressed object pointers
+MAX_HEAP_GIB = 31
+CORES_PER_SHARD = 4
+
+def indexShardCount(params: portal.Namespace, data_nodes: int) -> int:
+    # A search runs single threaded per shard, so shards are sized to
+    # keep the cores of every data node busy without oversharding
+    shards_per_node = params.elasticsearch_shards_per_data_node
+    if shards_per_node == 0:
+        hardware = lookupHardware(params.node_size)
+        shards_per_node = 1 if hardware == None else max(1, hardware.cores // CORES_PER_SHARD)
+    return max(1, data_nodes) * shards_per_node
+
+def indexReplicaCount(params: portal.Namespace, data_nodes: int) -> int:
+    if params.elasticsearch_replicas >= 0:
+        return params.elasticsearch_replicas
+    return min(1, data_nodes - 1)
+
 class ElasticsearchApplication(AbstractApplication):
+    master_nodes: list[str]
+    hardware: Optional[HardwareSpec]
+    heap_size: Optional[str]
 
     def __init__(self, version: str, docker_config: DockerConfig):
         super().__init__(version, docker_config)
+        self.master_nodes = []
+        self.hardware = None
+        self.heap_size = None
 
     @classmethod
     def variant(cls) -> ApplicationVariant:
         return ApplicationVariant.ELASTICSEARCH
 
+    @classmethod
+    def noisyLogPatterns(cls) -> list[str]:
+        return ["JvmGcMonitorService", "MergeScheduler"]
+
     def preConfigureClusterLevelProperties(self,
                                            cluster: Cluster,
                                            params: portal.Namespace,
@@ -23,8 +60,82 @@ class ElasticsearchApplication(AbstractApplication):
             params,
             topology_properties
         )
-        # TODO: Implement this
+        self.master_nodes = findNodesWithRole(cluster.inverse_topology, str(ElasticsearchNodeRole.MASTER))
+        self.hardware = lookupHardware(params.node_size)
+        self.heap_size = params.application_heap_size
+
+    def heapSize(self) -> str:
+        # Half the memory goes to the heap, the rest is left to the page
+        # cache Lucene relies on
+        if self.hardware == None:
+            return f"{self.heap_size}"
+        return f"{min(MAX_HEAP_GIB, self.hardware.memory_gib // 2)}g"
+
+    def nodeRoles(self, node: Node) -> list[str]:
+        node_roles = [role.nodeRole() for role in ElasticsearchNodeRole if str(role) in node.roles]
+        return [role for role in node_roles if role != None]
+
+    def writeElasticsearchYaml(self, node: Node) -> None:
+        _, dc, rack = self.cluster.inverse_topology[node.id]
+        masters = [self.topology_properties.db_nodes[master] for master in self.master_nodes]
+        lines = [
+            f"cluster.name: {CLUSTER_NAME}",
+            f"node.name: {node.id}",
+            f"node.roles: [{', '.join(self.nodeRoles(node))}]",
+            f"network.host: {node.getInterfaceAddress()}",
+            f"http.port: {ELASTICSEARCH_HTTP_PORT}",
+            f"transport.port: {ELASTICSEARCH_TRANSPORT_PORT}",
+            f"discovery.seed_hosts: [{', '.join([f'{master.getInterfaceAddress()}:{ELASTICSEARCH_TRANSPORT_PORT}' for master in masters])}]",
+            f"cluster.initial_master_nodes: [{', '.join([master.id for master in masters])}]",
+            f"path.data: {LOCAL_PATH}/data",
+            f"path.logs: {LOCAL_PATH}/logs",
+            # Replicas are allocated away from the racks (and datacentres)
+            # holding other copies of the same shard
+            f"node.attr.dc: {dc}",
+            f"node.attr.rack: {rack}",
+            "cluster.routing.allocation.awareness.attributes: dc,rack"
+        ]
+        if len(self.cluster.datacentres) > 1:
+            # Without forcing, losing a datacentre would pile all of its
+            # replicas onto the survivors
+            lines.append(f"cluster.routing.allocation.awareness.force.dc.values: {','.join(self.cluster.datacentres.keys())}")
+        lines.append("xpack.security.enabled: false")
+        catToFile(
+            node,
+            f"{ELASTICSEARCH_CONFIG_PATH}/elasticsearch.yml",
+            "\n".join(lines),
+            literal=True
+        )
+
+    def writeHeapOptions(self, node: Node) -> None:
+        mkdir(node, f"{ELASTICSEARCH_CONFIG_PATH}/jvm.options.d")
+        catToFile(
+            node,
+            f"{ELASTICSEARCH_CONFIG_PATH}/jvm.options.d/heap.options",
+            f"-Xms{self.heapSize()}\n-Xmx{self.heapSize()}"
+        )
+
+    def createDirectories(self, node: Node) -> None:
+        dirs = ["data", "logs"]
+        for dir in dirs:
+            mkdir(node, f"{LOCAL_PATH}/{dir}", True)
+        chmod(node, LOCAL_PATH, 0o777, recursive=True)
+        chown(node, LOCAL_PATH, USERNAME, GROUPNAME, recursive=True)
 
     def nodeInstallApplication(self, node: Node) -> None:
-        # TODO: Implement this
-        pass
+        super().nodeInstallApplication(node)
+        self.unpackTar(node)
+        self.createDirectories(node)
+        self.writeElasticsearchYaml(node)
+        self.writeHeapOptions(node)
+        self.bootstrapNode(
+            node,
+            {
+                "NODE_ROLES": node.roles,
+                "MASTER_ELIGIBLE": node.id in self.master_nodes,
+                "HEAP_SIZE": self.heapSize()
+            },
+            [
+                ".*elasticsearch.*"
+            ]
+        )
@@ -1,40 +1,87 @@
+import math
+import os
+from typing import Any, Optional
 import geni.portal as portal
 from geni.rspec import pg
 from provisioner.application.app import LOCAL_PATH, USERNAME, GROUPNAME, VAR_LIB_PATH, AbstractApplication, ApplicationVariant
 from provisioner.docker import DockerConfig
-from provisioner.parameters import Parameter, ParameterGroup
+from provisioner.hardware import HardwareSpec, ResourceLimits, formatCpuList, lookupHardware, partitionResources
 from provisioner.structure.cluster import Cluster
 from provisioner.structure.node import Node
 from provisioner.structure.topology_assigner import findNodesWithRole
-from provisioner.structure.variant.hbase import HBaseAppType, HBaseNodeRole
+from provisioner.structure.variant.hbase import HBASE_ROLE_COSTS, HBaseAppType, HBaseNodeRole
 from provisioner.topology import TopologyProperties
-from provisioner.utils import catToFile, chmod, chown, mkdir, sed
+from provisioner.utils import catToFile, chmod, chown, insertXMLProperties, mkdir, sed
 
 HADOOP_HOME: str = f"{VAR_LIB_PATH}/hadoop"
 HADOOP_CONF: str = f"{HADOOP_HOME}/etc/hadoop"
+HBASE_CONF: str = f"{LOCAL_PATH}/config/hbase"
+RACK_TOPOLOGY_SCRIPT: str = "topology.sh"
+DEFAULT_RACK: str = "/default-rack"
+ZOOKEEPER_TICK_TIME_MS: int = 2000
+SYSTEMD_UNIT_PATH: str = "/etc/systemd/system"
+# Share of a role's slice given to its JVM heap, the rest covers
+# metaspace, thread stacks and direct buffers so the JVM is not killed
+# by its own slice
+ROLE_HEAP_FRACTION: float = 0.75
 
 class HBaseApplication(AbstractApplication):
-    # all_ips: list[pg.Interface] = []
-    all_ips: list[str] = []
-    # hdfs_data_nodes: list[pg.Interface] = []
-    hdfs_data_nodes: list[str] = []
-    hbase_master_node: str = ""
-    # hdfs_name_node: pg.Interface = pg.Interface("", "")
-    hdfs_name_node: str = ""
-    # hdfs_resource_manager: pg.Interface = pg.Interface("", "")
-    hdfs_resource_manager: str = ""
-    client_max_total_tasks: int = 100
-    client_max_perserver_tasks: int = 2
-    client_max_perregion_tasks: int = 1
-    hadoop_version: str = "3.4.2"
+    # all_ips: list[pg.Interface]
+    all_ips: list[str]
+    # hdfs_data_nodes: list[pg.Interface]
+    hdfs_data_nodes: list[str]
+    hbase_master_node: str
+    # hdfs_name_node: pg.Interface
+    hdfs_name_node: str
+    # hdfs_resource_manager: pg.Interface
+    hdfs_resource_manager: str
+    client_max_total_tasks: int
+    client_max_perserver_tasks: int
+    client_max_perregion_tasks: int
+    hadoop_version: str
+    hdfs_replication: int
+    hdfs_block_size: str
+    hdfs_namenode_handler_count: int
+    hdfs_datanode_handler_count: int
+    hdfs_short_circuit_reads: bool
+    hdfs_domain_socket_path: str
+    inter_dc_latency_ms: int
+    hardware: Optional[HardwareSpec]
+    role_isolation: bool
+    reserved_cores: int
+    reserved_memory_gib: int
     
     def __init__(self, version: str, docker_config: DockerConfig):
         super().__init__(version, docker_config)
+        self.all_ips = []
+        self.hdfs_data_nodes = []
+        self.hbase_master_node = ""
+        self.hdfs_name_node = ""
+        self.hdfs_resource_manager = ""
+        self.client_max_total_tasks = 100
+        self.client_max_perserver_tasks = 2
+        self.client_max_perregion_tasks = 1
+        self.hadoop_version = "3.4.2"
+        self.hdfs_replication = 1
+        self.hdfs_block_size = "128m"
+        self.hdfs_namenode_handler_count = 10
+        self.hdfs_datanode_handler_count = 10
+        self.hdfs_short_circuit_reads = False
+        self.hdfs_domain_socket_path = ""
+        self.inter_dc_latency_ms = 0
+        self.hardware = None
+        self.role_isolation = False
+        self.reserved_cores = 0
+        self.reserved_memory_gib = 0
 
     @classmethod
     def variant(cls) -> ApplicationVariant:
         return ApplicationVariant.HBASE
 
+    @classmethod
+    def noisyLogPatterns(cls) -> list[str]:
+        return ["CompactSplit", "HStore.*[Cc]ompact", "JvmPauseMonitor"]
+
     def preConfigureClusterLevelProperties(self,
                                            cluster: Cluster,
                                            params: portal.Namespace,
@@ -51,6 +98,17 @@ class HBaseApplication(AbstractApplication):
         self.client_max_perserver_tasks = params.hbase_client_max_perserver_tasks
         self.client_max_perregion_tasks = params.hbase_client_max_perregion_tasks
         self.hadoop_version = params.hbase_hadoop_version
+        self.hdfs_replication = params.hdfs_replication
+        self.hdfs_block_size = params.hdfs_block_size
+        self.hdfs_namenode_handler_count = params.hdfs_namenode_handler_count
+        self.hdfs_datanode_handler_count = params.hdfs_datanode_handler_count
+        self.hdfs_short_circuit_reads = params.hdfs_short_circuit_reads
+        self.hdfs_domain_socket_path = params.hdfs_domain_socket_path
+        self.inter_dc_latency_ms = params.hbase_inter_dc_latency_ms
+        self.hardware = lookupHardware(params.node_size)
+        self.role_isolation = params.hbase_role_isolation
+        self.reserved_cores = params.hbase_reserved_cores
+        self.reserved_memory_gib = params.hbase_reserved_memory_gib
         # self.hdfs_data_nodes = [topology_properties.db_nodes[node].interface for node in findNodesWithRole(self.cluster.inverse_topology, str(HBaseNodeRole.HDFS_DATA))]
         self.hdfs_data_nodes = findNodesWithRole(self.cluster.inverse_topology, str(HBaseNodeRole.HDFS_DATA))
         master = findNodesWithRole(self.cluster.inverse_topology, str(HBaseNodeRole.HBASE_MASTER), True)
@@ -87,6 +145,75 @@ class HBaseApplication(AbstractApplication):
             },
             f"{LOCAL_PATH}/config/hbase/hbase-site.xml"
         )
+        self.writeRackTopologyScript(node, HBASE_CONF)
+        # RegionServers are the HDFS clients that benefit from
+        # short-circuit reads of blocks on their co-located DataNode
+        insertXMLProperties(
+            node,
+            {
+                "net.topology.script.file.name": f"{HBASE_CONF}/{RACK_TOPOLOGY_SCRIPT}"
+            } | self.zookeeperLatencyProperties() | self.shortCircuitReadProperties(),
+            f"{HBASE_CONF}/hbase-site.xml"
+        )
+
+    def rackTopology(self) -> dict[str, str]:
+        locations: dict[str, str] = {}
+        for node_id, (_, dc, rack) in self.cluster.inverse_topology.items():
+            location = f"/{dc}/{rack}"
+            # Hadoop resolves by address or hostname depending on the caller
+            locations[f"{node_id}-LAN"] = location
+            locations[node_id] = location
+            if node_id in self.topology_properties.db_nodes:
+                locations[self.topology_properties.db_nodes[node_id].getInterfaceAddress()] = location
+        return locations
+
+    def writeRackTopologyScript(self, node: Node, conf_dir: str) -> None:
+        entries = "\n".join([
+            f"    [\"{host}\"]=\"{location}\""
+            for host, location in self.rackTopology().items()
+        ])
+        script = "\n".join([
+            "#!/usr/bin/env bash",
+            "# Resolves each host argument to its /<datacentre>/<rack> network location",
+            "declare -A LOCATIONS=(",
+            entries,
+            ")",
+            "for host in \"$@\"; do",
+            f"    echo -n \"${{LOCATIONS[$host]:-{DEFAULT_RACK}}} \"",
+            "done",
+            "echo"
+        ])
+        path = f"{conf_dir}/{RACK_TOPOLOGY_SCRIPT}"
+        catToFile(node, path, script, literal=True)
+        chmod(node, path, 0o755)
+
+    def zookeeperLatencyProperties(self) -> dict[str, str]:
+        if self.inter_dc_latency_ms == 0:
+            return {}
+        # Followers must be able to sync within the limits over a few
+        # inter-datacentre round trips, the defaults are 5 and 10 ticks
+        sync_limit = max(5, math.ceil(10 * self.inter_dc_latency_ms / ZOOKEEPER_TICK_TIME_MS))
+        return {
+            "hbase.zookeeper.property.tickTime": f"{ZOOKEEPER_TICK_TIME_MS}",
+            "hbase.zookeeper.property.syncLimit": f"{sync_limit}",
+            "hbase.zookeeper.property.initLimit": f"{2 * sync_limit}"
+        }
+
+    def shortCircuitReadProperties(self) -> dict[str, str]:
+        if not self.hdfs_short_circuit_reads:
+            return {}
+        return {
+            "dfs.client.read.shortcircuit": "true",
+            "dfs.client.read.shortcircuit.buffer.size": "131072",
+            "dfs.domain.socket.path": self.hdfs_domain_socket_path
+        }
+
+    def createDomainSocketDirectory(self, node: Node) -> None:
+        # The DataNode refuses sockets in directories others can write to
+        socket_dir = os.path.dirname(self.hdfs_domain_socket_path)
+        mkdir(node, socket_dir)
+        chown(node, socket_dir, USERNAME, GROUPNAME)
+        chmod(node, socket_dir, 0o755)
 
     def writeRegionServersConfig(self, node: Node) -> None:
         # region_servers = [
@@ -172,12 +299,23 @@ class HBaseApplication(AbstractApplication):
         sed(
             node,
             {
-                "@@DFS_REPLICATION@@": "1",
+                "@@DFS_REPLICATION@@": f"{self.hdfs_replication}",
                 "@@DFS_NAMENODE_RPC_ADDRESS@@": self.hdfs_name_node + "-LAN", #self.hdfs_name_node.addresses[0].address,
                 "@@DFS_NAMENODE_SERVICE_RPC_ADDRESS@@": self.hdfs_name_node + "-LAN" #self.hdfs_name_node.addresses[0].address
             },
             f"{HADOOP_CONF}/hdfs-site.xml"
         )
+        insertXMLProperties(
+            node,
+            {
+                "dfs.blocksize": self.hdfs_block_size,
+                "dfs.namenode.handler.count": f"{self.hdfs_namenode_handler_count}",
+                "dfs.datanode.handler.count": f"{self.hdfs_datanode_handler_count}"
+            } | self.shortCircuitReadProperties(),
+            f"{HADOOP_CONF}/hdfs-site.xml"
+        )
+        if self.hdfs_short_circuit_reads and str(HBaseNodeRole.HDFS_DATA) in node.roles:
+            self.createDomainSocketDirectory(node)
         sed(
             node,
             {
@@ -186,6 +324,15 @@ class HBaseApplication(AbstractApplication):
             },
             f"{HADOOP_CONF}/core-site.xml"
         )
+        # Rack aware block placement and replica selection
+        self.writeRackTopologyScript(node, HADOOP_CONF)
+        insertXMLProperties(
+            node,
+            {
+                "net.topology.script.file.name": f"{HADOOP_CONF}/{RACK_TOPOLOGY_SCRIPT}"
+            },
+            f"{HADOOP_CONF}/core-site.xml"
+        )
         catToFile(
             node,
             f"{HADOOP_CONF}/workers",
@@ -206,6 +353,54 @@ class HBaseApplication(AbstractApplication):
             command=f"{LOCAL_PATH}/scripts/hbase/install-hdfs.sh {self.hadoop_version}"
         ))
 
+    def roleResourceLimits(self, node: Node) -> dict[str, ResourceLimits]:
+        # Without the node hardware there is nothing to split, roles are
+        # left to contend as before
+        if not self.role_isolation or self.hardware == None:
+            return {}
+        return partitionResources(
+            self.hardware,
+            {role: HBASE_ROLE_COSTS[role] for role in node.roles},
+            self.reserved_cores,
+            self.reserved_memory_gib
+        )
+
+    def writeRoleSlices(self, node: Node, limits: dict[str, ResourceLimits]) -> None:
+        # Role containers are started under their slice with
+        # --cgroup-parent, so the limits hold for every process of a role
+        for role, limit in limits.items():
+            catToFile(
+                node,
+                f"{SYSTEMD_UNIT_PATH}/{role}.slice",
+                "\n".join([
+                    "[Unit]",
+                    f"Description=Resource limits of the {role} role",
+                    "",
+                    "[Slice]",
+                    "CPUAccounting=true",
+                    f"AllowedCPUs={formatCpuList(limit.cpus)}",
+                    "MemoryAccounting=true",
+                    f"MemoryMax={limit.memory_mib}M"
+                ]),
+                literal=True
+            )
+        if len(limits) > 0:
+            node.instance.addService(pg.Execute(
+                shell="/bin/bash",
+                command="sudo systemctl daemon-reload"
+            ))
+
+    def roleResourceProperties(self, limits: dict[str, ResourceLimits]) -> dict[str, Any]:
+        properties: dict[str, Any] = {
+            "ROLE_ISOLATION": len(limits) > 0
+        }
+        for role, limit in limits.items():
+            properties[f"{role.upper()}_SLICE"] = f"{role}.slice"
+            properties[f"{role.upper()}_CPUSET"] = formatCpuList(limit.cpus)
+            properties[f"{role.upper()}_MEMORY"] = f"{limit.memory_mib}m"
+            properties[f"{role.upper()}_HEAP"] = f"{math.floor(limit.memory_mib * ROLE_HEAP_FRACTION)}m"
+        return properties
+
     def createDirectories(self, node: Node) -> None:
         dirs = ["data", "logs"]
         for dir in dirs:
@@ -219,13 +414,19 @@ class HBaseApplication(AbstractApplication):
         self.createDirectories(node)
         self.installHDFS(node)
         self.writeCoreConfiguration(node)
+        hdfs_configured = False
         for role in node.roles:
             hbase_role = HBaseNodeRole[role.upper()]
             app_type = hbase_role.appType()
             if (app_type == HBaseAppType.HBase):
                 self.writeHBaseConfiguration(node, hbase_role)
-            elif (app_type == HBaseAppType.HDFS):
+            elif (app_type == HBaseAppType.HDFS and not hdfs_configured):
+                # HDFS configuration covers all HDFS roles and inserts
+                # properties, so it must only be written once per node
                 self.writeHDFSConfiguration(node)
+                hdfs_configured = True
+        role_limits = self.roleResourceLimits(node)
+        self.writeRoleSlices(node, role_limits)
         self.bootstrapNode(
             node,
             {
@@ -237,52 +438,8 @@ class HBaseApplication(AbstractApplication):
                 # TODO: Change the install path of hbase and mount from host
                 #       to be /var/lib/cluster within the container/image
                 "KAIROS_LOGS_DIR": "/var/lib/hbase/logs"
-            },
+            } | self.roleResourceProperties(role_limits),
             [
                 ".*hbase.*"
             ]
         )
-
-class HBaseParameters(ParameterGroup):
-
-    def __init__(self):
-        super().__init__(parameters=[
-            Parameter(
-                name="hbase_client_max_total_tasks",
-                description="Maximum number of concurrent mutation tasks a single HTable instance will send to the cluster",
-                typ=portal.ParameterType.INTEGER,
-                required=False,
-                defaultValue=100,
-            ),
-            Parameter(
-                name="hbase_client_max_perserver_tasks",
-                description="Maximum number of concurrent mutation tasks a single HTable instance wil send to a single region server",
-                typ=portal.ParameterType.INTEGER,
-                required=False,
-                defaultValue=2,
-            ),
-            Parameter(
-                name="hbase_client_max_perregion_tasks",
-                description="Maximum number of concurrent mutation tasks that the client will maintain to a single region. if there is already this many writes in progress for this region, new puts won't be sent to this region until some writes finish",
-                typ=portal.ParameterType.INTEGER,
-                required=False,
-                defaultValue=1,
-            ),
-            Parameter(
-                name="hbase_hadoop_version",
-                description="Version of Hadoop to install and configure for HBase to run on top of.",
-                typ=portal.ParameterType.STRING,
-                required=False,
-                defaultValue="3.4.2",
-            )
-        ])
-
-    @classmethod
-    def name(cls) -> str:
-        return "HBase"
-
-    @classmethod
-    def id(cls) -> str:
-        return "hbase"
-
-HBASE_PARAMETERS: ParameterGroup = HBaseParameters()
@@ -1,20 +1,47 @@
-from provisioner.application.app import AbstractApplication, ApplicationVariant
+import math
+from typing import Optional
+from provisioner.application.app import AbstractApplication, ApplicationVariant, LOCAL_PATH, USERNAME, GROUPNAME
 from provisioner.docker import DockerConfig
+from provisioner.hardware import HardwareSpec, lookupHardware
 from provisioner.structure.node import Node
 from provisioner.structure.cluster import Cluster
-from provisioner.provisioner import TopologyProperties
+from provisioner.structure.variant.mongodb import CONFIG_REPLICA_SET, MONGODB_ROLE_COSTS, MongoDBNodeRole, MongoDBTopologyAssigner, configReplicaSet, shardReplicaSets
+from provisioner.topology import TopologyProperties
+from provisioner.utils import catToFile, chmod, chown, mkdir
 import geni.portal as portal
 
+MONGOS_PORT = 27017
+MONGODB_ROLE_PORTS: dict[MongoDBNodeRole, int] = {
+    MongoDBNodeRole.SHARD: 27018,
+    MongoDBNodeRole.CONFIG_SERVER: 27019,
+}
+MONGODB_ROLE_CLUSTER_ROLES: dict[MongoDBNodeRole, str] = {
+    MongoDBNodeRole.SHARD: "shardsvr",
+    MongoDBNodeRole.CONFIG_SERVER: "configsvr",
+}
+MONGODB_CONFIG_PATH = f"{LOCAL_PATH}/config/mongodb"
+
+def replicaSetConnection(name: str, addresses: list[str], port: int) -> str:
+    return f"{name}/{','.join([f'{address}:{port}' for address in addresses])}"
 
 class MongoDBApplication(AbstractApplication):
+    # Replica set name to member node ids
+    replica_sets: dict[str, list[str]]
+    hardware: Optional[HardwareSpec]
 
     def __init__(self, version: str, docker_config: DockerConfig):
         super().__init__(version, docker_config)
+        self.replica_sets = {}
+        self.hardware = None
 
     @classmethod
     def variant(cls) -> ApplicationVariant:
         return ApplicationVariant.MONGO_DB
 
+    @classmethod
+    def noisyLogPatterns(cls) -> list[str]:
+        return ['"c":"WTCHKPT"', '"c":"WTCMPCT"']
+
     def preConfigureClusterLevelProperties(self,
                                            cluster: Cluster,
                                            params: portal.Namespace,
@@ -24,8 +51,113 @@ class MongoDBApplication(AbstractApplication):
             params,
             topology_properties
         )
-        # TODO: Implement this
+        self.replica_sets = shardReplicaSets(
+            cluster.topology,
+            MongoDBTopologyAssigner.shardCount(params)
+        )
+        self.replica_sets[CONFIG_REPLICA_SET] = configReplicaSet(cluster.inverse_topology)
+        self.hardware = lookupHardware(params.node_size)
+
+    def replicaSetOf(self, node: Node, role: MongoDBNodeRole) -> str:
+        if role == MongoDBNodeRole.CONFIG_SERVER:
+            return CONFIG_REPLICA_SET
+        for name, members in self.replica_sets.items():
+            if name != CONFIG_REPLICA_SET and node.id in members:
+                return name
+        raise ValueError(f"Node {node.id} is not a member of any shard replica set")
+
+    def cacheSizeGiB(self, node: Node, role: MongoDBNodeRole) -> Optional[float]:
+        # WiredTiger defaults to half the memory less 1GiB per mongod,
+        # which over commits nodes running both a shard and a config
+        # server, so the default is divided between them by role cost
+        if self.hardware == None:
+            return None
+        node_cost = sum([MONGODB_ROLE_COSTS[role] for role in node.roles])
+        share = MONGODB_ROLE_COSTS[str(role)] / node_cost
+        return max(0.25, math.floor((self.hardware.memory_gib - 1) * 0.5 * share * 100) / 100)
+
+    def writeMongodConfig(self, node: Node, role: MongoDBNodeRole) -> str:
+        path = f"{MONGODB_CONFIG_PATH}/{role}.conf"
+        lines = [
+            f"# mongod {role} member of replica set {self.replicaSetOf(node, role)}",
+            "net:",
+            f"  port: {MONGODB_ROLE_PORTS[role]}",
+            f"  bindIp: localhost,{node.getInterfaceAddress()}",
+            "replication:",
+            f"  replSetName: {self.replicaSetOf(node, role)}",
+            "sharding:",
+            f"  clusterRole: {MONGODB_ROLE_CLUSTER_ROLES[role]}",
+            "storage:",
+            f"  dbPath: {LOCAL_PATH}/data/{role}"
+        ]
+        cache_size = self.cacheSizeGiB(node, role)
+        if cache_size != None:
+            lines += [
+                "  wiredTiger:",
+                "    engineConfig:",
+                f"      cacheSizeGB: {cache_size}"
+            ]
+        lines += [
+            "systemLog:",
+            "  destination: file",
+            f"  path: {LOCAL_PATH}/logs/{role}.log",
+            "  logAppend: true"
+        ]
+        catToFile(node, path, "\n".join(lines), literal=True)
+        return path
+
+    def writeReplicaSetInit(self, node: Node, role: MongoDBNodeRole) -> Optional[str]:
+        # Initiated once, from the first member of each replica set
+        name = self.replicaSetOf(node, role)
+        members = self.replica_sets[name]
+        if members[0] != node.id:
+            return None
+        port = MONGODB_ROLE_PORTS[role]
+        member_docs = ", ".join([
+            f"{{_id: {i}, host: \"{self.topology_properties.db_nodes[member].getInterfaceAddress()}:{port}\"}}"
+            for i, member in enumerate(members)
+        ])
+        config_server = ", configsvr: true" if role == MongoDBNodeRole.CONFIG_SERVER else ""
+        path = f"{MONGODB_CONFIG_PATH}/init-{name}.js"
+        catToFile(
+            node,
+            path,
+            f"rs.initiate({{_id: \"{name}\"{config_server}, members: [{member_docs}]}});",
+            literal=True
+        )
+        return path
+
+    def createDirectories(self, node: Node) -> None:
+        dirs = ["logs"] + [f"data/{role}" for role in node.roles]
+        for dir in dirs:
+            mkdir(node, f"{LOCAL_PATH}/{dir}", True)
+        mkdir(node, MONGODB_CONFIG_PATH)
+        chmod(node, LOCAL_PATH, 0o777, recursive=True)
+        chown(node, LOCAL_PATH, USERNAME, GROUPNAME, recursive=True)
 
     def nodeInstallApplication(self, node: Node) -> None:
-        # TODO: Implement this
-        pass
+        super().nodeInstallApplication(node)
+        self.unpackTar(node)
+        self.createDirectories(node)
+        configs: list[str] = []
+        init_scripts: list[str] = []
+        for role in node.roles:
+            mongodb_role = MongoDBNodeRole(role)
+            configs.append(self.writeMongodConfig(node, mongodb_role))
+            init_script = self.writeReplicaSetInit(node, mongodb_role)
+            if init_script != None:
+                init_scripts.append(f"{MONGODB_ROLE_PORTS[mongodb_role]}:{init_script}")
+        self.bootstrapNode(
+            node,
+            {
+                "NODE_ROLES": node.roles,
+                # One mongod per config, each init script is run against
+                # the mongod listening on its <port>: prefix
+                "MONGOD_CONFIGS": configs,
+                "MONGOD_INIT_SCRIPTS": init_scripts,
+                "INVOKE_INIT": len(init_scripts) > 0
+            },
+            [
+                ".*mongo.*"
+            ]
+        )
@@ -1,32 +1,123 @@
 from provisioner.application.app import AbstractApplication, ApplicationVariant, GROUPNAME, LOCAL_PATH, USERNAME
-from provisioner.application.variant.cassandra import CassandraApplication
-from provisioner.application.variant.scylla import ScyllaApplication
-from provisioner.application.variant.mongodb import MongoDBApplication
-from provisioner.application.variant.elasticsearch import ElasticsearchApplication
-from provisioner.application.variant.hbase import HBaseApplication
-from provisioner.collector.collection_config import CollectionConfiguration
-from provisioner.collector.variant.cassandra import CassandraCollectionConfig
-from provisioner.collector.variant.elasticsearch import ElasticsearchCollectionConfig
-from provisioner.collector.variant.hbase import HBaseCollectionConfig
-from provisioner.collector.variant.mongodb import MonogDBCollectionConfig
-from provisioner.collector.variant.scylla import ScyllaCollectionConfig
+from provisioner.collector.collection_config import BASE_EXTENSIONS, BASE_PIPELINE_PROCESSORS, CollectionConfiguration, OTEL_CONFIG_FRAGMENTS_DIR, writeCollectorConfigFragment
+from provisioner.collector.collector import OTELFeature, SAMPLING_STRATEGY_GRPC_PORT, TraceSampler
 from provisioner.docker import DockerConfig
+from provisioner.hardware import lookupHardware
 from provisioner.structure.cluster import Cluster
 from provisioner.structure.node import Node
-from provisioner.provisioner import TopologyProperties
-from provisioner.utils import catToFile, chmod, chown, mkdir
+from provisioner.topology import TopologyProperties
+from provisioner.registry import LazyRegistry
+from provisioner.utils import catToFile, chmod, chown, mkdir, sed
 import geni.portal as portal
+import json
+import math
+from geni.rspec import pg
 
 OTEL_JMX_COLLECTION_INTERVAL_MS = 500
 OTEL_CONTAINER_LOCAL_PATH = "/otel-lgtm"
+SAMPLING_STRATEGIES_FILE = "sampling_strategies.json"
+# Spans of a trace arriving later than this after its first span are
+# sampled on their own
+TAIL_SAMPLING_DECISION_WAIT_S = 10
+TELEMETRY_DATA_PATH = f"{LOCAL_PATH}/telemetry"
+# Rough on disk sizes once compressed by Prometheus, Loki and Tempo
+BYTES_PER_SAMPLE = 1.5
+LOG_COMPRESSION_RATIO = 0.15
+BYTES_PER_SPAN = 250
+STORAGE_HEADROOM = 1.25
+MIN_STORAGE_GIB = 50
+MEMORY_LIMITER_CHECK_INTERVAL_S = 1
+MEMORY_LIMITER_SPIKE_PERCENTAGE = 20
+DOWNSAMPLE_FILTER = "filter/downsample"
+DOWNSAMPLE_AFTER_PLACEHOLDER = "@@DOWNSAMPLE_AFTER_NS@@"
+CLUSTER_HOSTS_PATH = f"{LOCAL_PATH}/cluster_hosts"
+CLUSTER_EXEC_PATH = f"{LOCAL_PATH}/bin/cluster-exec"
+CLUSTER_EXEC_SCRIPT = f"""#!/usr/bin/env bash
+# Runs a command on every cluster node in parallel over SSH, printing
+# each line of output prefixed with the node it came from.
+#
+# Usage: cluster-exec [-p <parallelism>] [-t <connect timeout>] [-f <hosts file>] <command...>
 
-COLLECTION_CONFIGS: dict[ApplicationVariant, type[CollectionConfiguration]] = {
-    CassandraApplication.variant(): CassandraCollectionConfig,
-    ElasticsearchApplication.variant(): ElasticsearchCollectionConfig,
-    HBaseApplication.variant(): HBaseCollectionConfig,
-    MongoDBApplication.variant(): MonogDBCollectionConfig,
-    ScyllaApplication.variant(): ScyllaCollectionConfig,
-}
+if [ "$(id -un)" != "{USERNAME}" ]; then
+    exec sudo -u {USERNAME} "$0" "$@"
+fi
+
+HOSTS_FILE="{CLUSTER_HOSTS_PATH}"
+PARALLELISM=""
+CONNECT_TIMEOUT=10
+
+while getopts "p:t:f:" opt; do
+    case "$opt" in
+        p) PARALLELISM="$OPTARG" ;;
+        t) CONNECT_TIMEOUT="$OPTARG" ;;
+        f) HOSTS_FILE="$OPTARG" ;;
+        *) echo "Usage: $0 [-p <parallelism>] [-t <connect timeout>] [-f <hosts file>] <command...>" >&2; exit 2 ;;
+    esac
+done
+shift $((OPTIND - 1))
+if [ $# -eq 0 ]; then
+    echo "No command given" >&2
+    exit 2
+fi
+if [ -z "$PARALLELISM" ]; then
+    PARALLELISM=$(grep -c . "$HOSTS_FILE")
+fi
+
+OUTPUT_DIR=$(mktemp -d)
+trap 'rm -rf "$OUTPUT_DIR"' EXIT
+export OUTPUT_DIR CONNECT_TIMEOUT
+export CLUSTER_COMMAND="$*"
+
+runOnHost() {{
+    ssh -n -o BatchMode=yes -o ConnectTimeout="$CONNECT_TIMEOUT" "$1" "$CLUSTER_COMMAND" > "$OUTPUT_DIR/$1.out" 2>&1
+    echo $? > "$OUTPUT_DIR/$1.rc"
+}}
+export -f runOnHost
+
+xargs -a "$HOSTS_FILE" -P "$PARALLELISM" -I {{}} bash -c 'runOnHost "$1"' _ {{}}
+
+FAILED=0
+while read -r host; do
+    [ -z "$host" ] && continue
+    sed "s/^/[$host] /" "$OUTPUT_DIR/$host.out"
+    rc=$(cat "$OUTPUT_DIR/$host.rc")
+    if [ "$rc" != "0" ]; then
+        echo "[$host] exited with status $rc" >&2
+        FAILED=$((FAILED + 1))
+    fi
+done < "$HOSTS_FILE"
+if [ "$FAILED" -gt 0 ]; then
+    echo "$FAILED node(s) failed" >&2
+    exit 1
+fi
+"""
+
+COLLECTION_CONFIGS: LazyRegistry[ApplicationVariant, type[CollectionConfiguration]] = LazyRegistry("collection config", {
+    ApplicationVariant.CASSANDRA: "provisioner.collector.variant.cassandra:CassandraCollectionConfig",
+    ApplicationVariant.ELASTICSEARCH: "provisioner.collector.variant.elasticsearch:ElasticsearchCollectionConfig",
+    ApplicationVariant.HBASE: "provisioner.collector.variant.hbase:HBaseCollectionConfig",
+    ApplicationVariant.MONGO_DB: "provisioner.collector.variant.mongodb:MonogDBCollectionConfig",
+    ApplicationVariant.SCYLLA: "provisioner.collector.variant.scylla:ScyllaCollectionConfig",
+})
+
+def telemetryStorageGiB(params: portal.Namespace, node_count: int) -> dict[str, float]:
+    # Peak usage of each signal, reached once its retention has elapsed.
+    # Metrics hold full resolution JMX points until downsampling starts
+    # and thinned ones for the rest of their retention
+    full_hours = params.collector_metrics_retention_hours
+    if params.collector_downsample_after_hours > 0:
+        full_hours = min(full_hours, params.collector_downsample_after_hours)
+    downsampled_hours = params.collector_metrics_retention_hours - full_hours
+    series = params.collector_expected_series_per_node
+    full_rate = series * 1000 / OTEL_JMX_COLLECTION_INTERVAL_MS
+    downsampled_rate = series * 1000 / max(OTEL_JMX_COLLECTION_INTERVAL_MS, params.collector_downsample_interval_ms)
+    metrics_bytes = BYTES_PER_SAMPLE * 3600 * (full_rate * full_hours + downsampled_rate * downsampled_hours)
+    logs_bytes = params.collector_expected_log_kbps_per_node * 1000 / 8 * LOG_COMPRESSION_RATIO * 3600 * params.collector_logs_retention_hours
+    traces_bytes = params.collector_expected_spans_per_node * BYTES_PER_SPAN * 3600 * params.collector_traces_retention_hours
+    return {
+        signal: node_count * size / (1 << 30)
+        for signal, size in [("metrics", metrics_bytes), ("logs", logs_bytes), ("traces", traces_bytes)]
+    }
 
 class OTELCollector(AbstractApplication):
     ycsb_repository: str
@@ -55,7 +146,7 @@ class OTELCollector(AbstractApplication):
 
     def writeYCSBBenchmarkingConfiguration(self, node: Node) -> dict[str, str]:
         base_profile_path=f"{LOCAL_PATH}/ycsb/base_profile.dat"
-        app_variant: ApplicationVariant = ApplicationVariant(ApplicationVariant._member_map_[str(self.cluster_application).upper()])
+        app_variant: ApplicationVariant = ApplicationVariant.fromName(str(self.cluster_application))
         profile_content = COLLECTION_CONFIGS[app_variant].createYCSBBaseProfileProperties(
             node,
             self.cluster,
@@ -70,7 +161,7 @@ class OTELCollector(AbstractApplication):
         )
 
     def writeTargetAppCollectionConfigs(self, node: Node) -> None:
-        app_variant: ApplicationVariant = ApplicationVariant(ApplicationVariant._member_map_[str(self.cluster_application).upper()])
+        app_variant: ApplicationVariant = ApplicationVariant.fromName(str(self.cluster_application))
         COLLECTION_CONFIGS[app_variant].writeJMXCollectionConfig(
             node,
             self.topology_properties,
@@ -85,6 +176,153 @@ class OTELCollector(AbstractApplication):
         chmod(node, f"/var/lib/cluster", 0o777, recursive=True)
         chown(node, f"/var/lib/cluster", USERNAME, GROUPNAME, recursive=True)
 
+    def writeTraceSamplingConfig(self, node: Node) -> None:
+        if TraceSampler(self.params.collector_traces_sampler) == TraceSampler.RATE_LIMITED:
+            strategies = {
+                "default_strategy": {
+                    "type": "ratelimiting",
+                    "param": self.params.collector_traces_rate_limit
+                }
+            }
+            catToFile(
+                node,
+                f"{LOCAL_PATH}/config/otel/{SAMPLING_STRATEGIES_FILE}",
+                json.dumps(strategies, indent=4),
+                literal=True
+            )
+            writeCollectorConfigFragment(node, "trace-sampling-strategies", {
+                "extensions": BASE_EXTENSIONS | {
+                    "jaeger_remote_sampling": {
+                        "source": {
+                            "file": f"{OTEL_CONTAINER_LOCAL_PATH}/{SAMPLING_STRATEGIES_FILE}"
+                        },
+                        "grpc": {
+                            "endpoint": f"0.0.0.0:{SAMPLING_STRATEGY_GRPC_PORT}"
+                        }
+                    }
+                },
+                "service": {
+                    "extensions": list(BASE_EXTENSIONS.keys()) + ["jaeger_remote_sampling"]
+                }
+            })
+        if not self.params.collector_tail_sampling:
+            return
+        # Placed ahead of the batching in the base traces pipeline, so
+        # whole traces are decided on before export
+        writeCollectorConfigFragment(node, "trace-tail-sampling", {
+            "processors": {
+                "tail_sampling": {
+                    "decision_wait": f"{TAIL_SAMPLING_DECISION_WAIT_S}s",
+                    "policies": [
+                        {
+                            "name": "errors",
+                            "type": "status_code",
+                            "status_code": {"status_codes": ["ERROR"]}
+                        },
+                        {
+                            "name": "slow",
+                            "type": "latency",
+                            "latency": {"threshold_ms": self.params.collector_tail_sampling_latency_ms}
+                        },
+                        {
+                            "name": "baseline",
+                            "type": "probabilistic",
+                            "probabilistic": {"sampling_percentage": self.params.collector_tail_sampling_percentage}
+                        }
+                    ]
+                }
+            }
+        })
+
+    def writeTelemetryStorage(self, node: Node) -> dict[str, str]:
+        usage = telemetryStorageGiB(self.params, len(self.topology_properties.db_nodes))
+        size_gib = self.params.collector_storage_gib
+        if size_gib == 0:
+            size_gib = max(MIN_STORAGE_GIB, math.ceil(sum(usage.values()) * STORAGE_HEADROOM))
+            hardware = lookupHardware(self.params.node_size)
+            if hardware != None and size_gib > hardware.disk_gib:
+                print(f"Expected telemetry of {size_gib}GB exceeds the {hardware.disk_gib}GB disk of {hardware.name}, capping the block store")
+                size_gib = hardware.disk_gib
+        blockstore = node.instance.Blockstore(f"{node.id}_bs", TELEMETRY_DATA_PATH)
+        blockstore.size = f"{size_gib}GB"
+        # Prometheus also deletes by size, so metrics cannot crowd out
+        # the logs and traces sharing the store
+        total = sum(usage.values())
+        metrics_share = usage["metrics"] / total if total > 0 else 1
+        properties = {
+            "TELEMETRY_DATA_PATH": TELEMETRY_DATA_PATH,
+            "PROMETHEUS_RETENTION": f"{self.params.collector_metrics_retention_hours}h",
+            "PROMETHEUS_RETENTION_SIZE": f"{max(1, math.floor(size_gib * metrics_share))}GB",
+            "LOKI_RETENTION_PERIOD": f"{self.params.collector_logs_retention_hours}h",
+            "TEMPO_BLOCK_RETENTION": f"{self.params.collector_traces_retention_hours}h"
+        }
+        hardware = lookupHardware(self.params.node_size)
+        if hardware != None:
+            properties["LGTM_MEMORY_LIMIT"] = f"{hardware.usableMemoryGiB()}g"
+        return properties
+
+    def writePipelineConfig(self, node: Node) -> None:
+        # Without a known node size the limit follows the container's
+        # memory instead
+        memory_limiter: dict[str, int | str] = {
+            "check_interval": f"{MEMORY_LIMITER_CHECK_INTERVAL_S}s",
+            "spike_limit_percentage": MEMORY_LIMITER_SPIKE_PERCENTAGE
+        }
+        hardware = lookupHardware(self.params.node_size)
+        if hardware != None:
+            memory_limiter["limit_mib"] = hardware.usableMemoryGiB() * 1024 * self.params.collector_memory_limit_percentage // 100
+        else:
+            memory_limiter["limit_percentage"] = self.params.collector_memory_limit_percentage
+        processors: dict[str, dict] = {"memory_limiter": memory_limiter}
+        extra_processors: dict[str, list[str]] = {pipeline: [] for pipeline in BASE_PIPELINE_PROCESSORS.keys()}
+        interval_ms = self.params.collector_downsample_interval_ms
+        if self.params.collector_downsample_after_hours > 0 and interval_ms > OTEL_JMX_COLLECTION_INTERVAL_MS:
+            # Stored blocks cannot be rewritten, so once downsampling starts
+            # only the first JMX point of each interval is let through
+            window_ns = interval_ms * 1_000_000
+            collection_ns = OTEL_JMX_COLLECTION_INTERVAL_MS * 1_000_000
+            processors[DOWNSAMPLE_FILTER] = {
+                "error_mode": "ignore",
+                "metrics": {
+                    "datapoint": [
+                        f"IsMatch(instrumentation_scope.name, \"jmx\")"
+                        f" and time_unix_nano > {DOWNSAMPLE_AFTER_PLACEHOLDER}"
+                        f" and time_unix_nano - (time_unix_nano / {window_ns}) * {window_ns} >= {collection_ns}"
+                    ]
+                }
+            }
+            extra_processors["metrics"].append(DOWNSAMPLE_FILTER)
+        if self.params.collector_tail_sampling:
+            extra_processors["traces"].append("tail_sampling")
+        # The memory limiter goes first and the base processors last, so
+        # batching sees only what the others let through
+        path = writeCollectorConfigFragment(node, "pipelines", {
+            "processors": processors,
+            "service": {
+                "pipelines": {
+                    pipeline: {"processors": ["memory_limiter"] + extra_processors[pipeline] + base_processors}
+                    for pipeline, base_processors in BASE_PIPELINE_PROCESSORS.items()
+                }
+            }
+        })
+        if DOWNSAMPLE_FILTER in processors:
+            sed(
+                node,
+                {DOWNSAMPLE_AFTER_PLACEHOLDER: f"$(( ($(date +%s) + {self.params.collector_downsample_after_hours} * 3600) * 1000000000 ))"},
+                path
+            )
+
+    def writeClusterExec(self, node: Node) -> None:
+        hosts = "\n".join([f"{node_id}-LAN" for node_id in self.topology_properties.db_nodes.keys()])
+        catToFile(node, CLUSTER_HOSTS_PATH, hosts)
+        mkdir(node, f"{LOCAL_PATH}/bin")
+        catToFile(node, CLUSTER_EXEC_PATH, CLUSTER_EXEC_SCRIPT, literal=True)
+        chmod(node, CLUSTER_EXEC_PATH, 0o755)
+        node.instance.addService(pg.Execute(
+            shell="/bin/bash",
+            command=f"sudo ln -s {CLUSTER_EXEC_PATH} /usr/local/bin/cluster-exec"
+        ))
+
     def nodeInstallApplication(self, node: Node) -> None:
         # TODO: Need to update the collector config with 
         #       JMX consumers for each of the cluster nodes
@@ -98,12 +336,18 @@ class OTELCollector(AbstractApplication):
             self.ycsb_commit_like
         )
         self.writeTargetAppCollectionConfigs(node)
+        if OTELFeature.TRACES in self.collector_features:
+            self.writeTraceSamplingConfig(node)
+        self.writePipelineConfig(node)
+        self.writeClusterExec(node)
         node_ips = [f"{node}-LAN" for node in self.topology_properties.db_nodes.keys()]
         properties = {
             "INVOKE_INIT": True,
             "CLUSTER_APPLICATION_VARIANT": self.cluster_application,
-            "NODE_IPS": node_ips
+            "NODE_IPS": node_ips,
+            "OTEL_CONFIG_FRAGMENTS_PATH": f"{OTEL_CONTAINER_LOCAL_PATH}/{OTEL_CONFIG_FRAGMENTS_DIR}"
         }
+        properties.update(self.writeTelemetryStorage(node))
         properties.update(self.writeYCSBBenchmarkingConfiguration(node))
         self.bootstrapNode(
             node,
@@ -1,19 +1,53 @@
+import os
+from typing import Any, Optional
 from provisioner.application.app import AbstractApplication, ApplicationVariant
+from provisioner.application.variant.cassandra import CassandraApplication
 from provisioner.docker import DockerConfig
+from provisioner.hardware import HardwareSpec, formatCpuList, lookupHardware
 from provisioner.structure.node import Node
 from provisioner.structure.cluster import Cluster
-from provisioner.provisioner import TopologyProperties
+from provisioner.topology import TopologyProperties
+from provisioner.utils import catToFile
 import geni.portal as portal
 
-class ScyllaApplication(AbstractApplication):
+IO_PROPERTIES_FILENAME = "io_properties.yaml"
+# Release config directory as mounted in the Scylla container
+CONTAINER_CONFIG_PATH = "/etc/scylla"
+
+def loadIOProperties(cache_path: str, hardware_type: Optional[str]) -> Optional[str]:
+    # Autoselected nodes can differ between experiments, so their disks
+    # are always measured
+    if hardware_type == None:
+        return None
+    path = os.path.join(cache_path, f"{hardware_type}.yaml")
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r") as f:
+        return f.read()
+
+class ScyllaApplication(CassandraApplication):
+    hardware: Optional[HardwareSpec]
+    reserved_cores: int
+    reserved_memory_gib: int
+    overprovisioned: bool
+    io_properties: Optional[str]
 
     def __init__(self, version: str, docker_config: DockerConfig):
         super().__init__(version, docker_config)
+        self.hardware = None
+        self.reserved_cores = 0
+        self.reserved_memory_gib = 0
+        self.overprovisioned = False
+        self.io_properties = None
 
     @classmethod
     def variant(cls) -> ApplicationVariant:
         return ApplicationVariant.SCYLLA
 
+    @classmethod
+    def noisyLogPatterns(cls) -> list[str]:
+        return ["\\] compaction - "]
+
     def preConfigureClusterLevelProperties(self,
                                            cluster: Cluster,
                                            params: portal.Namespace,
@@ -23,8 +57,97 @@ class ScyllaApplication(AbstractApplication):
             params,
             topology_properties
         )
-        # TODO: Implement this
+        # The Cassandra tuning keys are not all understood by scylla.yaml
+        self.yaml_properties = {}
+        self.hardware = lookupHardware(params.node_size)
+        self.reserved_cores = params.scylla_reserved_cores
+        self.reserved_memory_gib = params.scylla_reserved_memory_gib
+        self.overprovisioned = params.scylla_overprovisioned
+        self.io_properties = loadIOProperties(
+            params.scylla_io_properties_path,
+            params.node_size
+        )
+
+    def fragmentInputs(self) -> dict[str, Any]:
+        return {"io_properties": self.io_properties}
+
+    def seedAddresses(self) -> list[str]:
+        # Scylla seeds are plain addresses, without the storage port
+        return [seed.addresses[0].address for seed in self.seeds.values()]
+
+    def shardCpus(self) -> list[int]:
+        # One shard per remaining cpu, overprovisioned nodes leave
+        # placement to the kernel
+        if self.overprovisioned or self.hardware == None:
+            return []
+        return self.hardware.cpuList(self.reserved_cores)
+
+    def shardMemoryGiB(self) -> Optional[int]:
+        if self.hardware == None:
+            return None
+        return self.hardware.usableMemoryGiB(self.reserved_memory_gib)
+
+    def scyllaArguments(self, node: Node) -> list[str]:
+        address = node.getInterfaceAddress()
+        # Passed explicitly, as the container entrypoint otherwise
+        # rewrites them to the first address it finds
+        args = [
+            f"--listen-address {address}",
+            f"--rpc-address {address}",
+            f"--broadcast-address {address}",
+            f"--broadcast-rpc-address {address}",
+            f"--seeds {','.join(self.seedAddresses())}"
+        ]
+        cpus = self.shardCpus()
+        if len(cpus) > 0:
+            args.append(f"--smp {len(cpus)}")
+            args.append(f"--cpuset {formatCpuList(cpus)}")
+        elif self.overprovisioned:
+            args.append("--overprovisioned 1")
+        memory = self.shardMemoryGiB()
+        if memory != None:
+            args.append(f"--memory {memory}G")
+        if self.io_properties != None:
+            args.append("--io-setup 0")
+            args.append(f"--io-properties-file {CONTAINER_CONFIG_PATH}/{IO_PROPERTIES_FILENAME}")
+        else:
+            args.append("--io-setup 1")
+        return args
+
+    def writeIOProperties(self, node: Node) -> None:
+        if self.io_properties == None:
+            return
+        catToFile(
+            node,
+            f"{self.configPath()}/{IO_PROPERTIES_FILENAME}",
+            self.io_properties,
+            literal=True
+        )
 
     def nodeInstallApplication(self, node: Node) -> None:
-        # TODO: Implement this
-        pass
+        # Scylla has no JVM, so the Cassandra env and agent configs are skipped
+        AbstractApplication.nodeInstallApplication(self, node)
+        self.unpackTar(node)
+        self.writeRackDcProperties(node)
+        self.writeTopologyProperties(node)
+        self.writeCassandraYamlProperties(node)
+        self.writeIOProperties(node)
+        self.createDirectories(node)
+        invoke_init_script = node.id == self.init_node
+        self.bootstrapNode(
+            node,
+            {
+                "NODE_ALL_IPS": [f"{iface.addresses[0].address}" for iface in self.all_ips],
+                "SEED_NODE": node.id in self.seeds,
+                "INVOKE_INIT": invoke_init_script,
+                "DC_COUNT": len(self.cluster.datacentres),
+                "YCSB_RF": self.ycsb_rf,
+                "YCSB_REPLICATION": self.replicationStrategy(),
+                "SCYLLA_ARGS": " ".join(self.scyllaArguments(node)),
+                # Confines the container to the shard cpus as well
+                "SCYLLA_CPUSET": formatCpuList(self.shardCpus())
+            },
+            [
+                ".*scylla.*"
+            ]
+        )
@@ -1,8 +1,178 @@
 from abc import ABC, abstractmethod
+from typing import Any
+from provisioner.application.app import LOCAL_PATH
+from provisioner.collector.collector import ExportProtocol, edgeLogsProtocol
 from provisioner.structure.cluster import Cluster
 from provisioner.structure.node import Node
-from provisioner.provisioner import TopologyProperties
+from provisioner.topology import TopologyProperties
+from provisioner.utils import catToFile, mkdir
 import geni.portal as portal
+import json
+
+# Extra collector config files, merged over the base collector config
+# in name order when the collector starts
+OTEL_CONFIG_FRAGMENTS_DIR = "conf.d"
+OTEL_CONFIG_FRAGMENTS_PATH = f"{LOCAL_PATH}/config/otel/{OTEL_CONFIG_FRAGMENTS_DIR}"
+# Lists of the base collector config. Lists replace rather than merge,
+# so fragments setting one repeat these entries alongside their own.
+# The extensions are given with their config, so a fragment listing
+# them also defines them
+BASE_EXTENSIONS: dict[str, dict[str, Any]] = {
+    "health_check": {"endpoint": "0.0.0.0:13133"}
+}
+BASE_PIPELINE_PROCESSORS: dict[str, list[str]] = {
+    "metrics": ["batch"],
+    "logs": ["batch"],
+    "traces": ["batch"]
+}
+# Scraping faster than this costs the databases more than the
+# resolution is worth
+MIN_SCRAPE_INTERVAL_MS = 1000
+EDGE_LOGS_QUEUE_SIZE = 1000
+SAMPLING_KEY_ATTRIBUTE = "sampling.key"
+
+def writeCollectorConfigFragment(node: Node, name: str, config: dict[str, Any]) -> str:
+    # JSON is valid YAML, and avoids a YAML dependency
+    mkdir(node, OTEL_CONFIG_FRAGMENTS_PATH)
+    path = f"{OTEL_CONFIG_FRAGMENTS_PATH}/{name}.yaml"
+    catToFile(
+        node,
+        path,
+        json.dumps(config, indent=4),
+        literal=True
+    )
+    return path
+
+def metricsPipelineFragment(name: str, receivers: dict[str, Any]) -> dict[str, Any]:
+    # Exports into the collector's own OTLP receiver, so the received
+    # metrics take the same pipeline as every other source
+    return {
+        "receivers": receivers,
+        "processors": {
+            f"batch/{name}": {}
+        },
+        "exporters": {
+            f"otlphttp/{name}": {
+                "endpoint": "http://localhost:4318"
+            }
+        },
+        "service": {
+            "pipelines": {
+                f"metrics/{name}": {
+                    "receivers": list(receivers.keys()),
+                    "processors": [f"batch/{name}"],
+                    "exporters": [f"otlphttp/{name}"]
+                }
+            }
+        }
+    }
+
+def logPipelineFragment(params: portal.Namespace,
+                        collector_address: str,
+                        noisy_patterns: list[str]) -> dict[str, Any]:
+    # Replaces the processors and exporters of the node's base logs
+    # pipeline, keeping its receivers
+    drop_conditions = []
+    if params.collector_log_min_severity != "TRACE":
+        drop_conditions.append(
+            "severity_number != SEVERITY_NUMBER_UNSPECIFIED"
+            f" and severity_number < SEVERITY_NUMBER_{params.collector_log_min_severity}"
+        )
+    noisy_condition = "IsMatch(body, " + json.dumps("|".join(noisy_patterns)) + ")"
+    sample_noisy = len(noisy_patterns) > 0 and 0 < params.collector_log_noisy_sample_percentage < 100
+    if len(noisy_patterns) > 0 and params.collector_log_noisy_sample_percentage == 0:
+        drop_conditions.append(noisy_condition)
+    protocol = edgeLogsProtocol(params)
+    exporter_name = "otlp/edge_logs"
+    endpoint = f"{collector_address}:{protocol.port()}"
+    if protocol == ExportProtocol.HTTP_PROTOBUF:
+        exporter_name = "otlphttp/edge_logs"
+        endpoint = f"http://{endpoint}"
+    exporter = {
+        "endpoint": endpoint,
+        "tls": {"insecure": True},
+        "compression": params.collector_log_compression,
+        "sending_queue": {"queue_size": EDGE_LOGS_QUEUE_SIZE},
+        "retry_on_failure": {"enabled": True}
+    }
+    fragment: dict[str, Any] = {
+        "processors": {
+            "batch/edge_logs": {
+                "send_batch_size": params.collector_log_batch_size,
+                "send_batch_max_size": params.collector_log_batch_size,
+                "timeout": f"{params.collector_log_batch_timeout_ms}ms"
+            }
+        },
+        "exporters": {
+            exporter_name: exporter
+        },
+        "service": {
+            "pipelines": {}
+        }
+    }
+    processors = []
+    if len(drop_conditions) > 0:
+        fragment["processors"]["filter/edge_logs"] = {
+            "error_mode": "ignore",
+            "logs": {"log_record": drop_conditions}
+        }
+        processors.append("filter/edge_logs")
+    pipelines = fragment["service"]["pipelines"]
+    if not sample_noisy:
+        pipelines["logs"] = {
+            "processors": processors + ["batch/edge_logs"],
+            "exporters": [exporter_name]
+        }
+        return fragment
+    # Noisy records are routed through their own pipeline, sampled on a
+    # random key as they rarely carry a trace id
+    fragment["connectors"] = {
+        "routing/edge_logs": {
+            "error_mode": "ignore",
+            "default_pipelines": ["logs/edge"],
+            "table": [{
+                "context": "log",
+                "condition": noisy_condition,
+                "pipelines": ["logs/edge_noisy"]
+            }]
+        }
+    }
+    fragment["processors"].update({
+        "transform/edge_noisy": {
+            "error_mode": "ignore",
+            "log_statements": [
+                f"set(log.attributes[\"{SAMPLING_KEY_ATTRIBUTE}\"], UUID())"
+            ]
+        },
+        "probabilistic_sampler/edge_noisy": {
+            "sampling_percentage": params.collector_log_noisy_sample_percentage,
+            "attribute_source": "record",
+            "from_attribute": SAMPLING_KEY_ATTRIBUTE
+        },
+        "attributes/edge_noisy": {
+            "actions": [{"key": SAMPLING_KEY_ATTRIBUTE, "action": "delete"}]
+        }
+    })
+    pipelines["logs"] = {
+        "processors": processors,
+        "exporters": ["routing/edge_logs"]
+    }
+    pipelines["logs/edge"] = {
+        "receivers": ["routing/edge_logs"],
+        "processors": ["batch/edge_logs"],
+        "exporters": [exporter_name]
+    }
+    pipelines["logs/edge_noisy"] = {
+        "receivers": ["routing/edge_logs"],
+        "processors": [
+            "transform/edge_noisy",
+            "probabilistic_sampler/edge_noisy",
+            "attributes/edge_noisy",
+            "batch/edge_logs"
+        ],
+        "exporters": [exporter_name]
+    }
+    return fragment
 
 class CollectionConfiguration(ABC):
 
@@ -17,6 +17,85 @@ class OTELFeature(Enum):
     def __str__(self) -> str:
         return "%s" % self.value
 
+class TraceSampler(Enum):
+    ALWAYS_ON = "always_on"
+    # Fraction of trace ids, decided independently on every node
+    RATIO = "traceidratio"
+    # Follows the decision of the calling service, ratio for root spans
+    PARENT_BASED_RATIO = "parentbased_traceidratio"
+    # Per node traces per second, served by the collector
+    RATE_LIMITED = "jaeger_remote"
+
+    def __str__(self) -> str:
+        return "%s" % self.value
+
+# Ports of the collector's jaeger_remote_sampling extension
+SAMPLING_STRATEGY_GRPC_PORT = 14250
+SAMPLING_STRATEGY_POLLING_INTERVAL_MS = 60000
+
+def traceSamplerProperties(params: portal.Namespace, collector_address: str) -> dict[str, str]:
+    sampler = TraceSampler(params.collector_traces_sampler)
+    ratio = f"{params.collector_traces_sample_percentage / 100}"
+    if sampler == TraceSampler.ALWAYS_ON:
+        return {"OTEL_TRACES_SAMPLER": str(sampler)}
+    if sampler == TraceSampler.RATE_LIMITED:
+        # Until the first strategy poll, the ratio is used
+        return {
+            "OTEL_TRACES_SAMPLER": str(sampler),
+            "OTEL_TRACES_SAMPLER_ARG": ",".join([
+                f"endpoint=http://{collector_address}:{SAMPLING_STRATEGY_GRPC_PORT}",
+                f"pollingIntervalMs={SAMPLING_STRATEGY_POLLING_INTERVAL_MS}",
+                f"initialSamplingRate={ratio}"
+            ])
+        }
+    return {
+        "OTEL_TRACES_SAMPLER": str(sampler),
+        "OTEL_TRACES_SAMPLER_ARG": ratio
+    }
+
+class ExportProtocol(Enum):
+    GRPC = "grpc"
+    HTTP_PROTOBUF = "http/protobuf"
+
+    def __str__(self) -> str:
+        return "%s" % self.value
+
+    def port(self) -> int:
+        return 4317 if self == ExportProtocol.GRPC else 4318
+
+def edgeLogsProtocol(params: portal.Namespace) -> ExportProtocol:
+    # Node logs take whichever OTLP transport the instrumentation does
+    # not, so their bandwidth budget can be shaped on the port alone
+    if ExportProtocol(params.collector_export_protocol) == ExportProtocol.GRPC:
+        return ExportProtocol.HTTP_PROTOBUF
+    return ExportProtocol.GRPC
+
+# Compressions the SDKs all support, zstd needs extensions to the agents
+EXPORT_COMPRESSIONS = ["none", "gzip"]
+
+def exportTuningProperties(params: portal.Namespace, collector_address: str) -> dict[str, str]:
+    protocol = ExportProtocol(params.collector_export_protocol)
+    return {
+        "OTEL_EXPORTER_OTLP_ENDPOINT": f"http://{collector_address}:{protocol.port()}",
+        "OTEL_EXPORTER_OTLP_PROTOCOL": str(protocol),
+        "OTEL_EXPORTER_OTLP_COMPRESSION": params.collector_export_compression,
+        "OTEL_BSP_MAX_EXPORT_BATCH_SIZE": str(params.collector_export_span_batch_size),
+        "OTEL_BSP_MAX_QUEUE_SIZE": str(params.collector_export_span_queue_size),
+        "OTEL_BSP_SCHEDULE_DELAY": str(params.collector_export_schedule_delay_ms),
+        "OTEL_BLRP_MAX_EXPORT_BATCH_SIZE": str(params.collector_export_log_batch_size),
+        "OTEL_BLRP_MAX_QUEUE_SIZE": str(params.collector_export_log_queue_size),
+        "OTEL_BLRP_SCHEDULE_DELAY": str(params.collector_export_schedule_delay_ms),
+        "OTEL_METRIC_EXPORT_INTERVAL": str(params.collector_export_metric_interval_ms)
+    }
+
+def otelSystemProperties(properties: dict[str, str]) -> str:
+    # Java agent form of the SDK environment variables
+    return "\n".join([f"{name.lower().replace('_', '.')}={value}" for name, value in properties.items()])
+
+# Lowest to highest, named as the OTTL SEVERITY_NUMBER_* enums
+LOG_SEVERITIES = ["TRACE", "DEBUG", "INFO", "WARN", "ERROR"]
+LOG_COMPRESSIONS = ["none", "gzip", "zstd"]
+
 class CollectorParameterGroup(ParameterGroup):
 
     @classmethod
@@ -53,6 +132,218 @@ class CollectorParameterGroup(ParameterGroup):
                     description="Comma separated features to enable with OTEL integration. It can be any combination of [metrics, logs, traces]",
                     typ=portal.ParameterType.STRING,
                     defaultValue="metrics,logs,traces"
+                ),
+                Parameter(
+                    name="collector_traces_sampler",
+                    description="Head sampler deciding which traces the nodes record",
+                    longDescription="Tracing every request under benchmark load adds overhead to the database under test and floods the trace store",
+                    typ=portal.ParameterType.STRING,
+                    defaultValue=str(TraceSampler.PARENT_BASED_RATIO),
+                    legalValues=[
+                        (str(TraceSampler.ALWAYS_ON), "Always on"),
+                        (str(TraceSampler.RATIO), "Trace id ratio"),
+                        (str(TraceSampler.PARENT_BASED_RATIO), "Parent based trace id ratio"),
+                        (str(TraceSampler.RATE_LIMITED), "Rate limited")
+                    ]
+                ),
+                Parameter(
+                    name="collector_traces_sample_percentage",
+                    description="Percentage of traces sampled by the ratio samplers, and by the rate limited sampler until it fetches its strategy",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=10
+                ),
+                Parameter(
+                    name="collector_traces_rate_limit",
+                    description="Traces per second sampled on each node by the rate limited sampler",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=100
+                ),
+                Parameter(
+                    name="collector_tail_sampling",
+                    description="Sample traces on the collector once complete, keeping all error and slow traces",
+                    longDescription="Only traces passing the head sampler reach the collector, use the always on sampler to keep every error and slow trace",
+                    typ=portal.ParameterType.BOOLEAN,
+                    defaultValue=False
+                ),
+                Parameter(
+                    name="collector_tail_sampling_latency_ms",
+                    description="Traces taking at least this long are kept by tail sampling",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=500,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_tail_sampling_percentage",
+                    description="Percentage of the remaining traces kept by tail sampling",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=10,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_log_min_severity",
+                    description="Log records below this severity are dropped on the nodes, records without a parsed severity are kept",
+                    typ=portal.ParameterType.STRING,
+                    defaultValue="INFO",
+                    legalValues=[(severity, severity.title()) for severity in LOG_SEVERITIES]
+                ),
+                Parameter(
+                    name="collector_log_noisy_sample_percentage",
+                    description="Percentage of the log records from high volume loggers (compaction, GC) shipped from the nodes, 0 drops them",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=10
+                ),
+                Parameter(
+                    name="collector_log_bandwidth_kbps",
+                    description="Bandwidth budget in kbit/s for shipping logs from each node, 0 is unlimited",
+                    longDescription="Keeps log traffic from competing with replication traffic on the shared LAN by policing only the log flow to the collector, records are queued and retried and then dropped once the budget is exceeded",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=0
+                ),
+                Parameter(
+                    name="collector_log_compression",
+                    description="Compression of the logs shipped from the nodes",
+                    typ=portal.ParameterType.STRING,
+                    defaultValue="zstd",
+                    legalValues=[(compression, compression) for compression in LOG_COMPRESSIONS],
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_log_batch_size",
+                    description="Log records per batch shipped from the nodes",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=4096,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_log_batch_timeout_ms",
+                    description="Longest time a log record waits on a node for its batch to fill",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=5000,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_export_protocol",
+                    description="Protocol the instrumentation on the nodes exports to the collector with",
+                    typ=portal.ParameterType.STRING,
+                    defaultValue=str(ExportProtocol.HTTP_PROTOBUF),
+                    legalValues=[(str(protocol), str(protocol)) for protocol in ExportProtocol],
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_export_compression",
+                    description="Compression of the exports from the instrumentation on the nodes",
+                    typ=portal.ParameterType.STRING,
+                    defaultValue="gzip",
+                    legalValues=[(compression, compression) for compression in EXPORT_COMPRESSIONS],
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_export_span_batch_size",
+                    description="Spans per export from the instrumentation on the nodes",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=2048,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_export_span_queue_size",
+                    description="Spans queued for export by the instrumentation before they are dropped",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=16384,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_export_log_batch_size",
+                    description="Log records per export from the instrumentation on the nodes",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=2048,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_export_log_queue_size",
+                    description="Log records queued for export by the instrumentation before they are dropped",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=16384,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_export_schedule_delay_ms",
+                    description="Longest time spans and log records wait for their batch to fill",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=5000,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_export_metric_interval_ms",
+                    description="Interval the instrumentation on the nodes exports metrics at",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=10000,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_metrics_retention_hours",
+                    description="Hours metrics are kept on the collector",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=72
+                ),
+                Parameter(
+                    name="collector_logs_retention_hours",
+                    description="Hours logs are kept on the collector",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=24
+                ),
+                Parameter(
+                    name="collector_traces_retention_hours",
+                    description="Hours traces are kept on the collector",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=24
+                ),
+                Parameter(
+                    name="collector_downsample_after_hours",
+                    description="Hours after the collector starts to reduce the resolution of JMX metrics, 0 keeps full resolution",
+                    longDescription="The stored metrics cannot be rewritten, so JMX metrics received from then on are thinned to one point per collector_downsample_interval_ms",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=6
+                ),
+                Parameter(
+                    name="collector_downsample_interval_ms",
+                    description="Resolution of JMX metrics once downsampled",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=10000,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_storage_gib",
+                    description="Size of the collector's telemetry block store, 0 sizes it from the expected ingest and retention",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=0
+                ),
+                Parameter(
+                    name="collector_expected_series_per_node",
+                    description="JMX metric series expected from each node, for sizing the telemetry block store",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=2000,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_expected_log_kbps_per_node",
+                    description="Log volume in kbit/s expected from each node, for sizing the telemetry block store",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=500,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_expected_spans_per_node",
+                    description="Sampled spans per second expected from each node, for sizing the telemetry block store",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=100,
+                    advanced=True
+                ),
+                Parameter(
+                    name="collector_memory_limit_percentage",
+                    description="Percentage of the collector node's usable memory the collector pipelines may hold before refusing data, the rest is left to the storage backends",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=25,
+                    advanced=True
                 )
             ]
         )
@@ -83,5 +374,76 @@ class CollectorParameterGroup(ParameterGroup):
                 continue
             new_features.add(otel_feature)
         params.collector_features = new_features
+        for name in ["collector_traces_sample_percentage", "collector_tail_sampling_percentage", "collector_log_noisy_sample_percentage"]:
+            if params.__dict__[name] < 0 or params.__dict__[name] > 100:
+                portal.context.reportError(portal.ParameterError(
+                    "Sample percentage must be between 0 and 100",
+                    [name]
+                ))
+        if params.collector_traces_rate_limit < 1:
+            portal.context.reportError(portal.ParameterError(
+                "Trace rate limit must be at least one trace per second",
+                ["collector_traces_rate_limit"]
+            ))
+        if params.collector_tail_sampling_latency_ms < 1:
+            portal.context.reportError(portal.ParameterError(
+                "Tail sampling latency threshold must be positive",
+                ["collector_tail_sampling_latency_ms"]
+            ))
+        if params.collector_log_bandwidth_kbps < 0:
+            portal.context.reportError(portal.ParameterError(
+                "Log bandwidth budget cannot be negative",
+                ["collector_log_bandwidth_kbps"]
+            ))
+        for name in ["collector_log_batch_size", "collector_log_batch_timeout_ms"]:
+            if params.__dict__[name] < 1:
+                portal.context.reportError(portal.ParameterError(
+                    "Log batching must be positive",
+                    [name]
+                ))
+        for name in ["collector_export_span_batch_size", "collector_export_log_batch_size", "collector_export_schedule_delay_ms", "collector_export_metric_interval_ms"]:
+            if params.__dict__[name] < 1:
+                portal.context.reportError(portal.ParameterError(
+                    "Export batching must be positive",
+                    [name]
+                ))
+        for signal in ["span", "log"]:
+            if params.__dict__[f"collector_export_{signal}_queue_size"] < params.__dict__[f"collector_export_{signal}_batch_size"]:
+                portal.context.reportError(portal.ParameterError(
+                    "Export queue must hold at least one batch",
+                    [f"collector_export_{signal}_queue_size", f"collector_export_{signal}_batch_size"]
+                ))
+        for name in ["collector_metrics_retention_hours", "collector_logs_retention_hours", "collector_traces_retention_hours"]:
+            if params.__dict__[name] < 1:
+                portal.context.reportError(portal.ParameterError(
+                    "Retention must be at least an hour",
+                    [name]
+                ))
+        if params.collector_downsample_after_hours < 0:
+            portal.context.reportError(portal.ParameterError(
+                "Downsampling cannot start before the collector",
+                ["collector_downsample_after_hours"]
+            ))
+        for name in ["collector_storage_gib", "collector_expected_series_per_node", "collector_expected_log_kbps_per_node", "collector_expected_spans_per_node"]:
+            if params.__dict__[name] < 0:
+                portal.context.reportError(portal.ParameterError(
+                    "Storage sizing cannot be negative",
+                    [name]
+                ))
+        if params.collector_downsample_interval_ms < 1:
+            portal.context.reportError(portal.ParameterError(
+                "Downsampled resolution must be positive",
+                ["collector_downsample_interval_ms"]
+            ))
+        if params.collector_memory_limit_percentage < 5 or params.collector_memory_limit_percentage > 75:
+            portal.context.reportError(portal.ParameterError(
+                "Memory limit must be between 5% and 75%, leaving the storage backends room",
+                ["collector_memory_limit_percentage"]
+            ))
+        if params.collector_tail_sampling and OTELFeature.TRACES not in new_features:
+            portal.context.reportError(portal.ParameterError(
+                "Tail sampling requires the traces collector feature",
+                ["collector_tail_sampling", "collector_features"]
+            ))
 
 COLLECTOR_PARAMETERS: ParameterGroup = CollectorParameterGroup()
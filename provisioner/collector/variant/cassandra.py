@@ -1,12 +1,49 @@
 from provisioner.structure.cluster import Cluster
 from provisioner.structure.node import Node
-from provisioner.provisioner import TopologyProperties
-from provisioner.utils import catToFile, chmod
-from provisioner.application.app import ApplicationVariant, LOCAL_PATH
+from provisioner.topology import TopologyProperties
+from provisioner.utils import catToFile, chmod, mkdir
+from provisioner.application.app import ApplicationVariant, LOCAL_PATH, USERNAME
+from provisioner.application.parameters.cassandra import replicationStrategy
 from provisioner.collector.collection_config import CollectionConfiguration
+import geni.portal as portal
+
+YCSB_KEYSPACE = "ycsb"
+YCSB_TABLE = "usertable"
+YCSB_FIELD_COUNT = 10
+YCSB_PROFILES_PATH = f"{LOCAL_PATH}/ycsb/profiles"
+KEYSPACE_CQL_PATH = f"{LOCAL_PATH}/ycsb/create_keyspace.cql"
+# Runs on the collector as the cluster user, the CQL is executed with
+# cqlsh in the database container of a seed node via the cluster key
+KEYSPACE_BOOTSTRAP_SCRIPT = """
+cassandraExec() {
+    ssh -o BatchMode=yes "$CQL_HOST" "docker exec -i \\$(docker ps --format '{{.Names}}' | grep -m1 $CONTAINER_NAME) $1"
+}
+
+echo "Waiting for $NODE_COUNT nodes to be up and normal"
+for attempt in $(seq 1 60); do
+    UP=$(cassandraExec "nodetool status" 2>/dev/null | grep -c '^UN')
+    if [ "${UP:-0}" -ge "$NODE_COUNT" ]; then
+        break
+    fi
+    sleep 10
+done
+if [ "${UP:-0}" -lt "$NODE_COUNT" ]; then
+    echo "Only ${UP:-0} of $NODE_COUNT nodes are up and normal" >&2
+    exit 1
+fi
+cassandraExec "cqlsh $CQL_HOST" < "$KEYSPACE_CQL"
+"""
 
 class CassandraCollectionConfig(CollectionConfiguration):
 
+    @classmethod
+    def variant(cls) -> ApplicationVariant:
+        return ApplicationVariant.CASSANDRA
+
+    @classmethod
+    def keyspaceBootstrapScriptPath(cls) -> str:
+        return f"{LOCAL_PATH}/bin/{cls.variant()}-bootstrap-keyspace"
+
     @classmethod
     def writeJMXCollectionConfig(cls,
                                  node: Node,
@@ -53,17 +90,105 @@ otel.resource.attributes=application={ApplicationVariant.CASSANDRA},node={cluste
                                         node: Node,
                                         cluster: Cluster,
                                         topology_properties: TopologyProperties) -> str:
-        all_ips: list[str] = []
-        for cluster_node in topology_properties.db_nodes.values():
-            all_ips.append(cluster_node.getInterfaceAddress())
+        # Contact points are limited to the primary datacentre so the
+        # driver does not treat remote replicas as local
+        all_ips: list[str] = list(cls.datacentreAddresses(cluster, topology_properties).values())[0]
         return f"""
         hosts={",".join(all_ips)}
         port=9042
         """
 
+    @classmethod
+    def datacentreAddresses(cls, cluster: Cluster, topology_properties: TopologyProperties) -> dict[str, list[str]]:
+        addresses: dict[str, list[str]] = {}
+        for node_id, (_, dc, _) in cluster.inverse_topology.items():
+            addresses.setdefault(dc, []).append(topology_properties.db_nodes[node_id].getInterfaceAddress())
+        return addresses
+
+    @classmethod
+    def createHostProperties(cls, addresses: list[str]) -> list[str]:
+        return [
+            f"hosts={','.join(addresses)}",
+            "port=9042"
+        ]
+
+    @classmethod
+    def createClientRoutingProperties(cls, dc: str, params: portal.Namespace) -> str:
+        # With contact points in a single datacentre the driver's default
+        # token aware, DC aware round robin policy infers it as local and
+        # routes each request to a local replica
+        return "\n".join([
+            f"cassandra.keyspace={YCSB_KEYSPACE}",
+            f"cassandra.localdc={dc}",
+            f"cassandra.readconsistencylevel={params.cassandra_ycsb_read_consistency}",
+            f"cassandra.writeconsistencylevel={params.cassandra_ycsb_write_consistency}"
+        ])
+
+    @classmethod
+    def writeDatacentreProfiles(cls,
+                                node: Node,
+                                params: portal.Namespace,
+                                dc_addresses: dict[str, list[str]]) -> None:
+        # One profile per datacentre, so a YCSB client per datacentre
+        # can be run against its local replicas
+        mkdir(node, YCSB_PROFILES_PATH)
+        for dc, addresses in dc_addresses.items():
+            catToFile(
+                node,
+                f"{YCSB_PROFILES_PATH}/{dc}.dat",
+                "\n".join(cls.createHostProperties(addresses) + [
+                    cls.createClientRoutingProperties(dc, params)
+                ])
+            )
+
+    @classmethod
+    def writeKeyspaceBootstrap(cls,
+                               node: Node,
+                               cluster: Cluster,
+                               params: portal.Namespace,
+                               topology_properties: TopologyProperties) -> None:
+        fields = ", ".join([f"field{i} varchar" for i in range(YCSB_FIELD_COUNT)])
+        cql = "\n".join([
+            # Recreated so every run starts from an empty keyspace
+            f"DROP KEYSPACE IF EXISTS {YCSB_KEYSPACE};",
+            f"CREATE KEYSPACE {YCSB_KEYSPACE} WITH replication = {replicationStrategy(list(cluster.datacentres.keys()), params.cassandra_ycsb_rf)};",
+            f"CREATE TABLE {YCSB_KEYSPACE}.{YCSB_TABLE} (y_id varchar PRIMARY KEY, {fields});"
+        ])
+        catToFile(node, KEYSPACE_CQL_PATH, cql, literal=True)
+        cql_host = list(topology_properties.db_nodes.values())[0].getInterfaceAddress()
+        script = "\n".join([
+            "#!/usr/bin/env bash",
+            "# Creates the YCSB keyspace replicated into every datacentre",
+            f"if [ \"$(id -un)\" != \"{USERNAME}\" ]; then",
+            f"    exec sudo -u {USERNAME} \"$0\" \"$@\"",
+            "fi",
+            f"CQL_HOST=\"{cql_host}\"",
+            f"NODE_COUNT={len(topology_properties.db_nodes)}",
+            f"CONTAINER_NAME=\"{cls.variant()}\"",
+            f"KEYSPACE_CQL=\"{KEYSPACE_CQL_PATH}\""
+        ]) + KEYSPACE_BOOTSTRAP_SCRIPT
+        mkdir(node, f"{LOCAL_PATH}/bin")
+        catToFile(node, cls.keyspaceBootstrapScriptPath(), script, literal=True)
+        chmod(node, cls.keyspaceBootstrapScriptPath(), 0o755)
+
     @classmethod
     def createBenchmarkingProperties(cls,
                                     node: Node,
                                     cluster: Cluster,
+                                    params: portal.Namespace,
                                     topology_properties: TopologyProperties) -> dict[str, str]:
-        return {}
+        dc_addresses = cls.datacentreAddresses(cluster, topology_properties)
+        primary_dc = list(dc_addresses.keys())[0]
+        cls.writeDatacentreProfiles(node, params, dc_addresses)
+        # The base profile routes as a client in the primary datacentre
+        catToFile(
+            node,
+            f"{LOCAL_PATH}/ycsb/base_profile.dat",
+            cls.createClientRoutingProperties(primary_dc, params),
+            append=True
+        )
+        cls.writeKeyspaceBootstrap(node, cluster, params, topology_properties)
+        return {
+            "keyspace_bootstrap_script": cls.keyspaceBootstrapScriptPath(),
+            "ycsb_profiles_path": YCSB_PROFILES_PATH
+        }
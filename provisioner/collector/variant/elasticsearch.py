@@ -1,30 +1,83 @@
 from provisioner.structure.cluster import Cluster
 from provisioner.structure.node import Node
-from provisioner.provisioner import TopologyProperties
-from provisioner.utils import catToFile, chmod
+from provisioner.structure.topology_assigner import findNodesWithRole
+from provisioner.structure.variant.elasticsearch import ElasticsearchNodeRole
+from provisioner.topology import TopologyProperties
+from provisioner.utils import catToFile
 from provisioner.application.app import ApplicationVariant, LOCAL_PATH
-from provisioner.collector.collection_config import CollectionConfiguration
+from provisioner.application.variant.elasticsearch import ELASTICSEARCH_HTTP_PORT, indexReplicaCount, indexShardCount
+from provisioner.collector.collection_config import CollectionConfiguration, MIN_SCRAPE_INTERVAL_MS, metricsPipelineFragment, writeCollectorConfigFragment
+import geni.portal as portal
+
+YCSB_INDEX = "ycsb"
 
 class ElasticsearchCollectionConfig(CollectionConfiguration):
 
     @classmethod
-    def writeJMLCollectionConfig(cls,
-                                 npode: Node,
-                                 otel_topology_properties: TopologyProperties,
+    def writeJMXCollectionConfig(cls,
+                                 node: Node,
+                                 topology_properties: TopologyProperties,
                                  otel_collection_interval: int,
                                  otel_container_local_path) -> None:
-        pass
+        # Polled over the REST API by the collector's elasticsearch
+        # receiver, each node reports only itself and the cluster wide
+        # metrics are taken from the first node alone
+        collection_interval = f"{max(otel_collection_interval, MIN_SCRAPE_INTERVAL_MS)}ms"
+        receivers = {}
+        for i, cluster_node in enumerate(topology_properties.db_nodes.values()):
+            receivers[f"elasticsearch/{cluster_node.id}"] = {
+                "endpoint": f"http://{cluster_node.getInterfaceAddress()}:{ELASTICSEARCH_HTTP_PORT}",
+                "nodes": ["_local"],
+                "skip_cluster_metrics": i > 0,
+                "collection_interval": collection_interval
+            }
+        writeCollectorConfigFragment(node, "elasticsearch", metricsPipelineFragment(
+            str(ApplicationVariant.ELASTICSEARCH),
+            receivers
+        ))
+
+    @classmethod
+    def clientNodes(cls, cluster: Cluster) -> list[str]:
+        # Coordinating only nodes take the client requests where present
+        coordinating = findNodesWithRole(cluster.inverse_topology, str(ElasticsearchNodeRole.COORDINATING))
+        if len(coordinating) > 0:
+            return coordinating
+        return findNodesWithRole(cluster.inverse_topology, str(ElasticsearchNodeRole.DATA))
 
     @classmethod
     def createYCSBBaseProfileProperties(cls,
                                         node: Node,
                                         cluster: Cluster,
                                         topology_properties: TopologyProperties) -> str:
-        return ""
+        hosts = [
+            f"{topology_properties.db_nodes[client].getInterfaceAddress()}:{ELASTICSEARCH_HTTP_PORT}"
+            for client in cls.clientNodes(cluster)
+        ]
+        return f"es.hosts.list={','.join(hosts)}\n"
 
     @classmethod
     def createBenchmarkingProperties(cls,
                                     node: Node,
                                     cluster: Cluster,
+                                    params: portal.Namespace,
                                     topology_properties: TopologyProperties) -> dict[str, str]:
-        return {}
+        data_nodes = len(findNodesWithRole(cluster.inverse_topology, str(ElasticsearchNodeRole.DATA)))
+        shards = indexShardCount(params, data_nodes)
+        replicas = indexReplicaCount(params, data_nodes)
+        # The YCSB binding (re)creates the index with these settings
+        # before loading, in place of the single shard defaults
+        catToFile(
+            node,
+            f"{LOCAL_PATH}/ycsb/base_profile.dat",
+            "\n".join([
+                f"es.index.key={YCSB_INDEX}",
+                f"es.number_of_shards={shards}",
+                f"es.number_of_replicas={replicas}",
+                "es.new_index=true"
+            ]),
+            append=True
+        )
+        return {
+            "elasticsearch_shards": str(shards),
+            "elasticsearch_replicas": str(replicas)
+        }
@@ -3,8 +3,10 @@ from provisioner.structure.cluster import Cluster
 from provisioner.structure.node import Node
 from provisioner.structure.topology_assigner import findNodesWithRole
 from provisioner.structure.variant.hbase import HBaseNodeRole
-from provisioner.provisioner import TopologyProperties
+from provisioner.topology import TopologyProperties
 from provisioner.docker import DockerConfig
+from provisioner.utils import catToFile, chmod, mkdir
+from provisioner.application.app import LOCAL_PATH, USERNAME
 # from provisioner.utils import catToFile, chmod, sed
 # from provisioner.application.app import ApplicationVariant, LOCAL_PATH
 from provisioner.collector.collection_config import CollectionConfiguration
@@ -16,6 +18,35 @@ HBASE_ROLE_PORT_MAPPINGS: dict[HBaseNodeRole, list[tuple[str, int]]] = {
     HBaseNodeRole.HDFS_NAME: [("otel_regionserver.properties", 0)]
 }
 
+TABLE_BOOTSTRAP_SHELL_PATH = f"{LOCAL_PATH}/ycsb/create_tables.rb"
+TABLE_BOOTSTRAP_SCRIPT_PATH = f"{LOCAL_PATH}/bin/hbase-bootstrap-tables"
+# Runs on the collector as the cluster user, the shell commands are
+# executed in the HBase container on the master via the cluster key
+TABLE_BOOTSTRAP_SCRIPT = """
+hbaseShell() {
+    ssh -o BatchMode=yes "$HBASE_MASTER" 'docker exec -i "$(docker ps --format "{{.Names}}" | grep -m1 hbase)" hbase shell -n'
+}
+
+echo "Waiting for $REGION_SERVER_COUNT region servers to be live"
+for attempt in $(seq 1 60); do
+    LIVE=$(echo "status 'simple'" | hbaseShell 2>/dev/null | grep -oE '[0-9]+ (live )?servers' | grep -oE '^[0-9]+')
+    if [ "${LIVE:-0}" -ge "$REGION_SERVER_COUNT" ]; then
+        break
+    fi
+    sleep 10
+done
+if [ "${LIVE:-0}" -lt "$REGION_SERVER_COUNT" ]; then
+    echo "Only ${LIVE:-0} of $REGION_SERVER_COUNT region servers are live" >&2
+    exit 1
+fi
+hbaseShell < "$TABLE_BOOTSTRAP_SHELL"
+"""
+
+def ycsbSplitPoints(regions: int) -> list[str]:
+    # YCSB keys are "user" followed by a (hashed) number, split evenly
+    # over the leading four digits as recommended by the YCSB HBase binding
+    return [f"user{1000 + (i * (9999 - 1000)) // regions}" for i in range(1, regions)]
+
 class HBaseCollectionConfig(CollectionConfiguration):
 
     @classmethod
@@ -102,6 +133,52 @@ class HBaseCollectionConfig(CollectionConfiguration):
         hbase_app.writeCoreConfiguration(node)
         hbase_app.writeHBaseConfiguration(node, HBaseNodeRole.HBASE_MASTER)
         region_server_count = len(findNodesWithRole(cluster.inverse_topology, str(HBaseNodeRole.HBASE_REGION_SERVER)))
-        return {
+        properties = {
             "region_server_count": f"{region_server_count}"
         }
+        if params.hbase_presplit_regions_per_server > 0:
+            cls.writeTableBootstrap(node, cluster, params, region_server_count)
+            properties["table_bootstrap_script"] = TABLE_BOOTSTRAP_SCRIPT_PATH
+        return properties
+
+    @classmethod
+    def writeTableBootstrap(cls,
+                            node: Node,
+                            cluster: Cluster,
+                            params: portal.Namespace,
+                            region_server_count: int) -> None:
+        regions = max(1, region_server_count * params.hbase_presplit_regions_per_server)
+        column_family = params.hbase_benchmark_column_family
+        commands: list[str] = []
+        for table in [table.strip() for table in params.hbase_benchmark_tables.split(",") if table.strip() != ""]:
+            # Recreated so every run starts from the same region layout
+            commands.append(f"if list.include?('{table}') then disable '{table}'; drop '{table}' end")
+            if regions == 1:
+                commands.append(f"create '{table}', '{column_family}'")
+            elif params.hbase_presplit_algorithm == "ycsb":
+                splits = ", ".join([f"'{point}'" for point in ycsbSplitPoints(regions)])
+                commands.append(f"create '{table}', '{column_family}', {{SPLITS => [{splits}]}}")
+            else:
+                commands.append(f"create '{table}', '{column_family}', {{NUMREGIONS => {regions}, SPLITALGO => '{params.hbase_presplit_algorithm}'}}")
+        if params.hbase_balance_before_load:
+            commands += [
+                "balance_switch true",
+                # The balancer declines to run while regions are in transition
+                "30.times { break if balancer; sleep 5 }"
+            ]
+        commands.append("exit")
+        catToFile(node, TABLE_BOOTSTRAP_SHELL_PATH, "\n".join(commands), literal=True)
+        master = findNodesWithRole(cluster.inverse_topology, str(HBaseNodeRole.HBASE_MASTER), True)[0]
+        script = "\n".join([
+            "#!/usr/bin/env bash",
+            "# Creates the benchmark tables pre-split across the region servers",
+            f"if [ \"$(id -un)\" != \"{USERNAME}\" ]; then",
+            "    exec sudo -u " + USERNAME + " \"$0\" \"$@\"",
+            "fi",
+            f"HBASE_MASTER=\"{master}-LAN\"",
+            f"REGION_SERVER_COUNT={region_server_count}",
+            f"TABLE_BOOTSTRAP_SHELL=\"{TABLE_BOOTSTRAP_SHELL_PATH}\""
+        ]) + TABLE_BOOTSTRAP_SCRIPT
+        mkdir(node, f"{LOCAL_PATH}/bin")
+        catToFile(node, TABLE_BOOTSTRAP_SCRIPT_PATH, script, literal=True)
+        chmod(node, TABLE_BOOTSTRAP_SCRIPT_PATH, 0o755)
@@ -1,30 +1,144 @@
 from provisioner.structure.cluster import Cluster
 from provisioner.structure.node import Node
-from provisioner.provisioner import TopologyProperties
-from provisioner.utils import catToFile, chmod
-from provisioner.application.app import ApplicationVariant, LOCAL_PATH
-from provisioner.collector.collection_config import CollectionConfiguration
+from provisioner.structure.variant.mongodb import CONFIG_REPLICA_SET, MongoDBNodeRole, MongoDBTopologyAssigner, configReplicaSet, shardReplicaSets
+from provisioner.topology import TopologyProperties
+from provisioner.utils import catToFile, chmod, mkdir
+from provisioner.application.app import ApplicationVariant, LOCAL_PATH, USERNAME
+from provisioner.application.variant.mongodb import MONGODB_ROLE_PORTS, MONGOS_PORT, replicaSetConnection
+from provisioner.collector.collection_config import CollectionConfiguration, MIN_SCRAPE_INTERVAL_MS, metricsPipelineFragment, writeCollectorConfigFragment
+import geni.portal as portal
+
+YCSB_DATABASE = "ycsb"
+YCSB_COLLECTION = "usertable"
+MONGOS_CONFIG_PATH = f"{LOCAL_PATH}/config/mongodb/mongos.conf"
+COLLECTION_JS_PATH = f"{LOCAL_PATH}/ycsb/create_collection.js"
+COLLECTION_BOOTSTRAP_SCRIPT_PATH = f"{LOCAL_PATH}/bin/mongodb-bootstrap-collection"
+# Runs on the collector as the cluster user, against the mongos router
+# that runs alongside the YCSB clients. Retried until every shard
+# replica set has been initiated and elected a primary
+COLLECTION_BOOTSTRAP_SCRIPT = """
+mongosExec() {
+    docker exec -i "$(docker ps --format '{{.Names}}' | grep -m1 mongos)" mongosh --quiet "mongodb://localhost:$MONGOS_PORT" --eval "$1"
+}
+
+for attempt in $(seq 1 60); do
+    # Evaluated rather than piped, so a failed statement fails the attempt
+    if mongosExec "$(cat "$COLLECTION_JS")"; then
+        exit 0
+    fi
+    echo "Shards not ready, retrying" >&2
+    sleep 10
+done
+echo "Failed to create the sharded benchmark collection" >&2
+exit 1
+"""
 
 class MonogDBCollectionConfig(CollectionConfiguration):
 
     @classmethod
-    def writeJMLCollectionConfig(cls,
-                                 npode: Node,
-                                 otel_topology_properties: TopologyProperties,
+    def writeJMXCollectionConfig(cls,
+                                 node: Node,
+                                 topology_properties: TopologyProperties,
                                  otel_collection_interval: int,
                                  otel_container_local_path) -> None:
-        pass
+        # MongoDB has no JMX, every mongod and the local mongos are
+        # polled directly by the collector's mongodb receiver
+        collection_interval = f"{max(otel_collection_interval, MIN_SCRAPE_INTERVAL_MS)}ms"
+        endpoints: dict[str, str] = {
+            "mongos": f"localhost:{MONGOS_PORT}"
+        }
+        for cluster_node in topology_properties.db_nodes.values():
+            for role in cluster_node.roles:
+                port = MONGODB_ROLE_PORTS[MongoDBNodeRole(role)]
+                endpoints[f"{cluster_node.id}-{role}"] = f"{cluster_node.getInterfaceAddress()}:{port}"
+        writeCollectorConfigFragment(node, "mongodb", metricsPipelineFragment(
+            str(ApplicationVariant.MONGO_DB),
+            {
+                f"mongodb/{name}": {
+                    "hosts": [{"endpoint": endpoint}],
+                    "direct_connection": True,
+                    "collection_interval": collection_interval,
+                    "tls": {"insecure": True}
+                }
+                for name, endpoint in endpoints.items()
+            }
+        ))
 
     @classmethod
     def createYCSBBaseProfileProperties(cls,
                                         node: Node,
                                         cluster: Cluster,
                                         topology_properties: TopologyProperties) -> str:
-        return ""
+        return f"mongodb.url=mongodb://{node.getInterfaceAddress()}:{MONGOS_PORT}/{YCSB_DATABASE}\n"
+
+    @classmethod
+    def replicaSetAddresses(cls, members: list[str], topology_properties: TopologyProperties) -> list[str]:
+        return [topology_properties.db_nodes[member].getInterfaceAddress() for member in members]
+
+    @classmethod
+    def writeMongosConfig(cls,
+                          node: Node,
+                          cluster: Cluster,
+                          topology_properties: TopologyProperties) -> None:
+        config_db = replicaSetConnection(
+            CONFIG_REPLICA_SET,
+            cls.replicaSetAddresses(configReplicaSet(cluster.inverse_topology), topology_properties),
+            MONGODB_ROLE_PORTS[MongoDBNodeRole.CONFIG_SERVER]
+        )
+        mkdir(node, f"{LOCAL_PATH}/config/mongodb")
+        catToFile(node, MONGOS_CONFIG_PATH, "\n".join([
+            "# mongos router co-located with the YCSB clients",
+            "net:",
+            f"  port: {MONGOS_PORT}",
+            "  bindIp: 0.0.0.0",
+            "sharding:",
+            f"  configDB: {config_db}"
+        ]), literal=True)
+
+    @classmethod
+    def writeCollectionBootstrap(cls,
+                                 node: Node,
+                                 cluster: Cluster,
+                                 params: portal.Namespace,
+                                 topology_properties: TopologyProperties) -> None:
+        replica_sets = shardReplicaSets(cluster.topology, MongoDBTopologyAssigner.shardCount(params))
+        statements = [
+            f"sh.addShard(\"{replicaSetConnection(name, cls.replicaSetAddresses(members, topology_properties), MONGODB_ROLE_PORTS[MongoDBNodeRole.SHARD])}\");"
+            for name, members in replica_sets.items()
+        ]
+        # Recreated so every run starts from an empty collection
+        statements.append(f"db.getSiblingDB(\"{YCSB_DATABASE}\").dropDatabase();")
+        if params.mongodb_presplit_chunks_per_shard > 0:
+            # Hashed on the YCSB key so the pre-split chunks take an even
+            # share of the load from the first insert
+            chunks = params.mongodb_presplit_chunks_per_shard * len(replica_sets)
+            statements += [
+                f"sh.enableSharding(\"{YCSB_DATABASE}\");",
+                f"sh.shardCollection(\"{YCSB_DATABASE}.{YCSB_COLLECTION}\", {{_id: \"hashed\"}}, false, {{numInitialChunks: {chunks}}});"
+            ]
+        catToFile(node, COLLECTION_JS_PATH, "\n".join(statements), literal=True)
+        script = "\n".join([
+            "#!/usr/bin/env bash",
+            "# Registers the shards and creates the pre-split benchmark collection",
+            f"if [ \"$(id -un)\" != \"{USERNAME}\" ]; then",
+            f"    exec sudo -u {USERNAME} \"$0\" \"$@\"",
+            "fi",
+            f"MONGOS_PORT={MONGOS_PORT}",
+            f"COLLECTION_JS=\"{COLLECTION_JS_PATH}\""
+        ]) + COLLECTION_BOOTSTRAP_SCRIPT
+        mkdir(node, f"{LOCAL_PATH}/bin")
+        catToFile(node, COLLECTION_BOOTSTRAP_SCRIPT_PATH, script, literal=True)
+        chmod(node, COLLECTION_BOOTSTRAP_SCRIPT_PATH, 0o755)
 
     @classmethod
     def createBenchmarkingProperties(cls,
                                     node: Node,
                                     cluster: Cluster,
+                                    params: portal.Namespace,
                                     topology_properties: TopologyProperties) -> dict[str, str]:
-        return {}
+        cls.writeMongosConfig(node, cluster, topology_properties)
+        cls.writeCollectionBootstrap(node, cluster, params, topology_properties)
+        return {
+            "mongos_config": MONGOS_CONFIG_PATH,
+            "collection_bootstrap_script": COLLECTION_BOOTSTRAP_SCRIPT_PATH
+        }
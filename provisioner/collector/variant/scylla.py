@@ -1,36 +1,114 @@
 from provisioner.structure.cluster import Cluster
 from provisioner.structure.node import Node
-from provisioner.provisioner import TopologyProperties
-from provisioner.utils import catToFile, chmod
-from provisioner.application.app import ApplicationVariant, LOCAL_PATH
-from provisioner.collector.collection_config import CollectionConfiguration
+from provisioner.topology import TopologyProperties
+from provisioner.utils import catToFile, chmod, mkdir
+from provisioner.application.app import ApplicationVariant, LOCAL_PATH, USERNAME
+from provisioner.collector.collection_config import MIN_SCRAPE_INTERVAL_MS, metricsPipelineFragment, writeCollectorConfigFragment
+from provisioner.collector.variant.cassandra import CassandraCollectionConfig, YCSB_KEYSPACE
+import geni.portal as portal
 
-class ScyllaCollectionConfig(CollectionConfiguration):
+SCYLLA_PROMETHEUS_PORT = 9180
+IO_PROPERTIES_SCRIPT_PATH = f"{LOCAL_PATH}/bin/scylla-io-properties"
+# Runs on the collector as the cluster user, prints the io_properties.yaml
+# measured by scylla_io_setup on the first node for caching under
+# scylla_io_properties_path/<node type>.yaml
+IO_PROPERTIES_SCRIPT = """
+ssh -o BatchMode=yes "$SCYLLA_HOST" "docker exec -i \\$(docker ps --format '{{.Names}}' | grep -m1 scylla) cat /etc/scylla.d/io_properties.yaml"
+"""
+
+class ScyllaCollectionConfig(CassandraCollectionConfig):
+
+    @classmethod
+    def variant(cls) -> ApplicationVariant:
+        return ApplicationVariant.SCYLLA
 
     @classmethod
-    def writeJMLCollectionConfig(cls,
-                                 npode: Node,
-                                 otel_topology_properties: TopologyProperties,
+    def writeJMXCollectionConfig(cls,
+                                 node: Node,
+                                 topology_properties: TopologyProperties,
                                  otel_collection_interval: int,
                                  otel_container_local_path) -> None:
-        pass
+        # Scylla has no JMX, its Prometheus endpoint is scraped by the
+        # collector and re-exported over OTLP with the other metrics
+        scrape_interval = f"{max(otel_collection_interval, MIN_SCRAPE_INTERVAL_MS)}ms"
+        static_configs = [
+            {
+                "targets": [f"{cluster_node.getInterfaceAddress()}:{SCYLLA_PROMETHEUS_PORT}"],
+                "labels": {
+                    "application": str(ApplicationVariant.SCYLLA),
+                    "node": cluster_node.id
+                }
+            }
+            for cluster_node in topology_properties.db_nodes.values()
+        ]
+        writeCollectorConfigFragment(node, "scylla-prometheus", metricsPipelineFragment(
+            str(ApplicationVariant.SCYLLA),
+            {
+                "prometheus/scylla": {
+                    "config": {
+                        "scrape_configs": [{
+                            "job_name": str(ApplicationVariant.SCYLLA),
+                            "scrape_interval": scrape_interval,
+                            "scrape_timeout": scrape_interval,
+                            "static_configs": static_configs
+                        }]
+                    }
+                }
+            }
+        ))
 
     @classmethod
     def createYCSBBaseProfileProperties(cls,
                                         node: Node,
                                         cluster: Cluster,
                                         topology_properties: TopologyProperties) -> str:
-        all_ips: list[str] = []
-        for cluster_node in topology_properties.db_nodes.values():
-            all_ips.append(cluster_node.getInterfaceAddress())
-        return f"""
-        scylla.hosts={",".join(all_ips)}
-        port=9042
-        """
+        all_ips: list[str] = list(cls.datacentreAddresses(cluster, topology_properties).values())[0]
+        return "\n".join(cls.createHostProperties(all_ips)) + "\n"
+
+    @classmethod
+    def createHostProperties(cls, addresses: list[str]) -> list[str]:
+        return [
+            f"scylla.hosts={','.join(addresses)}",
+            "scylla.port=9042"
+        ]
+
+    @classmethod
+    def createClientRoutingProperties(cls, dc: str, params: portal.Namespace) -> str:
+        # The Scylla driver is shard aware as well as token aware, so each
+        # request goes to the shard owning its partition on a local replica
+        return "\n".join([
+            f"scylla.keyspace={YCSB_KEYSPACE}",
+            f"scylla.local_dc={dc}",
+            f"scylla.readconsistencylevel={params.cassandra_ycsb_read_consistency}",
+            f"scylla.writeconsistencylevel={params.cassandra_ycsb_write_consistency}"
+        ])
+
+    @classmethod
+    def writeIOPropertiesScript(cls, node: Node, topology_properties: TopologyProperties) -> None:
+        scylla_host = list(topology_properties.db_nodes.values())[0].getInterfaceAddress()
+        script = "\n".join([
+            "#!/usr/bin/env bash",
+            f"if [ \"$(id -un)\" != \"{USERNAME}\" ]; then",
+            f"    exec sudo -u {USERNAME} \"$0\" \"$@\"",
+            "fi",
+            f"SCYLLA_HOST=\"{scylla_host}\""
+        ]) + IO_PROPERTIES_SCRIPT
+        mkdir(node, f"{LOCAL_PATH}/bin")
+        catToFile(node, IO_PROPERTIES_SCRIPT_PATH, script, literal=True)
+        chmod(node, IO_PROPERTIES_SCRIPT_PATH, 0o755)
 
     @classmethod
     def createBenchmarkingProperties(cls,
                                     node: Node,
                                     cluster: Cluster,
+                                    params: portal.Namespace,
                                     topology_properties: TopologyProperties) -> dict[str, str]:
-        return {}
+        properties = super().createBenchmarkingProperties(
+            node,
+            cluster,
+            params,
+            topology_properties
+        )
+        cls.writeIOPropertiesScript(node, topology_properties)
+        properties["io_properties_script"] = IO_PROPERTIES_SCRIPT_PATH
+        return properties
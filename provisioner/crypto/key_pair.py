@@ -1,6 +1,9 @@
+import os
+import tempfile
+from dataclasses import dataclass
 from cryptography.hazmat.backends import default_backend  
 from cryptography.hazmat.primitives import serialization  
-from cryptography.hazmat.primitives.asymmetric import rsa  
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa  
 
 EXPONENT = 65537
 KEY_SIZE = 4096
@@ -32,3 +35,52 @@ def writePublicKeyAsPEMFile(key: rsa.RSAPublicKey, filename: str):
         format=serialization.PublicFormat.SubjectPublicKeyInfo  
     )
     save_file(filename, pem)
+
+@dataclass
+class SSHKeyPair:
+    private_key: str
+    public_key: str
+
+def generateSSHKeyPair(comment: str) -> SSHKeyPair:
+    private_pem = ed25519.Ed25519PrivateKey.generate().private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.OpenSSH,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    return sshKeyPairFromPrivateKey(private_pem.decode("utf-8"), comment)
+
+def sshKeyPairFromPrivateKey(private_pem: str, comment: str) -> SSHKeyPair:
+    # The OpenSSH encoding embeds a random check value, so the private
+    # key is kept as given rather than re-serialised
+    key = serialization.load_ssh_private_key(private_pem.encode("utf-8"), password=None)
+    if not isinstance(key, ed25519.Ed25519PrivateKey):
+        raise ValueError("Cluster key is not an Ed25519 key")
+    public_openssh = key.public_key().public_bytes(
+        encoding=serialization.Encoding.OpenSSH,
+        format=serialization.PublicFormat.OpenSSH
+    )
+    return SSHKeyPair(
+        private_key=private_pem,
+        public_key=f"{public_openssh.decode('utf-8')} {comment}"
+    )
+
+def loadOrCreateSSHKeyPair(path: str, comment: str) -> SSHKeyPair:
+    # The key is cached on disk so that regenerating a profile with
+    # the same parameters yields identical output
+    if not os.path.exists(path):
+        key_pair = generateSSHKeyPair(comment)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, "w") as f:
+            f.write(key_pair.private_key)
+        try:
+            # Linking fails if a concurrent generator got there first,
+            # in which case its key is used instead
+            os.link(temp_path, path)
+            save_file(f"{path}.pub", f"{key_pair.public_key}\n".encode("utf-8"))
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+    with open(path, "r") as f:
+        return sshKeyPairFromPrivateKey(f.read(), comment)
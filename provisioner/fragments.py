@@ -0,0 +1,236 @@
+import base64
+import contextlib
+import copy
+import difflib
+import functools
+import hashlib
+import json
+import os
+import pickle
+import re
+import tempfile
+from typing import Any, Iterator, Optional
+import geni.portal as portal
+import geni.rspec.pg as pg
+from provisioner.structure.node import Node
+
+SOURCE_ROOT = os.path.dirname(os.path.abspath(__file__))
+GLOBAL_SCOPE = "global"
+# Set up by the provisioner before installation and referenced by the
+# LAN, everything else on the node is the installed fragment
+PROVISIONED_NODE_ATTRIBUTES = ["interfaces"]
+# Least recently used fragments beyond this are removed on every store
+MAX_CACHED_FRAGMENTS = 256
+SECRET_PLACEHOLDER = "@@FRAGMENT_SECRET_{}@@"
+LITERAL_WRITE_PATTERN: re.Pattern = re.compile(r"^echo ([A-Za-z0-9+/=]+) \| base64 -d \| sudo tee (-a )?(\S+)$")
+
+class RecordingNamespace:
+    # Stands in for the bound parameters, recording the names read in
+    # each scope so a node fragment can be keyed on just those values
+
+    def __init__(self, params: portal.Namespace):
+        self.__dict__["_params"] = params
+        self.__dict__["_reads"] = {}
+        self.__dict__["_scope"] = GLOBAL_SCOPE
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._params, name)
+        self._reads.setdefault(self._scope, set()).add(name)
+        return value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._params, name, value)
+
+    @contextlib.contextmanager
+    def scope(self, name: str) -> Iterator[None]:
+        previous = self._scope
+        self.__dict__["_scope"] = name
+        try:
+            yield
+        finally:
+            self.__dict__["_scope"] = previous
+
+    def reads(self, *scopes: str) -> list[str]:
+        names: set[str] = set()
+        for scope in scopes:
+            names.update(self._reads.get(scope, set()))
+        return sorted(names)
+
+    def values(self, names: list[str]) -> dict[str, Any]:
+        return {name: getattr(self._params, name) for name in names}
+
+def canonicalJSON(value: Any) -> Any:
+    # Sets are sorted so digests do not depend on the hash seed of the
+    # process, anything else unencodable is keyed on its string form
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return str(value)
+
+def digestOf(value: Any) -> str:
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=canonicalJSON)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+@functools.cache
+def sourceDigest() -> str:
+    # Any change to the generator invalidates every fragment
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(SOURCE_ROOT):
+        dirs.sort()
+        for filename in sorted(files):
+            if not filename.endswith(".py"):
+                continue
+            path = os.path.join(root, filename)
+            digest.update(os.path.relpath(path, SOURCE_ROOT).encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+def describeServices(services: list[Any]) -> list[str]:
+    # Readable form of a node's services for diffing, encoded file
+    # writes are shown with their content
+    lines: list[str] = []
+    for service in services:
+        if isinstance(service, pg.Install):
+            lines.append(f"install {service.url} -> {service.path}")
+            continue
+        if not isinstance(service, pg.Execute):
+            lines.append(f"{service.__class__.__name__.lower()}")
+            continue
+        match = LITERAL_WRITE_PATTERN.match(service.command)
+        if match == None:
+            lines.extend(service.command.split("\n"))
+            continue
+        lines.append(f"{'append to' if match.group(2) else 'write'} {match.group(3)}:")
+        content = base64.b64decode(match.group(1)).decode("utf-8", errors="replace")
+        lines.extend([f"    {line}" for line in content.rstrip("\n").split("\n")])
+    return lines
+
+def replaceInCommands(fragment: dict[str, Any], replacements: list[tuple[str, str]]) -> None:
+    for service in fragment.get("services", []):
+        if not isinstance(service, pg.Execute):
+            continue
+        for old, new in replacements:
+            service.command = service.command.replace(old, new)
+
+class FragmentCache:
+    path: str
+    hits: int
+    misses: int
+    # Values never written to the cache (tokens, private keys), stored
+    # as placeholders and substituted back when a fragment is loaded
+    secrets: list[str]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.secrets = []
+        os.makedirs(os.path.join(path, "fragments"), mode=0o700, exist_ok=True)
+        os.makedirs(os.path.join(path, "index"), mode=0o700, exist_ok=True)
+
+    def addSecret(self, secret: Optional[str]) -> None:
+        if secret != None and secret != "" and secret not in self.secrets:
+            self.secrets.append(secret)
+
+    def redact(self, fragment: dict[str, Any]) -> dict[str, Any]:
+        # Longest first, so no secret is split by one it contains
+        redacted = copy.deepcopy(fragment)
+        replaceInCommands(redacted, sorted(
+            [(secret, SECRET_PLACEHOLDER.format(i)) for i, secret in enumerate(self.secrets)],
+            key=lambda replacement: -len(replacement[0])
+        ))
+        return redacted
+
+    def fragmentPath(self, key: str) -> str:
+        return os.path.join(self.path, "fragments", f"{key}.pickle")
+
+    def indexPath(self, node_id: str) -> str:
+        return os.path.join(self.path, "index", f"{node_id}.json")
+
+    def writeAtomically(self, path: str, content: bytes) -> None:
+        # Concurrent generations (sweeps, the profile service) share a cache
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    def fragmentKey(self, node: Node, inputs: dict[str, Any]) -> str:
+        return digestOf({
+            "source": sourceDigest(),
+            "node": node.id,
+            "inputs": inputs
+        })
+
+    def previousEntry(self, node_id: str) -> Optional[dict[str, Any]]:
+        # The key and parameters read when the node was last generated
+        path = self.indexPath(node_id)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def load(self, key: str, redacted: bool = False) -> Optional[dict[str, Any]]:
+        # The secrets are part of the key, so those of this generation
+        # are the ones the fragment was stored with
+        try:
+            with open(self.fragmentPath(key), "rb") as f:
+                fragment = pickle.load(f)
+        except FileNotFoundError:
+            # Absent, or evicted by a concurrent generation
+            return None
+        if not redacted:
+            replaceInCommands(fragment, [
+                (SECRET_PLACEHOLDER.format(i), secret)
+                for i, secret in enumerate(self.secrets)
+            ])
+        return fragment
+
+    def restore(self, node: Node, key: str) -> bool:
+        fragment = self.load(key)
+        if fragment == None:
+            return False
+        # Marks the fragment as recently used for eviction
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(self.fragmentPath(key))
+        node.instance.__dict__.update(fragment)
+        return True
+
+    def evict(self) -> None:
+        directory = os.path.join(self.path, "fragments")
+        entries = []
+        for filename in os.listdir(directory):
+            with contextlib.suppress(FileNotFoundError):
+                entries.append((os.path.getmtime(os.path.join(directory, filename)), filename))
+        entries.sort()
+        for _, filename in entries[:max(0, len(entries) - MAX_CACHED_FRAGMENTS)]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(directory, filename))
+
+    def store(self, node: Node, key: str, reads: list[str]) -> None:
+        # Extension constructors (Blockstore etc.) are bound to each node
+        # on creation and are not part of its content
+        fragment = {
+            attribute: value for attribute, value in vars(node.instance).items()
+            if attribute not in PROVISIONED_NODE_ATTRIBUTES and not callable(value)
+        }
+        self.writeAtomically(self.fragmentPath(key), pickle.dumps(self.redact(fragment)))
+        self.writeAtomically(
+            self.indexPath(node.id),
+            json.dumps({"key": key, "reads": reads}, indent=4).encode("utf-8")
+        )
+        self.evict()
+
+    def diff(self, node: Node, previous_key: str) -> list[str]:
+        # Both sides are compared redacted, so secrets are never printed
+        previous = self.load(previous_key, redacted=True)
+        if previous == None:
+            return []
+        current = self.redact({"services": node.instance.services})
+        return list(difflib.unified_diff(
+            describeServices(previous.get("services", [])),
+            describeServices(current["services"]),
+            fromfile=f"{node.id} (cached)",
+            tofile=node.id,
+            n=0,
+            lineterm=""
+        ))
@@ -0,0 +1,71 @@
+import geni.portal as portal
+import geni.rspec.pg as pg
+import threading
+from typing import Any
+from provisioner.docker import DOCKER_PARAMETERS
+from provisioner.structure.cluster import CLUSTER_PARAMETERS
+from provisioner.structure.expansion import EXPANSION_PARAMETERS
+from provisioner.application.app import APPLICATION_PARAMETERS
+from provisioner.parameters import ParameterGroup, bindParameterValues, takeParameterErrors
+from provisioner.provisioner import Provisioner
+from provisioner.collector.collector import COLLECTOR_PARAMETERS
+from provisioner.application.parameters.cassandra import CASSANDRA_PARAMETERS, CASSANDRA_TUNING_PARAMETERS
+from provisioner.application.parameters.elasticsearch import ELASTICSEARCH_PARAMETERS
+from provisioner.application.parameters.hbase import HBASE_PARAMETERS, HBASE_PLACEMENT_PARAMETERS, HDFS_TUNING_PARAMETERS
+from provisioner.application.parameters.mongodb import MONGODB_PARAMETERS
+from provisioner.application.parameters.scylla import SCYLLA_PARAMETERS
+
+APPLICATION_SPECIFIC_PARAMETERS: list[ParameterGroup] = [
+    CASSANDRA_PARAMETERS,
+    CASSANDRA_TUNING_PARAMETERS,
+    ELASTICSEARCH_PARAMETERS,
+    HBASE_PARAMETERS,
+    HDFS_TUNING_PARAMETERS,
+    HBASE_PLACEMENT_PARAMETERS,
+    MONGODB_PARAMETERS,
+    SCYLLA_PARAMETERS,
+]
+PARAMETER_GROUPS: list[ParameterGroup] = [
+    CLUSTER_PARAMETERS,
+    EXPANSION_PARAMETERS,
+    APPLICATION_PARAMETERS
+] + APPLICATION_SPECIFIC_PARAMETERS + [
+    COLLECTOR_PARAMETERS,
+    DOCKER_PARAMETERS
+]
+# Validation errors are reported to the process wide portal context,
+# so concurrent bindings must not interleave
+PARAMETER_BINDING_LOCK: threading.Lock = threading.Lock()
+
+def validateParameters(params: portal.Namespace) -> None:
+    for parameterGroup in PARAMETER_GROUPS:
+        parameterGroup.validate(params)
+
+def canonicaliseParameterValues(values: dict[str, Any]) -> dict[str, Any]:
+    # Coerces the values and fills in defaults so that equivalent
+    # parameter sets compare equal
+    with PARAMETER_BINDING_LOCK:
+        params: portal.Namespace = bindParameterValues(PARAMETER_GROUPS, values)
+        errors = takeParameterErrors()
+    if len(errors) > 0:
+        raise ValueError("; ".join([str(error) for error in errors]))
+    return dict(sorted(vars(params).items()))
+
+def bindAndValidateParameterValues(values: dict[str, Any]) -> portal.Namespace:
+    # In-process equivalent of bindAndValidateParameters(), raises
+    # instead of exiting so the caller can continue with other values
+    with PARAMETER_BINDING_LOCK:
+        params: portal.Namespace = bindParameterValues(PARAMETER_GROUPS, values)
+        errors = takeParameterErrors()
+        if len(errors) == 0:
+            validateParameters(params)
+            errors = takeParameterErrors()
+    if len(errors) > 0:
+        raise ValueError("; ".join([str(error) for error in errors]))
+    return params
+
+def generateProfile(params: portal.Namespace) -> str:
+    request: pg.Request = pg.Request()
+    provisioner: Provisioner = Provisioner(request, params)
+    provisioner.provision()
+    return request.toXMLString(pretty_print=True, ucode=True)
@@ -0,0 +1,137 @@
+import math
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+
+class DiskType(Enum):
+    HDD = "hdd"
+    SSD = "ssd"
+    NVME = "nvme"
+
+    def __str__(self) -> str:
+        return "%s" % self.value
+
+MIN_RESERVED_MEMORY_GIB = 2
+RESERVED_MEMORY_FRACTION = 0.1
+
+@dataclass(frozen=True)
+class HardwareSpec:
+    name: str
+    # Physical cores across all sockets
+    cores: int
+    # Hardware threads, twice the cores with hyperthreading enabled
+    threads: int
+    memory_gib: int
+    disk_type: DiskType
+    disk_gib: int
+
+    def threadsPerCore(self) -> int:
+        return max(1, self.threads // self.cores)
+
+    def cpuList(self, reserved_cores: int = 0) -> list[int]:
+        # Linux numbers the first thread of every core before the
+        # hyperthread siblings, so core i owns cpus i, i + cores, ...
+        return sorted([
+            core + (sibling * self.cores)
+            for sibling in range(self.threadsPerCore())
+            for core in range(reserved_cores, self.cores)
+        ])
+
+    def usableMemoryGiB(self, reserved_memory_gib: int = 0) -> int:
+        # Memory left once the OS and OTEL agents have theirs, by default
+        # the larger of 2GiB and 10% of the node
+        reserved = reserved_memory_gib
+        if reserved == 0:
+            reserved = max(
+                MIN_RESERVED_MEMORY_GIB,
+                math.ceil(self.memory_gib * RESERVED_MEMORY_FRACTION)
+            )
+        return self.memory_gib - reserved
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    cpus: list[int]
+    memory_mib: int
+
+# CloudLab node types, see https://docs.cloudlab.us/hardware.html
+HARDWARE_CATALOG: dict[str, HardwareSpec] = {
+    "m400": HardwareSpec("m400", 8, 8, 64, DiskType.SSD, 120),
+    "m510": HardwareSpec("m510", 8, 16, 64, DiskType.NVME, 256),
+    "xl170": HardwareSpec("xl170", 10, 20, 64, DiskType.SSD, 480),
+    "c220g1": HardwareSpec("c220g1", 16, 32, 128, DiskType.SSD, 480),
+    "c220g2": HardwareSpec("c220g2", 20, 40, 160, DiskType.SSD, 480),
+    "c220g5": HardwareSpec("c220g5", 20, 40, 192, DiskType.SSD, 480),
+    "c240g5": HardwareSpec("c240g5", 20, 40, 192, DiskType.SSD, 480),
+    "c6320": HardwareSpec("c6320", 28, 56, 128, DiskType.HDD, 1000),
+    "c8220": HardwareSpec("c8220", 20, 40, 256, DiskType.HDD, 1000),
+    "c6525-25g": HardwareSpec("c6525-25g", 16, 32, 128, DiskType.SSD, 480),
+    "c6525-100g": HardwareSpec("c6525-100g", 24, 48, 128, DiskType.NVME, 1600),
+    "d430": HardwareSpec("d430", 16, 32, 64, DiskType.SSD, 200),
+    "d710": HardwareSpec("d710", 4, 8, 12, DiskType.HDD, 250),
+}
+
+def lookupHardware(hardware_type: Optional[str]) -> Optional[HardwareSpec]:
+    # Autoselected or unknown node types have no known resources
+    if hardware_type == None:
+        return None
+    return HARDWARE_CATALOG.get(hardware_type)
+
+def formatCpuList(cpus: list[int]) -> str:
+    # Compacts to the range syntax of cpusets, e.g. [1,2,3,9] -> "1-3,9"
+    ranges: list[str] = []
+    start: Optional[int] = None
+    previous: Optional[int] = None
+    for cpu in sorted(cpus):
+        if previous != None and cpu == previous + 1:
+            previous = cpu
+            continue
+        if start != None:
+            ranges.append(f"{start}" if start == previous else f"{start}-{previous}")
+        start = cpu
+        previous = cpu
+    if start != None:
+        ranges.append(f"{start}" if start == previous else f"{start}-{previous}")
+    return ",".join(ranges)
+
+def partitionResources(hardware: HardwareSpec,
+                       weights: dict[str, float],
+                       reserved_cores: int = 0,
+                       reserved_memory_gib: int = 0) -> dict[str, ResourceLimits]:
+    # Splits the unreserved cores and memory between the keys in
+    # proportion to their weights. Cores are handed out whole, with their
+    # hyperthread siblings, so no two keys ever share a physical core.
+    # With fewer cores than keys, every key shares all of them instead.
+    if len(weights) == 0:
+        return {}
+    total_weight = sum(weights.values())
+    available_cores = hardware.cores - reserved_cores
+    memory_mib = hardware.usableMemoryGiB(reserved_memory_gib) * 1024
+    if available_cores < len(weights):
+        cpus = hardware.cpuList(reserved_cores)
+        return {
+            key: ResourceLimits(cpus, math.floor(memory_mib * weight / total_weight))
+            for key, weight in weights.items()
+        }
+    exact = {key: available_cores * weight / total_weight for key, weight in weights.items()}
+    allocation = {key: max(1, math.floor(share)) for key, share in exact.items()}
+    # Largest remainders gain the leftover cores, the largest holders
+    # give back any overshoot from the one core minimum
+    while sum(allocation.values()) < available_cores:
+        key = max(allocation, key=lambda k: exact[k] - allocation[k])
+        allocation[key] += 1
+    while sum(allocation.values()) > available_cores:
+        key = max([k for k in allocation if allocation[k] > 1], key=lambda k: allocation[k] - exact[k])
+        allocation[key] -= 1
+    limits: dict[str, ResourceLimits] = {}
+    next_core = reserved_cores
+    for key, core_count in allocation.items():
+        limits[key] = ResourceLimits(
+            sorted([
+                core + (sibling * hardware.cores)
+                for sibling in range(hardware.threadsPerCore())
+                for core in range(next_core, next_core + core_count)
+            ]),
+            math.floor(memory_mib * weights[key] / total_weight)
+        )
+        next_core += core_count
+    return limits
@@ -1,43 +1,56 @@
 import ipaddress
-from typing import Iterator
-import geni.portal as portal
+from typing import Iterable, Iterator, Optional
 
 class NetworkManager:
 
     NODE_INTERFACE_NAME_FORMAT = "if%d"
     NODE_PHYSICAL_INTERFACE_FORMAT = "eth%d"
-    VIRTUAL_INTERFACE_INDEX = 0
-    PHYSICAL_INTERFACE_INDEX = 0
-
-    ADDRESS_NETWORK = ipaddress.IPv4Network("10.0.0.0/24", False)
-    ADDRESS_NETWORK_ITER: Iterator[ipaddress.IPv4Address] = ADDRESS_NETWORK.__iter__()
-
-    CURRENT_ADDRESS: ipaddress.IPv4Address
-    CURRENT_VIRTUAL_INTERFACE: str = ""
-    CURRENT_PHYSICAL_INTERFACE: str = ""
-
-    @classmethod
-    def nextVirtualInterface(cls) -> str:
-        cls.CURRENT_VIRTUAL_INTERFACE = cls.NODE_INTERFACE_NAME_FORMAT % cls.VIRTUAL_INTERFACE_INDEX
-        cls.VIRTUAL_INTERFACE_INDEX += 1
-        return cls.CURRENT_VIRTUAL_INTERFACE
-
-    @classmethod
-    def nextPhysicalInterface(cls) -> str:
-        cls.CURRENT_PHYSICAL_INTERFACE = cls.NODE_PHYSICAL_INTERFACE_FORMAT % cls.PHYSICAL_INTERFACE_INDEX
-        cls.PHYSICAL_INTERFACE_INDEX += 1
-        return cls.CURRENT_PHYSICAL_INTERFACE 
-
-    @classmethod
-    def nextAddress(cls) -> ipaddress.IPv4Address:
+    DEFAULT_ADDRESS_NETWORK = ipaddress.IPv4Network("10.0.0.0/24", False)
+
+    # Allocation state is per instance so that each provisioning
+    # request gets its own address space and interface indexes
+    virtual_interface_index: int
+    physical_interface_index: int
+    address_network: ipaddress.IPv4Network
+    address_network_iter: Iterator[ipaddress.IPv4Address]
+    current_address: Optional[ipaddress.IPv4Address]
+    reserved_addresses: set[ipaddress.IPv4Address]
+    current_virtual_interface: str
+    current_physical_interface: str
+
+    def __init__(self, address_network: ipaddress.IPv4Network = DEFAULT_ADDRESS_NETWORK):
+        self.virtual_interface_index = 0
+        self.physical_interface_index = 0
+        self.address_network = address_network
+        self.address_network_iter = address_network.__iter__()
+        self.current_address = None
+        self.reserved_addresses = set()
+        self.current_virtual_interface = ""
+        self.current_physical_interface = ""
+
+    def nextVirtualInterface(self) -> str:
+        self.current_virtual_interface = self.NODE_INTERFACE_NAME_FORMAT % self.virtual_interface_index
+        self.virtual_interface_index += 1
+        return self.current_virtual_interface
+
+    def nextPhysicalInterface(self) -> str:
+        self.current_physical_interface = self.NODE_PHYSICAL_INTERFACE_FORMAT % self.physical_interface_index
+        self.physical_interface_index += 1
+        return self.current_physical_interface
+
+    def reserveAddresses(self, addresses: Iterable[str]) -> None:
+        # Addresses held by a running cluster are never handed out again
+        self.reserved_addresses.update([ipaddress.IPv4Address(address) for address in addresses])
+
+    def nextAddress(self) -> ipaddress.IPv4Address:
+        # Raises rather than exiting, as generation may be running within
+        # a long lived process (the profile service, a sweep worker)
         try:
-            cls.CURRENT_ADDRESS = cls.ADDRESS_NETWORK_ITER.__next__()
-            return cls.CURRENT_ADDRESS
+            self.current_address = self.address_network_iter.__next__()
+            while self.current_address in self.reserved_addresses:
+                self.current_address = self.address_network_iter.__next__()
+            return self.current_address
         except StopIteration:
-            portal.context.reportError(portal.PortalError(
-                "Address allocation exceeded subnet prefix: {}".format(
-                    cls.ADDRESS_NETWORK.exploded
-                )
+            raise ValueError("Address allocation exceeded subnet prefix: {}".format(
+                self.address_network.exploded
             ))
-        exit(1)
-
@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
+from enum import Enum
 from typing import Any, Optional, Tuple
 import geni.portal as portal
+from provisioner.structure.placement import PlacementError
 
 @dataclass
 class Parameter:
@@ -55,3 +57,73 @@ class ParameterGroup(ABC):
                     [parameter.name]
                 ))
 
+    def validateNotNegative(self, params: portal.Namespace, names: list[str]) -> None:
+        for name in names:
+            if params.__dict__[name] < 0:
+                portal.context.reportError(portal.ParameterError(
+                    f"Parameter '{name}' must be positive",
+                    [name]
+                ))
+
+    def validatePlacement(self, params: portal.Namespace, variant: Enum, error_params: list[str]) -> None:
+        # Placement only depends on the parameters, so a dry run of the
+        # variant's topology assigner reports an infeasible placement
+        # before provisioning
+        data_nodes = params.dc_count * params.racks_per_dc * params.nodes_per_rack
+        if params.application != str(variant) or data_nodes < 1:
+            return
+        # Imported here, so defining the parameters does not load the
+        # variant
+        from provisioner.provisioner import APPLICATION_TOPOLOGY_ASSIGNERS
+        try:
+            APPLICATION_TOPOLOGY_ASSIGNERS[variant].constructTopology(params)
+        except PlacementError as e:
+            portal.context.reportError(portal.ParameterError(
+                str(e),
+                error_params
+            ))
+
+def bindParameterValues(groups: list[ParameterGroup], values: dict[str, Any]) -> portal.Namespace:
+    # Equivalent of portal.context.bindParameters() for values supplied
+    # in-process, unset parameters take their defaults and unset optional
+    # values stay as None rather than being coerced to "None"
+    params: portal.Namespace = portal.Namespace()
+    known: set[str] = set([])
+    for group in groups:
+        for parameter in group.parameters:
+            known.add(parameter.name)
+            value = values.get(parameter.name, parameter.defaultValue)
+            if value != None:
+                try:
+                    if parameter.typ == portal.ParameterType.BOOLEAN and isinstance(value, str):
+                        value = value.lower() == "true"
+                    else:
+                        value = portal.ParameterType.argparsemap[parameter.typ](value)
+                except (TypeError, ValueError):
+                    portal.context.reportError(portal.ParameterError(
+                        f"Could not coerce '{value}' to '{parameter.typ}'",
+                        [parameter.name]
+                    ))
+                    continue
+            legal = [legal[0] if isinstance(legal, tuple) else legal for legal in parameter.legalValues]
+            if len(legal) > 0 and value not in legal:
+                portal.context.reportError(portal.ParameterError(
+                    f"Illegal value '{value}' for parameter '{parameter.name}'",
+                    [parameter.name]
+                ))
+                continue
+            setattr(params, parameter.name, value)
+    for name in values.keys():
+        if name not in known:
+            portal.context.reportError(portal.ParameterError(
+                f"Unknown parameter '{name}'",
+                [name]
+            ))
+    return params
+
+def takeParameterErrors() -> list[portal.PortalError]:
+    # Drains errors reported so far, allowing the portal context to be
+    # reused for further bindings within the same process
+    errors: list[portal.PortalError] = list(portal.context._parameterErrors)
+    portal.context._parameterErrors.clear()
+    return errors
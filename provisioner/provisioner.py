@@ -2,64 +2,94 @@ from typing import Tuple
 import geni.portal as portal
 import geni.rspec.pg as pg
 import ipaddress
-from provisioner.application.variant.hbase import HBaseApplication
 from provisioner.net.network import NetworkManager
 from provisioner.application.app import *
 from provisioner.structure.node import Node
 from provisioner.structure.cluster import Cluster
 from provisioner.structure.rack import Rack
 from provisioner.structure.datacentre import DataCentre
-from provisioner.application.variant.cassandra import CassandraApplication
-from provisioner.application.variant.mongodb import MongoDBApplication
-from provisioner.application.variant.elasticsearch import ElasticsearchApplication
-from provisioner.application.variant.scylla import ScyllaApplication
+from provisioner.structure.expansion import ClusterSnapshot, expandTopology
 from provisioner.collector.collector import Collector
+from provisioner.crypto.key_pair import loadOrCreateSSHKeyPair
+from provisioner.fragments import GLOBAL_SCOPE, FragmentCache, RecordingNamespace, digestOf
 from provisioner.application.variant.otel_collector import OTELCollector
+from provisioner.registry import LazyRegistry
 from provisioner.structure.topology_assigner import TopologyAssigner, ProvisioningTopology, InverseProvisioningTopology
-from provisioner.structure.variant.cassandra import CassandraTopologyAssigner
-from provisioner.structure.variant.hbase import HBaseTopologyAssigner
 from provisioner.topology import TopologyProperties
 
-APPLICATION_BINDINGS: dict[ApplicationVariant, type[AbstractApplication]] = {
-    CassandraApplication.variant(): CassandraApplication,
-    ElasticsearchApplication.variant(): ElasticsearchApplication,
-    HBaseApplication.variant(): HBaseApplication,
-    MongoDBApplication.variant(): MongoDBApplication,
-    ScyllaApplication.variant(): ScyllaApplication,
-}
+# Variant modules are only imported once the variant is requested, so
+# generating a profile does not pay for every application
+APPLICATION_BINDINGS: LazyRegistry[ApplicationVariant, type[AbstractApplication]] = LazyRegistry("application", {
+    ApplicationVariant.CASSANDRA: "provisioner.application.variant.cassandra:CassandraApplication",
+    ApplicationVariant.ELASTICSEARCH: "provisioner.application.variant.elasticsearch:ElasticsearchApplication",
+    ApplicationVariant.HBASE: "provisioner.application.variant.hbase:HBaseApplication",
+    ApplicationVariant.MONGO_DB: "provisioner.application.variant.mongodb:MongoDBApplication",
+    ApplicationVariant.SCYLLA: "provisioner.application.variant.scylla:ScyllaApplication",
+})
 
-APPLICATION_TOPOLOGY_ASSIGNERS: dict[ApplicationVariant, type[TopologyAssigner]] = {
-    CassandraApplication.variant(): CassandraTopologyAssigner,
-    HBaseApplication.variant(): HBaseTopologyAssigner,
-}
+APPLICATION_TOPOLOGY_ASSIGNERS: LazyRegistry[ApplicationVariant, type[TopologyAssigner]] = LazyRegistry("topology assigner", {
+    ApplicationVariant.CASSANDRA: "provisioner.structure.variant.cassandra:CassandraTopologyAssigner",
+    ApplicationVariant.ELASTICSEARCH: "provisioner.structure.variant.elasticsearch:ElasticsearchTopologyAssigner",
+    ApplicationVariant.HBASE: "provisioner.structure.variant.hbase:HBaseTopologyAssigner",
+    ApplicationVariant.MONGO_DB: "provisioner.structure.variant.mongodb:MongoDBTopologyAssigner",
+    # Scylla shares the Cassandra ring layout
+    ApplicationVariant.SCYLLA: "provisioner.structure.variant.cassandra:CassandraTopologyAssigner",
+})
+
+APPLICATION_SCOPE = "application"
+COLLECTOR_SCOPE = "collector"
 
 class Provisioner:
     request: pg.Request
-    params: portal.Namespace
+    params: RecordingNamespace
     docker_config: DockerConfig
+    network: NetworkManager
+    # Running cluster being expanded, its nodes keep their addresses
+    # and are left out of the request
+    snapshot: Optional[ClusterSnapshot]
+    fragment_cache: Optional[FragmentCache]
+    structure_digest: str
 
-    __node_idx = 0
-
-    def __init__(self, request: pg.Request, params: portal.Namespace):
+    def __init__(self,
+                 request: pg.Request,
+                 params: portal.Namespace,
+                 snapshot: Optional[ClusterSnapshot] = None):
         self.request = request
-        self.params = params
+        self.params = RecordingNamespace(params)
+        self.network = NetworkManager()
+        self.snapshot = snapshot
+        self.fragment_cache = None
+        if params.fragment_cache_path != "":
+            self.fragment_cache = FragmentCache(params.fragment_cache_path)
+        self.structure_digest = ""
+        if snapshot != None:
+            self.network.reserveAddresses(snapshot.addresses.values())
+        self.__node_idx = 0
         self.docker_config: DockerConfig = DockerConfig(
             username=self.params.github_username,
             token=self.params.github_token
         )
 
+    def isExistingNode(self, name: str) -> bool:
+        return self.snapshot != None and name in self.snapshot.addresses
+
     def nodeProvision(self, name: str, roles: list[str]) -> Node:
         self.__node_idx += 1
         node_vm = pg.RawPC(name)
         node_vm.hardware_type = self.params.node_size
         node_vm.disk_image = self.params.node_disk_image
-        self.request.addResource(node_vm)
-        iface: pg.Interface = node_vm.addInterface(NetworkManager.CURRENT_PHYSICAL_INTERFACE)
+        if not self.isExistingNode(name):
+            self.request.addResource(node_vm)
+        iface: pg.Interface = node_vm.addInterface(self.network.current_physical_interface)
         # iface.component_id = Provisioner.NODE_PHYSICAL_INTERFACE_FORMAT % i
-        net_address: ipaddress.IPv4Address = NetworkManager.nextAddress()
+        net_address: ipaddress.IPv4Address
+        if self.isExistingNode(name):
+            net_address = ipaddress.IPv4Address(self.snapshot.addresses[name])
+        else:
+            net_address = self.network.nextAddress()
         address: pg.IPv4Address = pg.IPv4Address(
             str(net_address),
-            str(NetworkManager.ADDRESS_NETWORK.netmask)
+            str(self.network.address_network.netmask)
         )
         iface.addAddress(address)
         return Node(
@@ -86,7 +116,10 @@ class Provisioner:
         print("Partitioning nodes into datacentres and racks")
         datacentres: dict[str, DataCentre] = {}
         assigner = APPLICATION_TOPOLOGY_ASSIGNERS[app_variant]
-        (topology, inverse_topology) = assigner.constructTopology(self.params.dc_count, self.params.racks_per_dc, self.params.nodes_per_rack)
+        if self.snapshot != None:
+            (topology, inverse_topology) = expandTopology(self.snapshot, assigner, self.params)
+        else:
+            (topology, inverse_topology) = assigner.constructTopology(self.params)
         dc_idx: int = 0
         rack_idx: int = 0
         for (dc, racks) in topology.items():
@@ -106,22 +139,22 @@ class Provisioner:
                     cluster: Cluster,
                     topology_properties: TopologyProperties) -> None:
         print("Bootstrapping cluster")
-        app_variant: ApplicationVariant = ApplicationVariant[str(self.params.application).upper()]
+        app_variant: ApplicationVariant = ApplicationVariant.fromName(str(self.params.application))
         app: AbstractApplication = APPLICATION_BINDINGS[app_variant](
             self.params.application_version,
             self.docker_config
         )
-        app.preConfigureClusterLevelProperties(
-            cluster,
-            self.params,
-            topology_properties
-        )
+        with self.params.scope(APPLICATION_SCOPE):
+            app.preConfigureClusterLevelProperties(
+                cluster,
+                self.params,
+                topology_properties
+            )
         # Addresses are assigned in previous loop, we need to know
         # them all before installing as each node should know the
         # addresses of all other nodes
         for node in topology_properties.db_nodes.values():
-            print(f"Installing {self.params.application} on node {node.id}")
-            app.nodeInstallApplication(node)
+            self.installNode(app, node, APPLICATION_SCOPE)
 
     def bootstrapCollector(self,
                            cluster: Cluster,
@@ -132,17 +165,58 @@ class Provisioner:
             self.params.collector_version,
             self.docker_config
         )
-        app.preConfigureClusterLevelProperties(
-            cluster,
-            self.params,
-            topology_properties
+        with self.params.scope(COLLECTOR_SCOPE):
+            app.preConfigureClusterLevelProperties(
+                cluster,
+                self.params,
+                topology_properties
+            )
+        self.installNode(app, collector.node, COLLECTOR_SCOPE)
+
+    def installNode(self, app: AbstractApplication, node: Node, app_scope: str) -> None:
+        # A node's fragment depends on the cluster structure, the
+        # parameters read for the cluster and application, and those
+        # read while installing the node itself, as recorded the last
+        # time it was generated. A reused fragment skips
+        # nodeInstallApplication entirely, so it must not leave state on
+        # the application that the installation of later nodes depends on
+        if self.fragment_cache == None:
+            print(f"Installing {app.variant()} on node {node.id}")
+            with self.params.scope(node.id):
+                app.nodeInstallApplication(node)
+            return
+        inputs = {
+            "structure": self.structure_digest,
+            "application": app.fragmentInputs(),
+            "parameters": self.params.values(self.params.reads(GLOBAL_SCOPE, app_scope))
+        }
+        previous = self.fragment_cache.previousEntry(node.id)
+        if previous != None:
+            key = self.fragment_cache.fragmentKey(
+                node,
+                inputs | {"node_parameters": self.params.values(previous["reads"])}
+            )
+            if self.fragment_cache.restore(node, key):
+                print(f"Reusing cached {app.variant()} fragment for node {node.id}")
+                self.fragment_cache.hits += 1
+                return
+        print(f"Installing {app.variant()} on node {node.id}")
+        self.fragment_cache.misses += 1
+        with self.params.scope(node.id):
+            app.nodeInstallApplication(node)
+        reads = self.params.reads(node.id)
+        key = self.fragment_cache.fragmentKey(
+            node,
+            inputs | {"node_parameters": self.params.values(reads)}
         )
-        print(f"Installing {app.variant()} on node {collector.node.id}")
-        app.nodeInstallApplication(collector.node)
+        self.fragment_cache.store(node, key, reads)
+        if previous != None:
+            for line in self.fragment_cache.diff(node, previous["key"]):
+                print(f"    {line}")
     
     def clusterProvisionHardware(self) -> Cluster:
         print("Provisioning cluster hardware")
-        app_variant: ApplicationVariant = ApplicationVariant[str(self.params.application).upper()]
+        app_variant: ApplicationVariant = ApplicationVariant.fromName(str(self.params.application))
         datacentres, topology, inverse_topology = self.partitionDataCentres(app_variant)
         return Cluster(
             topology,
@@ -160,13 +234,15 @@ class Provisioner:
         print("Constructing VLAN and binding node interfaces")
         lan: pg.LAN = pg.LAN("LAN")
         for node in cluster.nodesGenerator():
+            if self.isExistingNode(node.id):
+                continue
             print(
                 "Binding node address {} to LAN".format(
                     node.interface.addresses[0].address
                 )
             );
             lan.addInterface(node.interface)
-        if collector != None:
+        if collector != None and not self.isExistingNode(collector.node.id):
             lan.addInterface(collector.node.interface)
             print(
                 "Binding allocator interface {} to LAN".format(
@@ -179,7 +255,7 @@ class Provisioner:
 
     def provision(self) -> Tuple[Cluster, Optional[Collector]]:
         # Pre-allocate interface to share across nodes in LAN
-        NetworkManager.nextPhysicalInterface()
+        self.network.nextPhysicalInterface()
         cluster: Cluster = self.clusterProvisionHardware()
         collector: Optional[Collector] = self.collectorProvisionHardware()
         lan: pg.LAN = self.bindNodesViaLAN(cluster, collector)
@@ -189,8 +265,25 @@ class Provisioner:
             db_nodes[node.id] = node
         topology_properties: TopologyProperties = TopologyProperties(
             collector.node if collector != None else None,
-            db_nodes
+            db_nodes,
+            loadOrCreateSSHKeyPair(
+                self.params.cluster_key_path,
+                f"{USERNAME}@cluster"
+            )
         )
+        self.structure_digest = digestOf({
+            "nodes": {
+                node_id: [db_nodes[node_id].getInterfaceAddress(), roles, dc, rack]
+                for node_id, (roles, dc, rack) in cluster.inverse_topology.items()
+            },
+            "collector": collector.node.getInterfaceAddress() if collector != None else None,
+            "cluster_key": topology_properties.cluster_key.public_key
+        })
+        if self.fragment_cache != None:
+            self.fragment_cache.addSecret(self.docker_config.token)
+            self.fragment_cache.addSecret(topology_properties.cluster_key.private_key)
         self.bootstrapDB(cluster, topology_properties)
         self.bootstrapCollector(cluster, collector, topology_properties)
+        if self.fragment_cache != None:
+            print(f"Reused {self.fragment_cache.hits} of {self.fragment_cache.hits + self.fragment_cache.misses} node fragments")
         return cluster, collector
@@ -0,0 +1,41 @@
+import importlib
+from typing import Generic, Hashable, Iterator, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+class LazyRegistry(Generic[K, V]):
+    # Maps keys to "<module>:<attribute>" references, the module is only
+    # imported the first time its key is looked up so that a run only
+    # pays the import cost of the variant it uses
+    name: str
+    references: dict[K, str]
+    loaded: dict[K, V]
+
+    def __init__(self, name: str, references: dict[K, str]):
+        self.name = name
+        self.references = dict(references)
+        self.loaded = {}
+
+    def register(self, key: K, reference: str) -> None:
+        self.references[key] = reference
+        self.loaded.pop(key, None)
+
+    def __getitem__(self, key: K) -> V:
+        if key in self.loaded:
+            return self.loaded[key]
+        if key not in self.references:
+            raise KeyError(f"No {self.name} registered for '{key}'")
+        module_name, attribute = self.references[key].split(":", 1)
+        value: V = getattr(importlib.import_module(module_name), attribute)
+        self.loaded[key] = value
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.references
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.references)
+
+    def keys(self) -> list[K]:
+        return list(self.references.keys())
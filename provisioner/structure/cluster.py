@@ -1,5 +1,6 @@
 import geni.portal as portal
 from dataclasses import dataclass, field
+from enum import Enum
 from typing import Iterator
 from provisioner import topology
 from provisioner.structure.node import Node
@@ -8,6 +9,13 @@ from provisioner.structure.datacentre import DataCentre
 from provisioner.parameters import Parameter, ParameterGroup
 from provisioner.structure.topology_assigner import InverseProvisioningTopology, ProvisioningTopology
 
+class NameCache(Enum):
+    NONE = "none"
+    NSCD = "nscd"
+
+    def __str__(self) -> str:
+        return "%s" % self.value
+
 @dataclass
 class Cluster:
     topology: ProvisioningTopology = field(default_factory=dict)
@@ -72,6 +80,31 @@ class ClusterParameterGroup(ParameterGroup):
                     description="Shared VLAN used between experiments to expose traffic between the experiments",
                     typ=portal.ParameterType.STRING,
                     defaultValue=None
+                ),
+                Parameter(
+                    name="cluster_key_path",
+                    description="Path to cache the cluster SSH private key at, generated if absent",
+                    longDescription="The key is installed for the cluster user on every node so that commands can be fanned out across the cluster from the collector",
+                    typ=portal.ParameterType.STRING,
+                    defaultValue=".cluster_key/id_ed25519",
+                    advanced=True
+                ),
+                Parameter(
+                    name="node_name_cache",
+                    description="Local cache for hostname lookups on every node",
+                    longDescription="The cluster hostnames are always resolved from /etc/hosts, the cache also covers lookups of other hosts, e.g. package mirrors and image registries",
+                    typ=portal.ParameterType.STRING,
+                    defaultValue=str(NameCache.NONE),
+                    legalValues=[(str(cache), str(cache)) for cache in NameCache],
+                    advanced=True
+                ),
+                Parameter(
+                    name="fragment_cache_path",
+                    description="Directory to cache generated node fragments in, nodes whose inputs are unchanged are reused from it (empty disables caching)",
+                    longDescription="Each node's services are keyed on the cluster layout, the parameters read while generating it and the generator source, changed nodes are printed as a diff against their previous generation. The GitHub token and cluster private key are stored as placeholders, the rest of each node's commands are stored as is",
+                    typ=portal.ParameterType.STRING,
+                    defaultValue="",
+                    advanced=True
                 )
             ]
         )
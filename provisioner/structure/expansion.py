@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+import geni.portal as portal
+import geni.rspec.pg as pg
+from provisioner.parameters import Parameter, ParameterGroup
+from provisioner.structure.node import Node
+from provisioner.structure.topology_assigner import InverseProvisioningTopology, ProvisioningTopology, TopologyAssigner, addOrUpdateNode
+
+SNAPSHOT_VERSION = 1
+# Whole file writes made by catToFile, appends are not replayable
+FILE_WRITE_PATTERN: re.Pattern = re.compile(r"\| sudo tee (?!-a )(\S+)$")
+TRAILING_INDEX_PATTERN: re.Pattern = re.compile(r"(\d+)$")
+
+@dataclass
+class ClusterSnapshot:
+    application: str
+    topology: ProvisioningTopology = field(default_factory=dict)
+    # node -> LAN address
+    addresses: dict[str, str] = field(default_factory=dict)
+    collector: Optional[str] = None
+    # node -> path -> digest of the last command writing the file
+    files: dict[str, dict[str, str]] = field(default_factory=dict)
+    # node -> digests of every command run on the node
+    commands: dict[str, list[str]] = field(default_factory=dict)
+
+def commandDigest(command: str) -> str:
+    return hashlib.sha256(command.encode("utf-8")).hexdigest()
+
+def fileWritePath(command: str) -> Optional[str]:
+    match = FILE_WRITE_PATTERN.search(command.split("\n", 1)[0])
+    return None if match == None else match.group(1)
+
+def nodeCommands(node: Node) -> list[str]:
+    return [service.command for service in node.instance.services if isinstance(service, pg.Execute)]
+
+def snapshotCluster(application: str,
+                    topology: ProvisioningTopology,
+                    nodes: list[Node],
+                    collector: Optional[Node]) -> ClusterSnapshot:
+    # Commands are only kept as digests, they carry credentials
+    snapshot = ClusterSnapshot(
+        application=application,
+        topology=topology,
+        collector=collector.id if collector != None else None
+    )
+    for node in nodes + ([collector] if collector != None else []):
+        commands = nodeCommands(node)
+        snapshot.addresses[node.id] = node.getInterfaceAddress()
+        snapshot.commands[node.id] = [commandDigest(command) for command in commands]
+        files: dict[str, str] = {}
+        for command in commands:
+            path = fileWritePath(command)
+            if path != None:
+                files[path] = commandDigest(command)
+        snapshot.files[node.id] = files
+    return snapshot
+
+def writeSnapshot(path: str, snapshot: ClusterSnapshot) -> None:
+    with open(path, "w") as f:
+        json.dump({"version": SNAPSHOT_VERSION} | asdict(snapshot), f, indent=4)
+
+def loadSnapshot(path: str) -> ClusterSnapshot:
+    with open(path, "r") as f:
+        data = json.load(f)
+    version = data.pop("version", None)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported topology snapshot version {version} in {path}, expected {SNAPSHOT_VERSION}")
+    return ClusterSnapshot(**data)
+
+def parseRackTargets(value: str) -> list[tuple[str, str]]:
+    # Comma separated <dc>/<rack> pairs
+    targets: list[tuple[str, str]] = []
+    for target in value.split(","):
+        if target.strip() == "":
+            continue
+        dc, _, rack = target.strip().partition("/")
+        targets.append((dc, rack))
+    return targets
+
+def trailingIndex(name: str) -> int:
+    match = TRAILING_INDEX_PATTERN.search(name)
+    return 0 if match == None else int(match.group(1))
+
+def expandTopology(snapshot: ClusterSnapshot,
+                   assigner: type[TopologyAssigner],
+                   params: portal.Namespace) -> tuple[ProvisioningTopology, InverseProvisioningTopology]:
+    # The running cluster is kept as is, new nodes are dealt round robin
+    # over the target racks (every rack of the cluster by default)
+    roles = assigner.expansionRoles(params)
+    if roles == None:
+        raise ValueError(f"The {snapshot.application} topology cannot be expanded in place")
+    topology: ProvisioningTopology = {}
+    inverse_topology: InverseProvisioningTopology = {}
+    for dc, racks in snapshot.topology.items():
+        for rack, nodes in racks.items():
+            for node, node_roles in nodes.items():
+                addOrUpdateNode(topology, inverse_topology, dc, rack, node, list(node_roles))
+    targets = parseRackTargets(params.expand_racks)
+    if len(targets) == 0:
+        targets = [(dc, rack) for dc, racks in snapshot.topology.items() for rack in racks]
+    next_node_id = max([trailingIndex(node) for node in inverse_topology], default=-1) + 1
+    for i in range(params.expand_node_count):
+        dc, rack = targets[i % len(targets)]
+        addOrUpdateNode(
+            topology,
+            inverse_topology,
+            dc,
+            rack,
+            assigner.nodeName(trailingIndex(dc), trailingIndex(rack), next_node_id),
+            list(roles)
+        )
+        next_node_id += 1
+    return (topology, inverse_topology)
+
+def configDelta(node: Node, snapshot: ClusterSnapshot) -> Optional[str]:
+    # Files written whole are rewritten where their content changed,
+    # along with the later commands editing them. Other commands that
+    # differ from the running node (in-place edits of templates already
+    # filled in) cannot be replayed and are only listed.
+    commands = nodeCommands(node)
+    previous_files = snapshot.files.get(node.id, {})
+    previous_commands = set(snapshot.commands.get(node.id, []))
+    last_write: dict[str, int] = {}
+    for i, command in enumerate(commands):
+        path = fileWritePath(command)
+        if path != None:
+            last_write[path] = i
+    changed = [
+        path for path, i in last_write.items()
+        if previous_files.get(path) != commandDigest(commands[i])
+    ]
+    replayed: list[str] = []
+    unreplayable: list[str] = []
+    for i, command in enumerate(commands):
+        if any([i == last_write[path] or (i > last_write[path] and path in command) for path in changed]):
+            replayed.append(command)
+        elif fileWritePath(command) == None and commandDigest(command) not in previous_commands:
+            unreplayable.append(command.split("\n", 1)[0])
+    if len(replayed) == 0 and len(unreplayable) == 0:
+        return None
+    lines = [
+        "#!/usr/bin/env bash",
+        f"# Configuration delta for {node.id} on joining the new nodes"
+    ] + replayed
+    if len(unreplayable) > 0:
+        lines.append("# Changed commands that only apply to fresh templates, reconcile by hand:")
+        lines.extend([f"#   {command}" for command in unreplayable])
+    return "\n".join(lines) + "\n"
+
+def writeConfigDeltas(output_dir: str, snapshot: ClusterSnapshot, nodes: list[Node]) -> list[str]:
+    os.makedirs(output_dir, exist_ok=True)
+    written: list[str] = []
+    for node in nodes:
+        delta = configDelta(node, snapshot)
+        if delta == None:
+            continue
+        with open(os.path.join(output_dir, f"{node.id}.sh"), "w") as f:
+            f.write(delta)
+        written.append(node.id)
+    return written
+
+class ExpansionParameterGroup(ParameterGroup):
+
+    @classmethod
+    def name(cls) -> str:
+        return "Expansion"
+
+    @classmethod
+    def id(cls) -> str:
+        return "expansion"
+
+    def __init__(self):
+        super().__init__(
+            parameters=[
+                Parameter(
+                    name="expand_topology_path",
+                    description="Topology snapshot (topology.json) of a running cluster to add nodes to, empty provisions a new cluster",
+                    longDescription="The profile then holds only the new nodes, joined to the running cluster over the shared VLAN, and the configuration changes of the existing nodes are written as scripts to expand_delta_path",
+                    typ=portal.ParameterType.STRING,
+                    defaultValue=""
+                ),
+                Parameter(
+                    name="expand_node_count",
+                    description="Number of nodes to add to the running cluster",
+                    typ=portal.ParameterType.INTEGER,
+                    defaultValue=1
+                ),
+                Parameter(
+                    name="expand_racks",
+                    description="Comma separated <dc>/<rack> racks to add the nodes to round robin, empty uses every rack of the cluster",
+                    typ=portal.ParameterType.STRING,
+                    defaultValue=""
+                ),
+                Parameter(
+                    name="expand_delta_path",
+                    description="Directory to write the configuration delta script of each existing node to",
+                    typ=portal.ParameterType.STRING,
+                    defaultValue="expand",
+                    advanced=True
+                )
+            ]
+        )
+
+    def validate(self, params: portal.Namespace) -> None:
+        super().validate(params)
+        if params.expand_topology_path == "":
+            return
+        if not os.path.isfile(params.expand_topology_path):
+            portal.context.reportError(portal.ParameterError(
+                f"No topology snapshot at {params.expand_topology_path}",
+                ["expand_topology_path"]
+            ))
+            return
+        try:
+            snapshot = loadSnapshot(params.expand_topology_path)
+        except (ValueError, TypeError) as e:
+            portal.context.reportError(portal.ParameterError(
+                str(e),
+                ["expand_topology_path"]
+            ))
+            return
+        if snapshot.application != params.application:
+            portal.context.reportError(portal.ParameterError(
+                f"Cannot add {params.application} nodes to a {snapshot.application} cluster",
+                ["expand_topology_path", "application"]
+            ))
+        # Imported here, the provisioner depends on this module
+        from provisioner.application.app import ApplicationVariant
+        from provisioner.provisioner import APPLICATION_TOPOLOGY_ASSIGNERS
+        assigner = APPLICATION_TOPOLOGY_ASSIGNERS[ApplicationVariant.fromName(params.application)]
+        if assigner.expansionRoles(params) == None:
+            portal.context.reportError(portal.ParameterError(
+                f"The {params.application} topology cannot be expanded in place",
+                ["expand_topology_path"]
+            ))
+        if params.expand_node_count < 1:
+            portal.context.reportError(portal.ParameterError(
+                "At least one node must be added",
+                ["expand_node_count"]
+            ))
+        if params.vlan_type == None:
+            # Nodes of separate experiments only share a LAN over a
+            # shared VLAN, which the running cluster must also be on
+            portal.context.reportError(portal.ParameterError(
+                "Expansion requires the shared VLAN of the running cluster",
+                ["vlan_type"]
+            ))
+        for dc, rack in parseRackTargets(params.expand_racks):
+            if dc not in snapshot.topology or rack == "":
+                portal.context.reportError(portal.ParameterError(
+                    f"Rack target '{dc}/{rack}' must name a rack in one of the datacentres {', '.join(snapshot.topology.keys())}",
+                    ["expand_racks"]
+                ))
+
+EXPANSION_PARAMETERS: ParameterGroup = ExpansionParameterGroup()
@@ -0,0 +1,155 @@
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Optional
+from provisioner.list_utils import takeSpread
+from provisioner.structure.topology_assigner import InverseProvisioningTopology, ProvisioningTopology, addOrUpdateNode
+
+NODE_CAPACITY = 1.0
+
+class PlacementPolicy(Enum):
+    # Placed on nodes provisioned for control plane roles only
+    DEDICATED = "dedicated"
+    # Placed on the least loaded existing nodes
+    CO_LOCATED = "co-located"
+    # Placed on existing nodes spread evenly across the racks
+    SPREAD = "spread"
+
+    def __str__(self) -> str:
+        return "%s" % self.value
+
+class PlacementError(ValueError):
+    pass
+
+@dataclass
+class RolePlacement:
+    # Roles that are always placed together on the same node(s)
+    roles: list[str]
+    count: int
+    policy: PlacementPolicy
+    # Restricts placement to these datacentres, any if absent
+    dcs: Optional[list[str]] = None
+
+def parseAntiAffinity(rules: str) -> set[frozenset[str]]:
+    # "<role>:<role>,<role>:<role>" pairs of roles that may not share a node
+    anti_affinity: set[frozenset[str]] = set([])
+    for rule in rules.split(","):
+        if rule.strip() == "":
+            continue
+        roles = [role.strip() for role in rule.split(":")]
+        if len(roles) != 2 or "" in roles or roles[0] == roles[1]:
+            raise PlacementError(f"Anti-affinity rule '{rule.strip()}' must be a pair of distinct roles <role>:<role>")
+        anti_affinity.add(frozenset(roles))
+    return anti_affinity
+
+@dataclass
+class PlacementEngine:
+    topology: ProvisioningTopology
+    inverse_topology: InverseProvisioningTopology
+    role_costs: dict[str, float]
+    anti_affinity: set[frozenset[str]] = field(default_factory=set)
+    node_name_format: str = "node-%d"
+    next_node_id: int = 0
+    node_capacity: float = NODE_CAPACITY
+    dedicated_nodes: list[str] = field(default_factory=list)
+
+    def cost(self, roles: list[str]) -> float:
+        return sum([self.role_costs.get(role, 0.0) for role in roles])
+
+    def load(self, node: str) -> float:
+        return self.cost(self.inverse_topology[node][0])
+
+    def fits(self, node: str, roles: list[str]) -> bool:
+        node_roles = self.inverse_topology[node][0]
+        for role in roles:
+            if role in node_roles:
+                return False
+            for node_role in node_roles:
+                if frozenset([role, node_role]) in self.anti_affinity:
+                    return False
+        # Tolerance for accumulated floating point error in the costs
+        return self.load(node) + self.cost(roles) <= self.node_capacity + 1e-9
+
+    def addRoles(self, node: str, roles: list[str]) -> None:
+        (_, dc, rack) = self.inverse_topology[node]
+        addOrUpdateNode(
+            self.topology,
+            self.inverse_topology,
+            dc,
+            rack,
+            node,
+            roles
+        )
+
+    def inDCs(self, node: str, dcs: Optional[list[str]]) -> bool:
+        return dcs == None or self.inverse_topology[node][1] in dcs
+
+    def createDedicatedNode(self, roles: list[str], dcs: Optional[list[str]] = None) -> str:
+        # Dedicated nodes are distributed over the racks in order,
+        # starting with the first rack of the first datacentre
+        racks = [
+            (dc, rack)
+            for (dc, dc_racks) in self.topology.items()
+            for rack in dc_racks.keys()
+            if dcs == None or dc in dcs
+        ]
+        if len(racks) == 0:
+            raise PlacementError(f"No racks in datacentre(s) {','.join(dcs or [])} to place [{','.join(roles)}] in")
+        (dc, rack) = racks[len(self.dedicated_nodes) % len(racks)]
+        node = self.node_name_format % self.next_node_id
+        self.next_node_id += 1
+        addOrUpdateNode(
+            self.topology,
+            self.inverse_topology,
+            dc,
+            rack,
+            node,
+            roles
+        )
+        self.dedicated_nodes.append(node)
+        return node
+
+    def placeDedicated(self, placement: RolePlacement) -> list[str]:
+        placed: list[str] = []
+        for _ in range(placement.count):
+            # Share an existing dedicated node where the rules allow it
+            candidates = [
+                node for node in self.dedicated_nodes
+                if node not in placed
+                and self.inDCs(node, placement.dcs)
+                and self.fits(node, placement.roles)
+            ]
+            if len(candidates) > 0:
+                self.addRoles(candidates[0], placement.roles)
+                placed.append(candidates[0])
+            else:
+                placed.append(self.createDedicatedNode(list(placement.roles), placement.dcs))
+        return placed
+
+    def placeOnExisting(self, placement: RolePlacement) -> list[str]:
+        candidates = [
+            node for node in self.inverse_topology.keys()
+            if node not in self.dedicated_nodes
+            and self.inDCs(node, placement.dcs)
+            and self.fits(node, placement.roles)
+        ]
+        if len(candidates) < placement.count:
+            raise PlacementError(
+                f"Cannot place [{','.join(placement.roles)}] on {placement.count} node(s) with policy {placement.policy}"
+                + (f" in datacentre(s) {','.join(placement.dcs)}" if placement.dcs != None else "") + ", "
+                + f"only {len(candidates)} node(s) satisfy the capacity and anti-affinity rules"
+            )
+        if placement.policy == PlacementPolicy.SPREAD:
+            placed = list(takeSpread(candidates, placement.count))
+        else:
+            # Stable so that equally loaded nodes keep topology order
+            placed = sorted(candidates, key=self.load)[:placement.count]
+        for node in placed:
+            self.addRoles(node, placement.roles)
+        return placed
+
+    def place(self, placement: RolePlacement) -> list[str]:
+        if placement.count < 1:
+            return []
+        if placement.policy == PlacementPolicy.DEDICATED:
+            return self.placeDedicated(placement)
+        return self.placeOnExisting(placement)
@@ -1,4 +1,6 @@
+import geni.portal as portal
 from abc import ABC, abstractmethod
+from typing import Optional
 
 # dcs -> racks -> nodes -> roles
 ProvisioningTopology = dict[str, dict[str, dict[str, list[str]]]]
@@ -35,5 +37,15 @@ class TopologyAssigner(ABC):
     
     @classmethod
     @abstractmethod
-    def constructTopology(cls, dcs: int, racks_per_dc: int, nodes_per_rack: int) -> tuple[ProvisioningTopology, InverseProvisioningTopology]:
+    def constructTopology(cls, params: portal.Namespace) -> tuple[ProvisioningTopology, InverseProvisioningTopology]:
         pass
+
+    @classmethod
+    def expansionRoles(cls, params: portal.Namespace) -> Optional[list[str]]:
+        # Roles of the nodes added to a running cluster, None where the
+        # topology cannot grow without reshaping the existing nodes
+        return None
+
+    @classmethod
+    def nodeName(cls, dc_id: int, rack_id: int, node_id: int) -> str:
+        return f"node-{node_id}"
@@ -1,4 +1,6 @@
+import geni.portal as portal
 from enum import Enum
+from typing import Optional
 
 from provisioner.structure.topology_assigner import InverseProvisioningTopology, ProvisioningTopology, TopologyAssigner
 
@@ -11,19 +13,27 @@ class CassandraNodeRole(Enum):
 class CassandraTopologyAssigner(TopologyAssigner):
 
     @classmethod
-    def constructTopology(cls, dcs: int, racks_per_dc: int, nodes_per_rack: int) -> tuple[ProvisioningTopology, InverseProvisioningTopology]:
+    def constructTopology(cls, params: portal.Namespace) -> tuple[ProvisioningTopology, InverseProvisioningTopology]:
         topology: ProvisioningTopology = {}
         inverse_topology: InverseProvisioningTopology = {}
         node_id = 0
-        for dc_id in range(dcs):
+        for dc_id in range(params.dc_count):
             dc_name = f"dc-{dc_id}"
             dc = topology.setdefault(dc_name, {})
-            for rack_id in range(racks_per_dc):
+            for rack_id in range(params.racks_per_dc):
                 rack_name = f"rack-{rack_id}"
                 rack = dc.setdefault(rack_name, {})
-                for _ in range(nodes_per_rack):
-                    node_name = f"D{dc_id}R{rack_id}N{node_id}"
+                for _ in range(params.nodes_per_rack):
+                    node_name = cls.nodeName(dc_id, rack_id, node_id)
                     roles = rack.setdefault(node_name, [str(CassandraNodeRole.Data)])
                     inverse_topology[node_name] = (roles, dc_name, rack_name)
                     node_id += 1
         return (topology, inverse_topology)
+
+    @classmethod
+    def expansionRoles(cls, params: portal.Namespace) -> Optional[list[str]]:
+        return [str(CassandraNodeRole.Data)]
+
+    @classmethod
+    def nodeName(cls, dc_id: int, rack_id: int, node_id: int) -> str:
+        return f"D{dc_id}R{rack_id}N{node_id}"
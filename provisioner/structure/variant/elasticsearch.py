@@ -0,0 +1,85 @@
+import geni.portal as portal
+from enum import Enum
+from typing import Optional
+from provisioner.structure.placement import PlacementEngine, PlacementPolicy, RolePlacement
+from provisioner.structure.topology_assigner import InverseProvisioningTopology, ProvisioningTopology, TopologyAssigner, addOrUpdateNode
+
+class ElasticsearchNodeRole(Enum):
+    # Value and the Elasticsearch node role it grants, coordinating only
+    # nodes are those with no roles at all
+    MASTER = "elasticsearch_master", "master"
+    DATA = "elasticsearch_data", "data"
+    COORDINATING = "elasticsearch_coordinating", None
+
+    def __str__(self) -> str:
+        return "%s" % self.value[0]
+
+    def nodeRole(self) -> Optional[str]:
+        return self.value[1]
+
+# Fraction of a node's capacity each role is expected to consume
+ELASTICSEARCH_ROLE_COSTS: dict[str, float] = {
+    str(ElasticsearchNodeRole.DATA): 0.7,
+    str(ElasticsearchNodeRole.MASTER): 0.2,
+    str(ElasticsearchNodeRole.COORDINATING): 0.5,
+}
+
+class ElasticsearchTopologyAssigner(TopologyAssigner):
+
+    @classmethod
+    def masterCount(cls, params: portal.Namespace) -> int:
+        # An odd number of master-eligible nodes, so elections can
+        # always form a majority
+        if params.elasticsearch_master_count > 0:
+            return params.elasticsearch_master_count
+        data_nodes = params.dc_count * params.racks_per_dc * params.nodes_per_rack
+        return 3 if data_nodes >= 3 else 1
+
+    @classmethod
+    def constructTopology(cls, params: portal.Namespace) -> tuple[ProvisioningTopology, InverseProvisioningTopology]:
+        topology: ProvisioningTopology = {}
+        inverse_topology: InverseProvisioningTopology = {}
+        node_id = 0
+        for dc_id in range(params.dc_count):
+            dc_name = f"dc-{dc_id}"
+            for rack_id in range(params.racks_per_dc):
+                rack_name = f"rack-{rack_id}"
+                for _ in range(params.nodes_per_rack):
+                    addOrUpdateNode(
+                        topology,
+                        inverse_topology,
+                        dc_name,
+                        rack_name,
+                        f"node-{node_id}",
+                        [str(ElasticsearchNodeRole.DATA)]
+                    )
+                    node_id += 1
+        engine = PlacementEngine(
+            topology=topology,
+            inverse_topology=inverse_topology,
+            role_costs=ELASTICSEARCH_ROLE_COSTS,
+            # A coordinating only node stops being one with any other role
+            anti_affinity=set([
+                frozenset([str(ElasticsearchNodeRole.COORDINATING), str(role)])
+                for role in [ElasticsearchNodeRole.MASTER, ElasticsearchNodeRole.DATA]
+            ]),
+            node_name_format="node-%d",
+            next_node_id=node_id
+        )
+        engine.place(RolePlacement(
+            roles=[str(ElasticsearchNodeRole.MASTER)],
+            count=cls.masterCount(params),
+            policy=PlacementPolicy(params.elasticsearch_master_placement)
+        ))
+        # Coordinating only nodes hold no data by definition, so are
+        # always on nodes of their own
+        engine.place(RolePlacement(
+            roles=[str(ElasticsearchNodeRole.COORDINATING)],
+            count=params.elasticsearch_coordinating_count,
+            policy=PlacementPolicy.DEDICATED
+        ))
+        return (topology, inverse_topology)
+
+    @classmethod
+    def expansionRoles(cls, params: portal.Namespace) -> Optional[list[str]]:
+        return [str(ElasticsearchNodeRole.DATA)]
@@ -1,103 +1,74 @@
-from enum import Enum
+import geni.portal as portal
+from typing import Optional
+from provisioner.structure.placement import PlacementEngine, PlacementPolicy, RolePlacement, parseAntiAffinity
 from provisioner.structure.topology_assigner import InverseProvisioningTopology, TopologyAssigner, ProvisioningTopology, addOrUpdateNode
-from provisioner.list_utils import takeSpread
+from provisioner.structure.variant.hbase_roles import HBaseAppType, HBaseNodeRole, ZookeeperDCStrategy
 
-class HBaseAppType(Enum):
-    HDFS = "hdfs"
-    HBase = "hbase"
+# Fraction of a node's capacity each role is expected to consume
+HBASE_ROLE_COSTS: dict[str, float] = {
+    str(HBaseNodeRole.HBASE_REGION_SERVER): 0.35,
+    str(HBaseNodeRole.HBASE_ZOOKEEPER): 0.1,
+    str(HBaseNodeRole.HBASE_MASTER): 0.15,
+    str(HBaseNodeRole.HBASE_BACKUP_MASTER): 0.1,
+    str(HBaseNodeRole.HDFS_NAME): 0.2,
+    str(HBaseNodeRole.HDFS_DATA): 0.15,
+    str(HBaseNodeRole.HDFS_RESOURCE_MANAGER): 0.05,
+    str(HBaseNodeRole.HDFS_NODE_MANAGER): 0.05,
+    str(HBaseNodeRole.HDFS_WEB_PROXY): 0.05,
+    str(HBaseNodeRole.HDFS_MAPRED_HISTORY): 0.05,
+}
 
-class HBaseNodeRole(Enum):
-    HBASE_REGION_SERVER = "hbase_region_server", HBaseAppType.HBase
-    HBASE_ZOOKEEPER = "hbase_zookeeper", HBaseAppType.HBase
-    HBASE_MASTER = "hbase_master", HBaseAppType.HBase
-    HBASE_BACKUP_MASTER = "hbase_backup_master", HBaseAppType.HBase
-    HDFS_NAME = "hdfs_name", HBaseAppType.HDFS
-    HDFS_DATA = "hdfs_data", HBaseAppType.HDFS
-    HDFS_RESOURCE_MANAGER = "hdfs_resource_manager", HBaseAppType.HDFS
-    HDFS_NODE_MANAGER = "hdfs_node_manager", HBaseAppType.HDFS,
-    HDFS_WEB_PROXY = "hdfs_web_proxy", HBaseAppType.HDFS,
-    HDFS_MAPRED_HISTORY = "hdfs_mapred_history", HBaseAppType.HDFS
+HBASE_DATA_ROLES: list[str] = [
+    str(HBaseNodeRole.HBASE_REGION_SERVER),
+    str(HBaseNodeRole.HDFS_DATA),
+    str(HBaseNodeRole.HDFS_NODE_MANAGER)
+]
 
-    def __str__(self) -> str:
-        return "%s" % self.value[0]
-
-    def appType(self) -> HBaseAppType:
-        return self.value[1]
+HBASE_HDFS_AUXILIARY_ROLES: list[str] = [
+    str(HBaseNodeRole.HDFS_NAME),
+    str(HBaseNodeRole.HDFS_RESOURCE_MANAGER),
+    # str(HBaseNodeRole.HDFS_WEB_PROXY),
+    str(HBaseNodeRole.HDFS_MAPRED_HISTORY)
+]
 
 class HBaseTopologyAssigner(TopologyAssigner):
 
     @classmethod
-    def createHBaseMasterNode(cls,
-                              node_id: int,
-                              topology: ProvisioningTopology,
-                              inverse_topology: InverseProvisioningTopology) -> None:
-        dc = list(topology.items())[0]
-        rack = list(dc[1].keys())[0]
-        addOrUpdateNode(
-            topology,
-            inverse_topology,
-            dc[0],
-            rack,
-            f"node-{node_id}",
-            [str(HBaseNodeRole.HBASE_MASTER)]
-        )
-
-    @classmethod
-    def determineHBaseZookeeperNodes(cls,
-                                     num_nodes: int,
-                                     topology: ProvisioningTopology,
-                                     inverse_topology: InverseProvisioningTopology) -> None:
-        
-        zk_count = 1
+    def zookeeperCount(cls, num_nodes: int) -> int:
         if (num_nodes <= 3):
-            zk_count = 1
+            return 1
         elif (num_nodes < 15):
-            zk_count = 3
+            return 3
         elif (num_nodes < 21):
-            zk_count = 5
-        else:
-            zk_count = 7
-        for (node, (_, dc, rack)) in takeSpread(list(inverse_topology.items()), zk_count):
-            addOrUpdateNode(
-                topology,
-                inverse_topology,
-                dc,
-                rack,
-                node,
-                [str(HBaseNodeRole.HBASE_ZOOKEEPER)]
-            )
+            return 5
+        return 7
 
     @classmethod
-    def createHDFSAuxiliaryNode(cls,
-                                node_id: int,
-                                topology: ProvisioningTopology,
-                                inverse_topology: InverseProvisioningTopology) -> None:
-        dc = list(topology.items())[0]
-        rack = list(dc[1].keys())[0]
-        addOrUpdateNode(
-            topology,
-            inverse_topology,
-            dc[0],
-            rack,
-            f"node-{node_id}",
-            [
-                str(HBaseNodeRole.HDFS_NAME),
-                str(HBaseNodeRole.HDFS_RESOURCE_MANAGER),
-                # str(HBaseNodeRole.HDFS_WEB_PROXY),
-                str(HBaseNodeRole.HDFS_MAPRED_HISTORY)
-            ]
-        )
+    def placeZookeeperQuorum(cls,
+                             engine: PlacementEngine,
+                             count: int,
+                             policy: PlacementPolicy,
+                             strategy: ZookeeperDCStrategy,
+                             primary_dc: str) -> None:
+        roles = [str(HBaseNodeRole.HBASE_ZOOKEEPER)]
+        other_dcs = [dc for dc in engine.topology.keys() if dc != primary_dc]
+        if strategy == ZookeeperDCStrategy.SPREAD or len(other_dcs) == 0:
+            engine.place(RolePlacement(roles=roles, count=count, policy=policy))
+            return
+        primary_count = count if strategy == ZookeeperDCStrategy.PRIMARY else count // 2 + 1
+        engine.place(RolePlacement(roles=roles, count=primary_count, policy=policy, dcs=[primary_dc]))
+        engine.place(RolePlacement(roles=roles, count=count - primary_count, policy=policy, dcs=other_dcs))
 
     @classmethod
-    def constructTopology(cls, dcs: int, racks_per_dc: int, nodes_per_rack: int) -> tuple[ProvisioningTopology, InverseProvisioningTopology]:
+    def constructTopology(cls, params: portal.Namespace) -> tuple[ProvisioningTopology, InverseProvisioningTopology]:
         topology: ProvisioningTopology = {}
         inverse_topology: InverseProvisioningTopology = {}
         node_id = 0
-        for dc_id in range(dcs):
+        for dc_id in range(params.dc_count):
             dc_name = f"dc-{dc_id}"
-            for rack_id in range(racks_per_dc):
+            for rack_id in range(params.racks_per_dc):
                 rack_name = f"rack-{rack_id}"
-                for _ in range(nodes_per_rack):
+                for _ in range(params.nodes_per_rack):
                     node_name = f"node-{node_id}"
                     addOrUpdateNode(
                         topology,
@@ -105,18 +76,43 @@ class HBaseTopologyAssigner(TopologyAssigner):
                         dc_name,
                         rack_name,
                         node_name,
-                        [
-                            str(HBaseNodeRole.HBASE_REGION_SERVER),
-                            str(HBaseNodeRole.HDFS_DATA),
-                            str(HBaseNodeRole.HDFS_NODE_MANAGER)
-                        ]
+                        list(HBASE_DATA_ROLES)
                     )
                     node_id += 1
-        cls.determineHBaseZookeeperNodes(
-            node_id,
-            topology,
-            inverse_topology
+        engine = PlacementEngine(
+            topology=topology,
+            inverse_topology=inverse_topology,
+            role_costs=HBASE_ROLE_COSTS,
+            anti_affinity=parseAntiAffinity(params.hbase_anti_affinity),
+            node_name_format="node-%d",
+            next_node_id=node_id
+        )
+        # The master and the auxiliary roles live in the first (primary)
+        # datacentre, which the quorum placement is relative to
+        primary_dc = list(topology.keys())[0]
+        # Order matters, spread and co-located roles are placed among
+        # the data nodes before any dedicated nodes exist
+        cls.placeZookeeperQuorum(
+            engine,
+            cls.zookeeperCount(node_id),
+            PlacementPolicy(params.hbase_zookeeper_placement),
+            ZookeeperDCStrategy(params.hbase_zookeeper_dc_strategy),
+            primary_dc
         )
-        cls.createHBaseMasterNode(node_id, topology, inverse_topology)
-        cls.createHDFSAuxiliaryNode(node_id, topology, inverse_topology)
+        engine.place(RolePlacement(
+            roles=[str(HBaseNodeRole.HBASE_MASTER)],
+            count=1,
+            policy=PlacementPolicy(params.hbase_master_placement),
+            dcs=[primary_dc]
+        ))
+        engine.place(RolePlacement(
+            roles=list(HBASE_HDFS_AUXILIARY_ROLES),
+            count=1,
+            policy=PlacementPolicy(params.hbase_hdfs_auxiliary_placement),
+            dcs=[primary_dc]
+        ))
         return (topology, inverse_topology)
+
+    @classmethod
+    def expansionRoles(cls, params: portal.Namespace) -> Optional[list[str]]:
+        return list(HBASE_DATA_ROLES)
@@ -0,0 +1,39 @@
+from enum import Enum
+
+# Kept apart from the topology assigner so the parameter definitions
+# can use them without importing it
+
+class HBaseAppType(Enum):
+    HDFS = "hdfs"
+    HBase = "hbase"
+
+class HBaseNodeRole(Enum):
+    HBASE_REGION_SERVER = "hbase_region_server", HBaseAppType.HBase
+    HBASE_ZOOKEEPER = "hbase_zookeeper", HBaseAppType.HBase
+    HBASE_MASTER = "hbase_master", HBaseAppType.HBase
+    HBASE_BACKUP_MASTER = "hbase_backup_master", HBaseAppType.HBase
+    HDFS_NAME = "hdfs_name", HBaseAppType.HDFS
+    HDFS_DATA = "hdfs_data", HBaseAppType.HDFS
+    HDFS_RESOURCE_MANAGER = "hdfs_resource_manager", HBaseAppType.HDFS
+    HDFS_NODE_MANAGER = "hdfs_node_manager", HBaseAppType.HDFS,
+    HDFS_WEB_PROXY = "hdfs_web_proxy", HBaseAppType.HDFS,
+    HDFS_MAPRED_HISTORY = "hdfs_mapred_history", HBaseAppType.HDFS
+
+    def __str__(self) -> str:
+        return "%s" % self.value[0]
+
+    def appType(self) -> HBaseAppType:
+        return self.value[1]
+
+class ZookeeperDCStrategy(Enum):
+    # Spread over the nodes of every datacentre
+    SPREAD = "spread"
+    # Entirely within the primary datacentre, commits never wait on
+    # inter-datacentre round trips but the quorum is lost with it
+    PRIMARY = "primary"
+    # A majority in the primary datacentre and the remainder in the
+    # others, commits stay local and a minority datacentre can be lost
+    MAJORITY = "majority"
+
+    def __str__(self) -> str:
+        return "%s" % self.value
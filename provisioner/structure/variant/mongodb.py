@@ -0,0 +1,100 @@
+import geni.portal as portal
+from enum import Enum
+from provisioner.structure.placement import PlacementEngine, PlacementPolicy, RolePlacement
+from provisioner.structure.topology_assigner import InverseProvisioningTopology, ProvisioningTopology, TopologyAssigner, addOrUpdateNode, findNodesWithRole
+
+class MongoDBNodeRole(Enum):
+    SHARD = "mongodb_shard"
+    CONFIG_SERVER = "mongodb_config_server"
+
+    def __str__(self) -> str:
+        return "%s" % self.value
+
+# Fraction of a node's capacity each role is expected to consume
+MONGODB_ROLE_COSTS: dict[str, float] = {
+    str(MongoDBNodeRole.SHARD): 0.7,
+    str(MongoDBNodeRole.CONFIG_SERVER): 0.2,
+}
+
+CONFIG_REPLICA_SET = "config"
+SHARD_REPLICA_SET_FORMAT = "shard-%d"
+
+def rackInterleavedNodes(topology: ProvisioningTopology, role: str) -> list[str]:
+    # Takes a node from each rack in turn, so consecutive nodes are in
+    # different racks (and datacentres) wherever possible
+    racks: list[list[str]] = [
+        [node for (node, roles) in nodes.items() if role in roles]
+        for racks in topology.values()
+        for nodes in racks.values()
+    ]
+    interleaved: list[str] = []
+    for i in range(max([len(rack) for rack in racks], default=0)):
+        interleaved.extend([rack[i] for rack in racks if i < len(rack)])
+    return interleaved
+
+def shardReplicaSets(topology: ProvisioningTopology, shard_count: int) -> dict[str, list[str]]:
+    # Contiguous runs of the rack interleaved nodes, so the members of
+    # each replica set span as many racks as possible and a rack failure
+    # costs every shard at most a minority of its members
+    nodes = rackInterleavedNodes(topology, str(MongoDBNodeRole.SHARD))
+    replica_sets: dict[str, list[str]] = {}
+    start = 0
+    for shard in range(shard_count):
+        size = len(nodes) // shard_count + (1 if shard < len(nodes) % shard_count else 0)
+        replica_sets[SHARD_REPLICA_SET_FORMAT % shard] = nodes[start:start + size]
+        start += size
+    return replica_sets
+
+def configReplicaSet(inverse_topology: InverseProvisioningTopology) -> list[str]:
+    return findNodesWithRole(inverse_topology, str(MongoDBNodeRole.CONFIG_SERVER))
+
+class MongoDBTopologyAssigner(TopologyAssigner):
+
+    @classmethod
+    def shardCount(cls, params: portal.Namespace) -> int:
+        if params.mongodb_shard_count > 0:
+            return params.mongodb_shard_count
+        data_nodes = params.dc_count * params.racks_per_dc * params.nodes_per_rack
+        return max(1, data_nodes // params.mongodb_replica_set_size)
+
+    @classmethod
+    def configServerCount(cls, params: portal.Namespace) -> int:
+        if params.mongodb_config_server_count > 0:
+            return params.mongodb_config_server_count
+        data_nodes = params.dc_count * params.racks_per_dc * params.nodes_per_rack
+        return min(3, data_nodes)
+
+    @classmethod
+    def constructTopology(cls, params: portal.Namespace) -> tuple[ProvisioningTopology, InverseProvisioningTopology]:
+        topology: ProvisioningTopology = {}
+        inverse_topology: InverseProvisioningTopology = {}
+        node_id = 0
+        for dc_id in range(params.dc_count):
+            dc_name = f"dc-{dc_id}"
+            for rack_id in range(params.racks_per_dc):
+                rack_name = f"rack-{rack_id}"
+                for _ in range(params.nodes_per_rack):
+                    addOrUpdateNode(
+                        topology,
+                        inverse_topology,
+                        dc_name,
+                        rack_name,
+                        f"node-{node_id}",
+                        [str(MongoDBNodeRole.SHARD)]
+                    )
+                    node_id += 1
+        engine = PlacementEngine(
+            topology=topology,
+            inverse_topology=inverse_topology,
+            role_costs=MONGODB_ROLE_COSTS,
+            node_name_format="node-%d",
+            next_node_id=node_id
+        )
+        # The mongos routers are not placed here, they run next to the
+        # YCSB clients on the collector
+        engine.place(RolePlacement(
+            roles=[str(MongoDBNodeRole.CONFIG_SERVER)],
+            count=cls.configServerCount(params),
+            policy=PlacementPolicy(params.mongodb_config_server_placement)
+        ))
+        return (topology, inverse_topology)
@@ -1,10 +1,20 @@
+import base64
 import geni.rspec.pg as pg
 
 from provisioner.structure.node import Node
 
-def catToFile(node: Node, path: str, content: str, append: bool = False) -> None:
+def catToFile(node: Node, path: str, content: str, append: bool = False, literal: bool = False) -> None:
     if not content.endswith("\n"):
         content += "\n"
+    if literal:
+        # Written encoded so the content is not subject to quoting or
+        # parameter expansion, for scripts referencing their own variables
+        encoded = base64.b64encode(content.encode("utf-8")).decode("ascii")
+        node.instance.addService(pg.Execute(
+            shell="/bin/bash",
+            command=f"echo {encoded} | base64 -d | sudo tee {'-a ' if append else ''}{path}"
+        ))
+        return
     content = content.replace("\"", "\\\"")
     node.instance.addService(pg.Execute(
         shell="/bin/bash",
@@ -38,9 +48,37 @@ def cp(node: Node, source_path: str, dest_path: str, recursive: bool = False) ->
 def ifaceForIp(ip: str) -> str:
     return f"sudo ifconfig | grep -B1 {ip} | grep -o '^\\w*'"
 
+def sedEscape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("/", "\\/").replace("&", "\\&")
+
 def sed(node: Node, mappings: dict[str, str], path: str) -> None:
     for key, value in mappings.items():
         node.instance.addService(pg.Execute(
             shell="/bin/bash",
             command=f"sudo sed -i \"s/{key}/{value}/g\" {path}"
         ))
+
+def setYamlProperties(node: Node, properties: dict[str, str], path: str) -> None:
+    # Sets each top level key of the YAML file at path. The live line is
+    # replaced if there is one, otherwise the first commented out line
+    # for the key, so commented examples of other values stay comments.
+    # Keys the file has no line for are appended
+    for key, value in properties.items():
+        line = sedEscape(f"{key}: {value}")
+        node.instance.addService(pg.Execute(
+            shell="/bin/bash",
+            command=f"if grep -q \"^{key}:\" {path}; then sudo sed -i \"s/^{key}:.*/{line}/\" {path}; "
+                    + f"elif grep -q \"^#\\s*{key}:\" {path}; then sudo sed -i \"0,/^#\\s*{key}:.*/s//{line}/\" {path}; "
+                    + f"else echo \"{key}: {value}\" | sudo tee -a {path}; fi"
+        ))
+
+def insertXMLProperties(node: Node, properties: dict[str, str], path: str) -> None:
+    # Appends Hadoop style <property> elements to the end of the
+    # <configuration> element of the file at path
+    if len(properties) == 0:
+        return
+    elements = "".join([
+        sedEscape(f"<property><name>{name}</name><value>{value}</value></property>") + "\\n"
+        for name, value in properties.items()
+    ])
+    sed(node, {"<\\/configuration>": f"{elements}<\\/configuration>"}, path)
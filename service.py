@@ -0,0 +1,290 @@
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+# Long running profile generation service, avoids paying interpreter
+# start-up, geni import and parameter definition per profile.
+#
+# POST /profile  {"parameters": {...}, "format": "rspec" | "terraform"}
+# GET  /metrics  Per-stage timings and cache statistics
+# GET  /health
+
+REPOSITORY_PATH = os.path.dirname(os.path.abspath(__file__))
+AWS_PROV_PATH = os.path.join(REPOSITORY_PATH, "aws_prov")
+FORMATS = ["rspec", "terraform"]
+
+def renderProfile(values: dict[str, Any]) -> tuple[str, dict[str, float]]:
+    # Runs in a worker process, imports are paid once per worker
+    import geni.rspec.pg as pg
+    from provisioner.generator import bindAndValidateParameterValues
+    from provisioner.provisioner import Provisioner
+    timings: dict[str, float] = {}
+    start = time.perf_counter()
+    params = bindAndValidateParameterValues(values)
+    timings["validate"] = time.perf_counter() - start
+    start = time.perf_counter()
+    request: pg.Request = pg.Request()
+    with contextlib.redirect_stdout(io.StringIO()):
+        Provisioner(request, params).provision()
+    timings["provision"] = time.perf_counter() - start
+    start = time.perf_counter()
+    content = request.toXMLString(pretty_print=True, ucode=True)
+    timings["serialise"] = time.perf_counter() - start
+    return (content, timings)
+
+class StageMetrics:
+    stages: dict[str, dict[str, float]]
+    cache_hits: int
+    cache_misses: int
+    failed_requests: int
+    lock: threading.Lock
+
+    def __init__(self):
+        self.stages = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.failed_requests = 0
+        self.lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            metrics = self.stages.setdefault(stage, {
+                "count": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0
+            })
+            metrics["count"] += 1
+            metrics["total_seconds"] += seconds
+            metrics["max_seconds"] = max(metrics["max_seconds"], seconds)
+
+    def recordCacheLookup(self, hit: bool) -> None:
+        with self.lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def recordFailure(self) -> None:
+        with self.lock:
+            self.failed_requests += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self.lock:
+            stages = {}
+            for stage, metrics in self.stages.items():
+                stages[stage] = dict(metrics)
+                stages[stage]["mean_seconds"] = metrics["total_seconds"] / metrics["count"]
+            return {
+                "stages": stages,
+                "cache": {
+                    "hits": self.cache_hits,
+                    "misses": self.cache_misses
+                },
+                "failed_requests": self.failed_requests
+            }
+
+class ProfileCache:
+    capacity: int
+    entries: OrderedDict[str, str]
+    lock: threading.Lock
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            content = self.entries.get(key)
+            if content != None:
+                self.entries.move_to_end(key)
+            return content
+
+    def put(self, key: str, content: str) -> None:
+        with self.lock:
+            self.entries[key] = content
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def size(self) -> int:
+        with self.lock:
+            return len(self.entries)
+
+class ProfileService:
+    workers: int
+    executor: ProcessPoolExecutor
+    executor_lock: threading.Lock
+    cache: ProfileCache
+    metrics: StageMetrics
+    aws_prov_lock: threading.Lock
+
+    def __init__(self, workers: int, cache_size: int):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.executor_lock = threading.Lock()
+        self.cache = ProfileCache(cache_size)
+        self.metrics = StageMetrics()
+        # The converter resolves its templates relative to the working
+        # directory and is not written to be re-entrant
+        self.aws_prov_lock = threading.Lock()
+
+    def generate(self, values: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+        from provisioner.generator import canonicaliseParameterValues
+        start = time.perf_counter()
+        canonical = canonicaliseParameterValues(values)
+        key = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+        self.metrics.record("canonicalise", time.perf_counter() - start)
+        content = self.cache.get(key)
+        self.metrics.recordCacheLookup(content != None)
+        if content != None:
+            return (content, canonical)
+        start = time.perf_counter()
+        content, timings = self.render(canonical)
+        self.metrics.record("generate", time.perf_counter() - start)
+        for stage, seconds in timings.items():
+            self.metrics.record(stage, seconds)
+        self.cache.put(key, content)
+        return (content, canonical)
+
+    def render(self, canonical: dict[str, Any]) -> tuple[str, dict[str, float]]:
+        executor = self.executor
+        try:
+            return executor.submit(renderProfile, canonical).result()
+        except BrokenProcessPool:
+            # A worker died mid generation, every later submission to
+            # the pool would fail so it is replaced for the next request
+            with self.executor_lock:
+                if self.executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            raise
+
+    def convertToTerraform(self, content: str, application: str) -> dict[str, str]:
+        start = time.perf_counter()
+        if AWS_PROV_PATH not in sys.path:
+            sys.path.append(AWS_PROV_PATH)
+        aws_prov = importlib.import_module("main")
+        files: dict[str, str] = {}
+        with self.aws_prov_lock, tempfile.TemporaryDirectory() as output_dir:
+            profile_path = os.path.join(output_dir, "profile.xml")
+            with open(profile_path, "w") as f:
+                f.write(content)
+            aws_prov.main(
+                profile_path,
+                aws_prov.ApplicationVariant.fromName(application),
+                output_dir
+            )
+            os.remove(profile_path)
+            for filename in sorted(os.listdir(output_dir)):
+                with open(os.path.join(output_dir, filename), "r") as f:
+                    files[filename] = f.read()
+        self.metrics.record("terraform", time.perf_counter() - start)
+        return files
+
+    def snapshot(self) -> dict[str, Any]:
+        snapshot = self.metrics.snapshot()
+        snapshot["cache"]["size"] = self.cache.size()
+        snapshot["cache"]["capacity"] = self.cache.capacity
+        return snapshot
+
+class ProfileRequestHandler(BaseHTTPRequestHandler):
+    service: ProfileService
+
+    def sendContent(self, status: HTTPStatus, content_type: str, content: str) -> None:
+        body = content.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def sendJSON(self, status: HTTPStatus, obj: Any) -> None:
+        self.sendContent(status, "application/json", json.dumps(obj))
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self.sendJSON(HTTPStatus.OK, {"status": "ok"})
+        elif self.path == "/metrics":
+            self.sendJSON(HTTPStatus.OK, self.service.snapshot())
+        else:
+            self.sendJSON(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/profile":
+            self.sendJSON(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+            return
+        start = time.perf_counter()
+        status = self.handleProfileRequest()
+        self.service.metrics.record("request", time.perf_counter() - start)
+        if status != HTTPStatus.OK:
+            self.service.metrics.recordFailure()
+
+    def handleProfileRequest(self) -> HTTPStatus:
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body: dict[str, Any] = json.loads(self.rfile.read(length))
+            values: dict[str, Any] = body.get("parameters", {})
+            output_format: str = body.get("format", "rspec")
+            if output_format not in FORMATS:
+                raise ValueError(f"Unknown format '{output_format}', must be one of [{','.join(FORMATS)}]")
+        except (ValueError, AttributeError) as e:
+            self.sendJSON(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return HTTPStatus.BAD_REQUEST
+        try:
+            content, canonical = self.service.generate(values)
+        except ValueError as e:
+            self.sendJSON(HTTPStatus.UNPROCESSABLE_ENTITY, {"error": str(e)})
+            return HTTPStatus.UNPROCESSABLE_ENTITY
+        except (Exception, SystemExit) as e:
+            # Includes a worker exiting, or dying and breaking the pool
+            self.sendJSON(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"Profile generation failed: {e!r}"})
+            return HTTPStatus.INTERNAL_SERVER_ERROR
+        if output_format == "rspec":
+            self.sendContent(HTTPStatus.OK, "application/xml", content)
+            return HTTPStatus.OK
+        try:
+            files = self.service.convertToTerraform(content, str(canonical["application"]))
+        except (Exception, SystemExit) as e:
+            # The converter exits on failure rather than raising
+            self.sendJSON(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"Terraform conversion failed: {e!r}"})
+            return HTTPStatus.INTERNAL_SERVER_ERROR
+        self.sendJSON(HTTPStatus.OK, {"files": files})
+        return HTTPStatus.OK
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve profile generation over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of generator processes")
+    parser.add_argument("--cache_size", type=int, default=256, help="Maximum number of generated profiles to cache")
+    args = parser.parse_args()
+    # The aws_prov converter loads its templates and logging config
+    # relative to the repository root
+    os.chdir(REPOSITORY_PATH)
+    ProfileRequestHandler.service = ProfileService(args.workers, args.cache_size)
+    server = ThreadingHTTPServer((args.host, args.port), ProfileRequestHandler)
+    print(f"Serving profile generation on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        ProfileRequestHandler.service.executor.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+
+# Grid file format:
+# {
+#     "base": { "<parameter>": <value>, ... },
+#     "grid": { "<parameter>": [<value>, ...], ... }
+# }
+# One profile is generated for each point in the cartesian product of
+# the grid values, applied on top of the base values.
+
+def expandGrid(grid: dict[str, list[Any]]) -> list[dict[str, Any]]:
+    names = list(grid.keys())
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*[grid[name] for name in names])
+    ]
+
+def generatePoint(base: dict[str, Any], point: dict[str, Any]) -> tuple[Optional[str], Optional[str]]:
+    # Imported here so each worker process pays the geni and provisioner
+    # import cost once, rather than once per point
+    from provisioner.generator import bindAndValidateParameterValues, generateProfile
+    values = dict(base)
+    values.update(point)
+    # Provisioning narrates progress to stdout, which is just noise
+    # when interleaved across a pool of workers
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            params = bindAndValidateParameterValues(values)
+            return (generateProfile(params), None)
+        except Exception as e:
+            return (None, f"{e.__class__.__name__}: {e}")
+
+def parseOverride(override: str) -> tuple[str, str]:
+    if "=" not in override:
+        raise argparse.ArgumentTypeError(f"Expected <parameter>=<value>, got '{override}'")
+    name, value = override.split("=", 1)
+    return (name, value)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a profile for each point in a parameter grid")
+    parser.add_argument("grid_file", help="JSON file with 'base' parameter values and 'grid' parameter value lists")
+    parser.add_argument("output_dir", help="Directory to write profiles and the manifest to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of generator processes")
+    parser.add_argument(
+        "--set",
+        type=parseOverride,
+        action="append",
+        default=[],
+        dest="overrides",
+        metavar="PARAMETER=VALUE",
+        help="Base parameter value, applied over the grid file base (e.g. for tokens kept out of the grid file)"
+    )
+    args = parser.parse_args()
+    with open(args.grid_file, "r") as f:
+        grid_file: dict[str, Any] = json.load(f)
+    base: dict[str, Any] = dict(grid_file.get("base", {}))
+    base.update(dict(args.overrides))
+    points = expandGrid(grid_file.get("grid", {}))
+    profiles_dir = os.path.join(args.output_dir, "profiles")
+    os.makedirs(profiles_dir, exist_ok=True)
+    print(f"Generating {len(points)} profiles with {args.workers} workers")
+    entries: list[dict[str, Any]] = []
+    written: set[str] = set([])
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = executor.map(
+            generatePoint,
+            itertools.repeat(base),
+            points,
+            chunksize=max(1, len(points) // (args.workers * 4))
+        )
+        for point, (content, error) in zip(points, results):
+            if content == None:
+                print(f"Failed to generate {point}: {error}")
+                entries.append({"parameters": point, "error": error})
+                continue
+            # Identical profiles are stored once, points that produce
+            # them share the same path in the manifest
+            digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            path = os.path.join("profiles", f"{digest}.xml")
+            if digest not in written:
+                with open(os.path.join(args.output_dir, path), "w") as f:
+                    f.write(content)
+                written.add(digest)
+            entries.append({"parameters": point, "profile": path, "sha256": digest})
+    # Secrets passed via --set are not written to the manifest
+    manifest = {
+        "base": grid_file.get("base", {}),
+        "profiles": entries
+    }
+    with open(os.path.join(args.output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=4)
+    print(f"Written {len(written)} unique profiles for {len(points)} points to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Loaded by the registries on first lookup, only once a variant is selected
+VARIANT_PACKAGES = [
+    "provisioner.application.variant.",
+    "provisioner.collector.variant.",
+    "provisioner.structure.variant.",
+]
+# The collector is provisioned for every variant, and the HBase roles
+# are needed to define the HBase parameters
+ALWAYS_LOADED = [
+    "provisioner.application.variant.otel_collector",
+    "provisioner.structure.variant.hbase_roles",
+]
+# Generous next to the ~0.1s measured, so only a regression such as
+# eagerly importing the variants again or a heavy new dependency fails
+IMPORT_TIME_BUDGET_S = 0.5
+IMPORT_TIME_RUNS = 3
+
+class ImportTimeTest(unittest.TestCase):
+
+    def loadedModules(self, statement: str) -> list[str]:
+        # A fresh interpreter, so nothing imported by other tests counts
+        output = subprocess.run(
+            [sys.executable, "-c", f"import json, sys; {statement}; print(json.dumps(sorted(sys.modules)))"],
+            cwd=REPOSITORY_PATH,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        return json.loads(output.splitlines()[-1])
+
+    def importTime(self, statement: str) -> float:
+        # The best of a few runs, so a busy machine does not fail it
+        times = []
+        for _ in range(IMPORT_TIME_RUNS):
+            output = subprocess.run(
+                [sys.executable, "-c", f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"],
+                cwd=REPOSITORY_PATH,
+                capture_output=True,
+                text=True,
+                check=True
+            ).stdout
+            times.append(float(output.splitlines()[-1]))
+        return min(times)
+
+    def loadedVariants(self, statement: str) -> list[str]:
+        return [
+            module for module in self.loadedModules(statement)
+            if any([module.startswith(package) for package in VARIANT_PACKAGES])
+            and module not in ALWAYS_LOADED
+        ]
+
+    def test_profile_import_loads_no_variants(self):
+        self.assertEqual(self.loadedVariants("import profile"), [])
+
+    def test_profile_import_within_budget(self):
+        self.assertLess(self.importTime("import profile"), IMPORT_TIME_BUDGET_S)
+
+    def test_generator_import_loads_no_variants(self):
+        # What the sweep and service workers import
+        self.assertEqual(self.loadedVariants("import provisioner.generator"), [])
+
+if __name__ == "__main__":
+    unittest.main()